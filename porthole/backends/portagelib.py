@@ -32,6 +32,8 @@ _id = datetime.datetime.now().microsecond
 print("PORTAGELIB: id initialized to ", _id)
 import imp
 import os
+import threading
+from collections import OrderedDict
 
 from gettext import gettext as _
 from sys import exit, stderr
@@ -340,10 +342,67 @@ def xmatch(*args, **kwargs):
        >=gnome-base/control-center-2.8.2    only ebuilds with version >= 2.8.2
     """
     #print >>stderr, "PORTAGELIB: xmatch(); thread ident ", thread.get_ident()
-    results  =  settings.portdb.xmatch(*args, **kwargs)[:] # make a copy.  needed for <portage-svn-r5382
-    #print >>stderr, type(results), str(results)
+    if kwargs or len(args) != 2:
+        # mylist= is not hashable, and checking a given list is cheap anyway
+        return settings.portdb.xmatch(*args, **kwargs)[:] # make a copy.  needed for <portage-svn-r5382
+    results = _cached_xmatch(_xmatch_generation, args[0], str(args[1]))
+    if isinstance(results, tuple):
+        # callers are free to modify their list
+        return list(results)
     return results
 
+# (criterion, atom) results kept by xmatch()
+XMATCH_CACHE_SIZE = 10000
+# bumped by clear_xmatch_cache(), a query that was running while the
+# cache was cleared does not store its (old) result
+_xmatch_generation = 0
+# (generation, criterion, atom): results, least recently used first.
+# shared by the reader threads, only used with _xmatch_lock held
+_xmatch_cache = OrderedDict()
+_xmatch_lock = threading.Lock()
+_xmatch_stats = {'hits': 0, 'misses': 0}
+
+def _cached_xmatch(generation, criterion, atom):
+    key = (generation, criterion, atom)
+    with _xmatch_lock:
+        if key in _xmatch_cache:
+            _xmatch_cache.move_to_end(key)
+            _xmatch_stats['hits'] += 1
+            return _xmatch_cache[key]
+        _xmatch_stats['misses'] += 1
+    # portage is queried without the lock, a query that raises
+    # stores nothing
+    results = settings.portdb.xmatch(criterion, atom)
+    if isinstance(results, list):
+        results = tuple(results)
+    with _xmatch_lock:
+        if generation == _xmatch_generation:
+            _xmatch_cache[key] = results
+            while len(_xmatch_cache) > XMATCH_CACHE_SIZE:
+                _xmatch_cache.popitem(False)
+    return results
+
+def xmatch_cache_info():
+    """Returns the (hits, misses, maxsize, currsize) of the xmatch() cache"""
+    with _xmatch_lock:
+        return (_xmatch_stats['hits'], _xmatch_stats['misses'],
+                XMATCH_CACHE_SIZE, len(_xmatch_cache))
+
+def clear_xmatch_cache():
+    """Drop all xmatch() results, needed whenever the tree,
+    the portage config or the user configs change.  Call it once
+    the new portdb or config is in place"""
+    global _xmatch_generation
+    debug.dprint("PORTAGELIB: clear_xmatch_cache(); " + str(xmatch_cache_info()))
+    with _xmatch_lock:
+        _xmatch_generation += 1
+        _xmatch_cache.clear()
+
+def get_xmatch_generation():
+    """Returns a number that changes whenever clear_xmatch_cache()
+    runs, for caches built from xmatch() results"""
+    return _xmatch_generation
+
 def get_version(ebuild):
     """Extract version number from ebuild name"""
     result = ''
@@ -653,9 +712,17 @@ def get_metadata(cpv):
                 settings.portdir, get_full_name(cpv), "metadata.xml"))
         except: return None
 
+# ((world_version, vdb mtime), packages) of the last get_system_pkgs()
+_system_pkgs = (None, frozenset())
+
 def get_system_pkgs(): # lifted from gentoolkit
-    """Returns a tuple of lists, first list is resolved system packages,
-    second is a list of unresolved packages."""
+    """Returns a frozenset of the system packages, the installed
+    ones resolved.  Cached until the world file is reloaded or
+    a package is merged or unmerged"""
+    global _system_pkgs
+    key = (settings.world_version, get_vdb_mtime())
+    if _system_pkgs[0] == key:
+        return _system_pkgs[1]
     pkglist = settings.settings.packages
     resolved = []
     unresolved = []
@@ -667,7 +734,8 @@ def get_system_pkgs(): # lifted from gentoolkit
                 resolved.append(get_full_name(pkg))
             else:
                 unresolved.append(get_full_name(cpv))
-    return (resolved + unresolved)
+    _system_pkgs = (key, frozenset(resolved + unresolved))
+    return _system_pkgs[1]
 
 
 def find_best_match(search_key): # lifted from gentoolkit and updated
@@ -709,9 +777,115 @@ def get_allnodes():
 def get_installed_list():
     return settings.trees[settings.settings["ROOT"]]["vartree"].getallnodes()[:] # try copying...
 
+def get_installed_cpvs():
+    """Returns a dictionary of all installed ebuilds keyed by category/package"""
+    installed = {}
+    for cpv in settings.trees[settings.settings["ROOT"]]["vartree"].dbapi.cpv_all():
+        installed.setdefault(portage.cpv_getkey(cpv), []).append(cpv)
+    return installed
+
+# the dependency strings of an ebuild, as Depends.get_depends() reads them
+DEPEND_KEYS = ["DEPEND", "RDEPEND", "PDEPEND"]
+
+def get_installed_depends(cpv):
+    """Returns the DEPEND, RDEPEND and PDEPEND strings an ebuild was
+    installed with, USE conditionals already resolved"""
+    return settings.trees[settings.settings["ROOT"]]["vartree"].dbapi.aux_get(cpv, DEPEND_KEYS)
+
+def get_ebuild_depends(cpv):
+    """Returns the DEPEND, RDEPEND and PDEPEND strings of an ebuild
+    in the tree, from the metadata cache"""
+    return settings.portdb.aux_get(cpv, DEPEND_KEYS)
+
 def get_installed_ebuild_path(fullname):
     return settings.trees[settings.settings["ROOT"]]["vartree"].getebuildpath(fullname)
 
+def get_vdb_mtime():
+    """Returns the mtime of the installed package db.
+    portage bumps it on every merge/unmerge, so it is a cheap
+    way to tell if the installed list has changed"""
+    try:
+        return os.stat(os.path.join(settings.settings["EROOT"],
+            portage_const.VDB_PATH)).st_mtime
+    except (OSError, KeyError) as e:
+        debug.dprint("PORTAGELIB: get_vdb_mtime(); failed to stat the vdb: %s" %str(e))
+        return None
+
+def get_ebuild_stamps():
+    """Returns {full_name: frozenset of (entry, mtime)} of the md5-cache
+    entries of every package of every repo.  A sync rewrites the entry of
+    each ebuild it changes, keywords and eclasses included, so a package
+    with the same stamps kept its tree data.  The ebuilds are used for
+    a repo with no md5-cache"""
+    stamps = {}
+    for repo in settings.portdb.porttrees:
+        cache_dir = os.path.join(repo, "metadata", "md5-cache")
+        if os.path.isdir(cache_dir):
+            dirs = [(category, os.path.join(cache_dir, category), '')
+                    for category in os.listdir(cache_dir)]
+        else:
+            dirs = []
+            for category in settings.settings.categories:
+                try:
+                    names = os.listdir(os.path.join(repo, category))
+                except OSError:
+                    continue
+                dirs.extend([(category, os.path.join(repo, category, name), ".ebuild")
+                             for name in names])
+        for category, path, ext in dirs:
+            try:
+                entries = os.listdir(path)
+            except OSError: # not a dir
+                continue
+            for entry in entries:
+                if not entry.endswith(ext):
+                    continue
+                try:
+                    mtime = os.stat(os.path.join(path, entry)).st_mtime
+                except OSError:
+                    continue
+                cpv = category + '/' + entry[:len(entry) - len(ext)]
+                try:
+                    full_name = portage.cpv_getkey(cpv)
+                except Exception:
+                    continue
+                stamps.setdefault(full_name, set()).add((cpv, mtime))
+    return dict((full_name, frozenset(entries)) for full_name, entries in stamps.items())
+
+def get_mask_atoms():
+    """Returns {full_name: (package.mask atoms, package.unmask atoms)},
+    or None if this portage does not tell"""
+    try:
+        pmasks, punmasks = settings.portdb.settings.pmaskdict, settings.portdb.settings.punmaskdict
+    except AttributeError:
+        return None
+    atoms = {}
+    for full_name in set(pmasks) | set(punmasks):
+        atoms[full_name] = (frozenset(pmasks.get(full_name, [])),
+                            frozenset(punmasks.get(full_name, [])))
+    return atoms
+
+def get_profile_stamp():
+    """Returns the (file, mtime) of the files of the profiles in use,
+    except package.mask, see get_mask_atoms().  If a sync changed any of
+    them the keywords or masking of any package may have changed"""
+    stamp = []
+    for path in settings.settings.profiles:
+        try:
+            names = sorted(os.listdir(path))
+        except OSError:
+            continue
+        for name in names:
+            if name == "package.mask":
+                continue
+            filename = os.path.join(path, name)
+            try:
+                if os.path.isfile(filename):
+                    stamp.append((filename, os.stat(filename).st_mtime))
+            except OSError:
+                continue
+    return tuple(stamp)
+
 
 class BinPkgs(object):
     """Class to hold all data handling for binpkgs
@@ -730,6 +904,9 @@ class PortageSettings:
         # declare some globals
         self.portdir = self.portdir_overlay = self.ACCEPT_KEYWORDS = self.user_config_dir = self._world = self.SystemUseFlags = None
         self.virtuals = self.keys = self.UseFlagDict = None
+        # bumped by reload_world(), for caches of the world and
+        # system sets to check
+        self.world_version = 0
         if PORTAGE22: # then use the imported module
             self.my_load_emerge_config = _load_emerge_config
         else: # use the one copied from the non import-able emerge
@@ -761,6 +938,8 @@ class PortageSettings:
         debug.dprint("PORTAGELIB: reset_globals();")
         self.settings, self.trees, self.mtimedb = self.my_load_emerge_config()
         self.portdb = self.trees[self.settings["ROOT"]]["porttree"].dbapi
+        # only now, a query before would store the old portdb's answer
+        clear_xmatch_cache()
         #self.db=self.portdb.auxdbmodule._db_module
         #print >>stderr, self.db.__dict__.keys()
         #self.db.dbapi2.check_same_thread  = False
@@ -793,6 +972,7 @@ class PortageSettings:
         """Reload the whole config from scratch"""
         self.settings, self.trees, self.mtimedb = self.my_load_emerge_config(self.trees)
         self.portdb = self.trees[self.settings["ROOT"]]["porttree"].dbapi
+        clear_xmatch_cache()
         self.create_repos()
 
     def reload_world(self):
@@ -812,9 +992,11 @@ class PortageSettings:
                 debug.dprint("PORTAGELIB: get_world(); OK")
             except:
                 debug.dprint("PORTAGELIB: get_world(); Failed to locate the world file")
-        self._world = world
+        self._world = frozenset(world)
+        self.world_version += 1
 
     def get_world(self):
+        """Returns the frozenset of the world file's entries"""
         return self._world
 
 settings = PortageSettings()
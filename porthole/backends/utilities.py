@@ -83,7 +83,7 @@ def get_sync_info():
     try:
         #debug.dprint("BACKENDS Utilities: get_sync_info(); timestamp path = " \
         #    + backends.portage_lib.settings.portdir + "/metadata/timestamp")
-        f = open(backends.portage_lib.settings.portdir + "/metadata/timestamp")
+        f = open(backends.portage_lib.settings.portdir + "/metadata/timestamp", 'rb')
         #debug.dprint("BACKENDS Utilities: get_sync_info(); file open")
         data = f.read()
         #debug.dprint("BACKENDS Utilities: get_sync_info(); file read")
@@ -93,12 +93,12 @@ def get_sync_info():
         if data:
             try:
                 #debug.dprint("BACKENDS Utilities: get_sync_info(); trying utf_8 encoding")
-                last_sync = (str(data).decode('utf_8').encode("utf_8",'replace'))
+                last_sync = data.decode('utf_8')
                 valid_sync = True
             except:
                 try:
                     #debug.dprint("BACKENDS Utilities: get_sync_info(); trying iso-8859-1 encoding")
-                    last_sync = (str(data).decode('iso-8859-1').encode('utf_8', 'replace'))
+                    last_sync = data.decode('iso-8859-1')
                     valid_sync = True
                 except:
                     debug.dprint("BACKENDS Utilities: get_sync_info(); Failure = unknown encoding")
@@ -2,8 +2,7 @@
 
 '''
     Porthole's Version string list sorting functions that follows portages
-    rules for comparing versions.  The pad_ver() is modified from
-    the soon to be implemented portage.vercmp()
+    rules for comparing versions.  VersionKey follows portage.vercmp()
 
     Copyright (C) 2003 - 2008 Fredrik Arnerup, Brian Dolbec,
     Daniel G. Taylor and Wm. F. Wheeler
@@ -43,138 +42,83 @@ from porthole.utils.debug import dprint
 
 ver_regexp = re.compile("^(cvs-)?(\\d+)((\\.\\d+)*)([a-zA-Z]?)((_(pre|p|beta|alpha|rc)\\d*)*)(-r(\\d+))?$")
 suffix_regexp = re.compile("^(alpha|beta|rc|pre|p)(\\d*)$")
-# modified portage comparison suffix values for sorting in desired precedence
-suffix_value = {"alpha": '0', "beta": '1', "pre": '2', "rc": '3', "p": '4'}
-
-# most version numbers will not exceed 2 digits, but make it 3 just in case
-fill_size = 3
-
-def pad_ver(vlist):
-    """pads the version string so all number sequences are the same
-       length for acurate sorting, borrowed & modified code from new portage vercmp()"""
-    #dprint("VERSION_SORT:  pad_ver();  vlist[]")
-    #dprint(vlist)
-    # short circuit for  list of 1
-    #if len(vlist) == 1:
-    #    return vlist
-
-    max_length = 0
-
-    suffix_count = 0
-    # suffix length may have dates for version number (8) so make it 2 extra just in case
-    suffix_length = 10
-    # the lack of a suffix would imply the smallest value possible for it
-    suffix_pad = "0"
-
-    val_cache = []
-
-    #dprint("VERSION_SORT: pad_ver(); checking maximum length value of version pattern")
-    for x in vlist:
-        #dprint(x)
-        max_length = max(max_length, x.count('.'))
-        suffix_count = max(suffix_count, x.count("_"))
-
-    #dprint("VERSION_SORT: pad_ver(); max_length = %d, suffix_count =%d" \
-    #       %(max_length, suffix_count))
-
-    for val1 in vlist:
-        #dprint("VERSION_SORT: pad_ver(); new val1 = %s" %val1)
-        match1 = ver_regexp.match(val1)
-        # checking that the versions are valid
-        if not match1 or not match1.groups():
-            dprint("VERSION_SORT: pad_ver(); !!! syntax error in version:")
-            dprint(val1)
-            return None
-
-        # building lists of the version parts before the suffix
-        # first part is simple
-        list1 = [match1.group(2).zfill(fill_size)]
-
-        # extend version numbers
-        # this part would greatly benefit from a fixed-length version pattern
-        if len(match1.group(3)):
-            vlist1 = match1.group(3)[1:].split(".")
-            for i in range(0, max_length):
-                if len(vlist1) <= i or len(vlist1[i]) == 0:
-                    list1.append("0".zfill(fill_size))
-                else:
-                    list1.append(vlist1[i].zfill(fill_size))
-
-        # and now the final letter
-        #dprint("VERSION_SORT: pad_ver(); final letter")
-        if len(match1.group(5)):
-            list1.append(match1.group(5))
-        else: # add something to it in case there is a letter in a vlist member
-            list1.append("!") # "!" is the first visible printable char
-
-        # main version is done, so now the _suffix part
-        #dprint("VERSION_SORT: pad_ver(); suffix part")
-        list1b = match1.group(6).split("_")[1:]
-
-        for i in range(0, suffix_count):
-            s1 = None
-            if len(list1b) <= i:
-                s1 = str(suffix_value["p"]) + suffix_pad.zfill(suffix_length)
+# portage's vercmp() suffix values
+suffix_value = {"alpha": -4, "beta": -3, "pre": -2, "rc": -1, "p": 0}
+# what a missing suffix compares as, between _rc and _p0
+no_suffix = (0, -1)
+
+# version string: VersionKey, emptied when it reaches key_cache_size
+key_cache = {}
+key_cache_size = 100000
+
+
+class VersionKey(tuple):
+    """Sort key of a version string ("1.2.3b_rc1_p2-r3"), keys compare
+    the way portage.vercmp() compares their versions.  Any number of
+    components of any width and any number of suffixes are handled.
+    Raises ValueError for an invalid version"""
+    __slots__ = ()
+
+    def __new__(cls, version):
+        match = ver_regexp.match(version)
+        if not match:
+            raise ValueError("invalid version: %s" %version)
+        # vercmp() compares the components after the first as decimal
+        # fractions if either one has a leading zero and as integers if not.
+        # All fractions are smaller than any integer, so (0, fraction) and
+        # (1, integer) sort the same way.  A missing component is less than
+        # any other, as a shorter tuple is.
+        components = []
+        for x in match.group(3)[1:].split(".") if match.group(3) else []:
+            if x[0] == "0":
+                components.append((0, x.rstrip("0")))
             else:
-                slist = suffix_regexp.match(list1b[i]).groups()
-                s1 = str(suffix_value[slist[0]]) + slist[1].zfill(suffix_length)
-            if s1:
-                #dprint("VERSION_SORT: pad_ver(); s1")
-                #dprint(s1)
-                list1 += [s1]
-
-        # the suffix part is done, so finally the revision
-        #dprint("VERSION_SORT: pad_ver(); revision part")
-        r1 = None
-        if match1.group(10):
-            r1 = 'r' + match1.group(10).zfill(fill_size)
-        else:
-            r1 ='r' + "0".zfill(fill_size)
-        if r1:
-            list1 += [r1]
-
-        # reconnect the padded version string
-        result = ''
-        for y in list1:
-            result += y
-        #dprint("VERSION_SORT: pad_ver(); result= %s" %result)
-
-        # store the padded version
-        val_cache += [result]
-
-    #dprint(val_cache)
-    #dprint("VERSION_SORT: pad_ver(); done")
-    return val_cache
-
-def two_list_sort(keylist, versions):
-    """sorts the versions list using the keylist values"""
-    #dprint("VERSION_SORT: two_list_sort() ; keylist, versions")
-    #dprint(keylist)
-    #dprint(versions)
-    dbl_list = {}
-    for x in range(0,len(versions)):
-        dbl_list[keylist[x]] =  versions[x]
-
-    # Sort the versions using the padded keylist
-    sorted_keys = sorted(dbl_list) #)keylist.sort()
-
-    #rebuild versions in sorted order
-    result = []
-    for key in sorted_keys: #keylist:
-        result.append(dbl_list[key])
-    return result
+                components.append((1, int(x)))
+        # vercmp() ends each suffix list with a no_suffix,
+        # so 1.0 > 1.0_rc1 but 1.0 < 1.0_p1
+        suffixes = []
+        for x in match.group(6)[1:].split("_") if match.group(6) else []:
+            name, number = suffix_regexp.match(x).groups()
+            suffixes.append((suffix_value[name], int(number or 0)))
+        suffixes.append(no_suffix)
+        return tuple.__new__(cls, (
+            bool(match.group(1)),           # cvs- versions beat all others
+            int(match.group(2)),
+            tuple(components),
+            match.group(5),                 # the letter, "" is the smallest
+            tuple(suffixes),
+            int(match.group(10) or 0)       # revision
+        ))
+
+
+def version_key(version):
+    """Returns the cached VersionKey of version, or None if it is invalid"""
+    try:
+        return key_cache[version]
+    except KeyError:
+        pass
+    try:
+        key = VersionKey(version)
+    except ValueError:
+        dprint("VERSION_SORT: version_key(); !!! syntax error in version: %s" %version)
+        key = None
+    if len(key_cache) >= key_cache_size:
+        key_cache.clear()
+    key_cache[version] = key
+    return key
 
 def ver_sort(versions):
     """sorts a version list according to portage versioning rules"""
     if len(versions) <2:  # no need to sort for 0 or 1 versions
         return versions
-    keylist = pad_ver(get_versions_only(versions))
-    if not keylist: # there was an error
+    keylist = [version_key(v) for v in get_versions_only(versions)]
+    if None in keylist: # there was an error
         dprint("VERSION_SORT: ver_sort(); keylist[] creation error")
         return (versions + ["error_in_sort"])
-    sorted = two_list_sort(keylist, versions)
+    # sort on the keys only, equal versions keep their order
+    order = sorted(range(len(versions)), key=keylist.__getitem__)
     #dprint("VERSION_SORT: ver_sort(); complete!")
-    return sorted
+    return [versions[x] for x in order]
 
 def get_versions_only(versions):
     """inputs a cat/pkg-version list and returns a version list"""
@@ -194,11 +138,11 @@ def ver_match(versions, range1, range2 = None):
     """looks for a version match in range1 and optionaly in range2"""
     if not versions:
         return None
-    plist = pad_ver(get_versions_only(versions))
-    r1 = pad_ver(range1)
+    plist = [version_key(v) for v in get_versions_only(versions)]
+    r1 = [version_key(v) for v in range1]
     if range2:
-        r2 = pad_ver(range2)
-    if not plist:
+        r2 = [version_key(v) for v in range2]
+    if None in plist:
         dprint("VERSION_SORT: ver_match(); plist[] creation error")
         return False, False
     match1 = False
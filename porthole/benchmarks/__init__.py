@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+
+'''
+    Porthole Benchmarks Package
+    Timing and memory checks for the performance critical code paths.
+    They are not installed, run them from a checkout with:
+
+        python -m porthole.benchmarks.<module> [options]
+
+    Copyright (C) 2003 - 2009 Fredrik Arnerup, Daniel G. Taylor
+    Brian Dolbec, Wm. F. Wheeler, Tommy Iorns
+
+    This program is free software; you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation; either version 2 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program; if not, write to the Free Software
+    Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+'''
+
+import sys
+import time
+
+
+class BenchPrefs(object):
+    """The few preferences the benchmarked modules need at import"""
+    EPREFIX = ''
+
+
+def init(backend = None):
+    """Minimal version of startup.main() for running a benchmark.
+    backend replaces the portage library, eg. a synthetic tree"""
+    from porthole import config
+    if config.Prefs is None:
+        config.Prefs = BenchPrefs()
+    from porthole import backends
+    if backend is not None:
+        backends.portage_lib = backend
+    else:
+        backends.load('portagelib')
+
+
+def best_of(func, repeat = 3):
+    """Returns the fastest wall clock time of repeat calls of func()"""
+    times = []
+    for x in range(repeat):
+        start = time.time()
+        func()
+        times.append(time.time() - start)
+    return min(times)
+
+
+def report(name, seconds, count = None, limit = None):
+    """Prints a timing result, returns the exit status.
+    1 if the optional limit in seconds was exceeded"""
+    line = "%-40s %10.4f s" %(name, seconds)
+    if count:
+        line += "  %12.0f /s" %(count / max(seconds, 1e-9))
+    print(line)
+    if limit is not None and seconds > limit:
+        print("  ** REGRESSION: limit was %.4f s" %limit, file=sys.stderr)
+        return 1
+    return 0
@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+
+'''
+    Porthole Benchmarks: configuration.xml output filters
+    Times classifying every line of a captured emerge log the way
+    ProcessManager.newline() does, with the combined filter regex
+    against one pattern at a time, and checks both agree.  Without a
+    log, generated build output is used.
+
+        python -m porthole.benchmarks.config_filters [--log file] [--size MB] [--limit seconds]
+
+    Copyright (C) 2003 - 2009 Fredrik Arnerup, Daniel G. Taylor
+    Brian Dolbec, Wm. F. Wheeler, Tommy Iorns
+
+    This program is free software; you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation; either version 2 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program; if not, write to the Free Software
+    Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+'''
+
+import argparse
+import os
+import random
+import sys
+
+from porthole import benchmarks
+from porthole.config.configuration import FILTERS, PortholeConfiguration
+
+# lines that make the filters' work, mixed into the generated output
+SAMPLE_LINES = [
+    ">>> Emerging (1 of 3) sys-apps/foo-1.2::gentoo\n",
+    ">>> Unpacking source...\n",
+    ">>> sys-apps/foo-1.2 merged.\n",
+    " * Applying foo-1.2-fix.patch ...\n",
+    " * IMPORTANT: 3 news items need reading for repository 'gentoo'.\n",
+    " * Caching service dependencies ...\n",
+    " * ERROR: sys-apps/foo-1.2::gentoo failed (compile phase):\n",
+    " * Remember to run revdep-rebuild\n",
+    "!!! ERROR: sys-apps/foo-1.2 failed.\n",
+    "!!! All ebuilds that could satisfy \"foo\" have been masked.\n",
+    "*** Please run etc-update\n",
+    "configure: WARNING: unrecognized options: --disable-static\n",
+    "foo.c:12:5: warning: unused variable 'x' [-Wunused-variable]\n",
+    "foo.c:20: warning: dereferencing type-punned pointer will break strict-aliasing rules\n",
+    "checking for gcc option to enable compiler warning flags... -Wall\n",
+    "libtool: warning: remember to run 'libtool --finish /usr/lib'\n",
+    "CAUTION: this will eat your homework\n",
+    "Sorry, try again.\n",
+    "File foo.h not found\n",
+]
+
+
+class OneByOne(PortholeConfiguration):
+    """Tests each pattern in turn, as the filters were before they
+    were combined"""
+
+    def compile_filters(self):
+        self.prefilter_re = None
+        self.filter_re = None
+        self.last_line = None
+
+    def get_filters(self, teststring):
+        return frozenset([filter for filter in FILTERS if self._matches(teststring, filter)])
+
+
+def synthetic_lines(size, seed = 0):
+    """Returns about size chars of build output lines"""
+    from porthole.benchmarks.terminal_output import synthetic_log
+    rand = random.Random(seed)
+    lines = synthetic_log(size, seed).replace('\r\n', '\n').splitlines(True)
+    for x in range(len(lines) // 20):
+        lines.insert(rand.randint(0, len(lines)), rand.choice(SAMPLE_LINES))
+    return lines
+
+
+def classify(config, lines):
+    """Tests lines as ProcessManager.newline() does"""
+    for line in lines:
+        if config.isBadPassword(line):
+            pass
+        elif config.isEmerge(line):
+            pass
+        elif config.isAction(line):
+            pass
+        elif config.isInfo(line):
+            config.isError(line)
+        elif config.isWarning(line):
+            pass
+        elif config.isCaution(line):
+            pass
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = "Time the output filters")
+    parser.add_argument("--log", default = None,
+            help = "captured emerge output, eg. a saved porthole terminal log")
+    parser.add_argument("--size", type = float, default = 8,
+            help = "MB of output to generate when no log is given")
+    parser.add_argument("-r", "--repeat", type = int, default = 3)
+    parser.add_argument("--limit", type = float, default = None,
+            help = "exit with status 1 if the combined filters exceed this many seconds")
+    args = parser.parse_args(argv)
+
+    if args.log:
+        _file = open(args.log, "rb")
+        try:
+            lines = _file.read().decode("utf_8", "replace").splitlines(True)
+        finally:
+            _file.close()
+    else:
+        lines = synthetic_lines(int(args.size * 1e6))
+
+    data_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__))) + '/'
+    combined = PortholeConfiguration()
+    combined.set_path(data_path)
+    combined.load()
+    one_by_one = OneByOne()
+    one_by_one.set_path(data_path)
+    one_by_one.load()
+    if combined.filter_re is None:
+        print("  ** the filters could not be combined", file = sys.stderr)
+        return 1
+    print("prefilter: %s" %(combined.prefilter_re and combined.prefilter_re.pattern))
+    count = len(lines)
+
+    seconds = benchmarks.best_of(lambda: classify(combined, lines), args.repeat)
+    status = benchmarks.report("combined filters, %d lines" %count, seconds, count, args.limit)
+    seconds = benchmarks.best_of(lambda: classify(one_by_one, lines), args.repeat)
+    benchmarks.report("one pattern at a time", seconds, count)
+
+    for line in lines:
+        if combined.get_filters(line) != one_by_one.get_filters(line):
+            print("  ** MISMATCH: %r: %s != %s" %(line, sorted(combined.get_filters(line)),
+                    sorted(one_by_one.get_filters(line))), file = sys.stderr)
+            status = 1
+            break
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
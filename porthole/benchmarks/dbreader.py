@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+
+'''
+    Porthole Benchmarks: DatabaseReader.read_db()
+    Times building the package db from a synthetic tree.
+
+        python -m porthole.benchmarks.dbreader [-n nodes] [-i installed] [--limit seconds]
+
+    Copyright (C) 2003 - 2009 Fredrik Arnerup, Daniel G. Taylor
+    Brian Dolbec, Wm. F. Wheeler, Tommy Iorns
+
+    This program is free software; you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation; either version 2 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program; if not, write to the Free Software
+    Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+'''
+
+import argparse
+import sys
+
+from porthole import benchmarks
+from porthole.benchmarks import synthetic
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = "Time DatabaseReader.read_db()")
+    parser.add_argument("-n", "--nodes", type = int, default = 20000)
+    parser.add_argument("-i", "--installed", type = int, default = 2000)
+    parser.add_argument("-r", "--repeat", type = int, default = 3)
+    parser.add_argument("--limit", type = float, default = None,
+            help = "exit with status 1 if the best time exceeds this many seconds")
+    args = parser.parse_args(argv)
+
+    synthetic.make_tree(args.nodes, args.installed)
+    benchmarks.init(synthetic)
+    # importing the db package starts its own db build, let it finish first
+    from porthole import db
+    db.db.db_thread.join()
+    old_db = db.db.db_thread.get_db()
+    from porthole.db.dbreader import DatabaseReader
+
+    def read_db():
+        reader = DatabaseReader(lambda args: None)
+        reader.read_db()
+        assert reader.db.installed_count == len(synthetic.get_installed_list())
+
+    def refresh_db():
+        reader = DatabaseReader(lambda args: None, old_db = old_db)
+        reader.read_db()
+
+    seconds = benchmarks.best_of(read_db, args.repeat)
+    status = benchmarks.report("read_db() %d nodes / %d installed"
+            %(args.nodes, args.installed), seconds, args.nodes, args.limit)
+    seconds = benchmarks.best_of(refresh_db, args.repeat)
+    benchmarks.report("read_db() refresh of an unchanged tree", seconds, args.nodes)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
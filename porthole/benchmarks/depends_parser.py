@@ -0,0 +1,301 @@
+#!/usr/bin/env python
+
+'''
+    Porthole Benchmarks: DEPEND parsing
+    Times Depends.parse() on every DEPEND, RDEPEND and PDEPEND string of
+    a metadata cache, against the recursive parser it replaced, and checks
+    that both build the same atoms.  The md5-cache of the installed portage
+    tree is used if there is one, generated strings otherwise.
+
+        python -m porthole.benchmarks.depends_parser [--cache dir] [-n strings]
+                [--synthetic] [--limit seconds]
+
+    Copyright (C) 2003 - 2009 Fredrik Arnerup, Daniel G. Taylor
+    Brian Dolbec, Wm. F. Wheeler, Tommy Iorns
+
+    This program is free software; you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation; either version 2 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program; if not, write to the Free Software
+    Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+'''
+
+import argparse
+import datetime
+import os
+import random
+import sys
+
+from porthole import benchmarks
+
+try:
+    import portage
+except ImportError:
+    portage = None
+
+# tried when portage can not tell where the tree is
+CACHE_DIRS = ['/var/db/repos/gentoo/metadata/md5-cache',
+              '/usr/portage/metadata/md5-cache']
+KEYS = ['DEPEND=', 'RDEPEND=', 'PDEPEND=']
+
+
+def find_cache():
+    """Returns the md5-cache dir of the main tree, or None"""
+    dirs = CACHE_DIRS[:]
+    if portage is not None:
+        try:
+            dirs.insert(0, os.path.join(portage.settings["PORTDIR"], 'metadata', 'md5-cache'))
+        except Exception:
+            pass
+    for path in dirs:
+        if os.path.isdir(path):
+            return path
+    return None
+
+
+def cache_depends(path):
+    """Returns the dependency strings of all the entries of an md5-cache"""
+    strings = []
+    for category in sorted(os.listdir(path)):
+        catdir = os.path.join(path, category)
+        if not os.path.isdir(catdir):
+            continue
+        for entry in sorted(os.listdir(catdir)):
+            _file = open(os.path.join(catdir, entry), "rb")
+            try:
+                lines = _file.read().decode("utf_8", "replace").splitlines()
+            finally:
+                _file.close()
+            for line in lines:
+                if line.startswith(tuple(KEYS)):
+                    value = line.split('=', 1)[1]
+                    if value:
+                        strings.append(value)
+    return strings
+
+
+def synthetic_depends(count, seed = 0):
+    """Returns count generated dependency strings, nested as deep
+    as real ones"""
+    rand = random.Random(seed)
+    flags = ['ssl', 'X', 'gtk', 'qt5', 'doc', 'test', 'python_targets_python3_9',
+             'static-libs', 'bootstrap', 'nls', 'ipv6', 'elibc_glibc']
+
+    def atom():
+        name = "%s-%s/pkg%d" %(rand.choice(['dev', 'sys', 'x11', 'media']),
+                rand.choice(['libs', 'apps', 'util', 'base']), rand.randint(0, 3000))
+        prefix = rand.choice(['', '', '', '>=', '<', '=', '~', '!', '!!'])
+        if prefix and prefix not in ['!', '!!']:
+            name += '-%d.%d' %(rand.randint(0, 9), rand.randint(0, 20))
+        if rand.random() < 0.2:
+            name += ':' + rand.choice(['0', '2', '0=', '='])
+        if rand.random() < 0.2:
+            name += '[%s]' %rand.choice(flags)
+        return prefix + name
+
+    def items(depth):
+        result = []
+        for x in range(rand.randint(1, 6)):
+            choice = rand.random()
+            if depth < 3 and choice < 0.15:
+                flag = rand.choice(flags)
+                if rand.random() < 0.2:
+                    flag = '!' + flag
+                result += [flag + '?', '('] + items(depth + 1) + [')']
+            elif depth < 3 and choice < 0.25:
+                result += ['||', '('] + items(depth + 1) + [')']
+            else:
+                result.append(atom())
+        return result
+
+    return [' '.join(items(0)) for x in range(count)]
+
+
+class RecursiveDepends(object):
+    """The parser Depends.parse() replaced, for comparing with it"""
+
+    def __init__(self):
+        from porthole.views.packagebook.depends import DepCache
+        self.cache = DepCache()
+        self.flags = []
+
+    def parse(self, depends_list, parent=''):
+        atomized_set = set()
+        I_am = None
+        while depends_list:
+            item_type = useflag = ''
+            children = []
+            item = depends_list[0]
+            if item.startswith("||"):
+                item_type = 'OPTION'
+                if item != "||":
+                    depends_list[0] = item[2:]
+                else:
+                    depends_list.pop(0)
+                item = depends_list[0]
+            elif item.endswith("?"):
+                if item.startswith("!"):
+                    item_type = 'NOTUSING'
+                    useflag=item[1:-1]
+                else:
+                    item_type = 'USING'
+                    useflag=item[:-1]
+                depends_list.pop(0)
+                item = depends_list[0]
+            if item.startswith("("):
+                if item_type == '':
+                    item_type = 'GROUP'
+                if item != "(":
+                    depends_list[0] = item[1:]
+                else:
+                    if not I_am:
+                        I_am = tuple((parent, datetime.datetime.now()))
+                    group, depends_list = self.split_group(depends_list)
+                    children = self.parse(group, I_am)
+                    atomized_set.add(self.cache.add(mytype=item_type, parent=I_am,
+                                            useflag=useflag, children=children))
+                    continue
+                if not I_am:
+                    I_am = tuple((parent, datetime.datetime.now()))
+                children = self.parse(depends_list, I_am)
+                atomized_set.add(self.cache.add(mytype=item_type, parent=I_am,
+                                        useflag=useflag, children=children))
+                continue
+            elif item.startswith(")"):
+                if item != ")":
+                    depends_list[0] = item[1:]
+                else:
+                    depends_list.pop(0)
+                return self._atomized_list(atomized_set)
+            else:
+                if item.startswith("!"):
+                    item_type = "BLOCKER"
+                    item = item[1:]
+                elif item.startswith('~'):
+                    item_type = "REVISIONABLE"
+                    item = item[1:]
+                else:
+                    item_type = "DEP"
+                atomized_set.add(self.cache.add(mydep=item, mytype=item_type))
+                depends_list.pop(0)
+        return self._atomized_list(atomized_set)
+
+    def _atomized_list(self, a_set):
+        a_list = []
+        while a_set:
+            atom = self.cache.get(a_set.pop())
+            if atom:
+                a_list.append(atom)
+        return a_list
+
+    def split_group(self, dep_list):
+        group = []
+        dep_list.pop(0)
+        nest_level = 0
+        while dep_list:
+            x = dep_list[0]
+            if x in '(':
+                nest_level += 1
+            elif x in ')':
+                if nest_level == 0:
+                    dep_list.pop(0)
+                    break
+                else:
+                    nest_level -= 1
+            group.append(x)
+            dep_list.pop(0)
+        return group, dep_list
+
+    def _filter_flags(self, depends):
+        for flag in self.flags:
+            x = 0
+            while x < len(depends):
+                if depends[x] == flag:
+                    depends.pop(x)
+                    depends.pop(x)
+                    level = 1
+                    while level:
+                        if depends[x] == "(": level += 1
+                        if depends[x] == ")": level -= 1
+                        depends.pop(x)
+                else: x += 1
+        return depends
+
+
+def parse_all(parser, strings):
+    """Parses strings as DepGraph.get_parsed() does, with a new
+    DepCache for each.  Returns the atoms of each"""
+    results = []
+    for depends in strings:
+        parser.cache.reset()
+        results.append(parser.parse(parser._filter_flags(depends.split())))
+    return results
+
+
+def shape(atoms):
+    """Returns atoms as nested tuples, without their order and IDs"""
+    return tuple(sorted([(atom.mytype, atom.useflag, atom.atom, shape(atom.children))
+            for atom in atoms]))
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = "Time DEPEND parsing")
+    parser.add_argument("--cache", default = None,
+            help = "an md5-cache dir, the tree's by default")
+    parser.add_argument("-n", "--strings", type = int, default = 0,
+            help = "use a sample of this many strings, or generate this many (20000)")
+    parser.add_argument("-r", "--repeat", type = int, default = 3)
+    parser.add_argument("--synthetic", action = "store_true",
+            help = "use generated strings even if there is a metadata cache")
+    parser.add_argument("--limit", type = float, default = None,
+            help = "exit with status 1 if Depends.parse() exceeds this many seconds")
+    args = parser.parse_args(argv)
+
+    from porthole.views.packagebook.depends import Depends
+
+    strings = []
+    path = None if args.synthetic else (args.cache or find_cache())
+    if path:
+        strings = cache_depends(path)
+        print("%d dependency strings read from %s" %(len(strings), path))
+        if args.strings and len(strings) > args.strings:
+            strings = random.Random(0).sample(strings, args.strings)
+    if not strings:
+        strings = synthetic_depends(args.strings or 20000)
+    count = len(strings)
+
+    new = Depends()
+    old = RecursiveDepends()
+    for dep_parser in [new, old]:
+        dep_parser.flags.append("!bootstrap?")
+
+    seconds = benchmarks.best_of(lambda: parse_all(new, strings), args.repeat)
+    status = benchmarks.report("Depends.parse(), %d strings" %count, seconds, count,
+            args.limit)
+    seconds = benchmarks.best_of(lambda: parse_all(old, strings), args.repeat)
+    benchmarks.report("recursive parser", seconds, count)
+
+    mismatches = 0
+    for depends, atoms, old_atoms in zip(strings, parse_all(new, strings),
+            parse_all(old, strings)):
+        if shape(atoms) != shape(old_atoms):
+            mismatches += 1
+            if mismatches <= 5:
+                print("  ** MISMATCH: %s" %depends, file = sys.stderr)
+    if mismatches:
+        print("  ** %d of %d strings parsed differently" %(mismatches, count),
+                file = sys.stderr)
+        status = 1
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+
+'''
+    Porthole Benchmarks: Package memory use
+    Measures the bytes per Package and the time to create one for every
+    node of a synthetic tree, against the plain class Package was.
+
+        python -m porthole.benchmarks.package_memory [-n nodes] [--limit bytes]
+
+    Copyright (C) 2003 - 2009 Fredrik Arnerup, Daniel G. Taylor
+    Brian Dolbec, Wm. F. Wheeler, Tommy Iorns
+
+    This program is free software; you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation; either version 2 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program; if not, write to the Free Software
+    Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+'''
+
+import argparse
+import sys
+import tracemalloc
+
+from porthole import benchmarks
+from porthole.benchmarks import synthetic
+
+
+class PlainPackage:
+    """The attributes of Package before it had __slots__"""
+
+    def __init__(self, full_name):
+        self.full_name = full_name
+        self.latest_ebuild = None
+        self.hard_masked = None
+        self.hard_masked_nocheck = None
+        self.best_ebuild = None
+        self.installed_ebuilds = None
+        self.name = None
+        self.category = None
+        self.properties = {}
+        self.upgradable = None
+        self.dep_upgradable = None
+
+        self.latest_installed = None
+        self.size = None
+        self.digest_file = None
+        self.in_world = False
+        self.world_version = None
+        self.is_checked = False
+        self.deprecated = False
+        self.unavailable = []
+        self.versions = None
+
+
+def build(cls, names):
+    """Creates a package for each name as DatabaseReader.add_pkg() does"""
+    packages = []
+    for full_name in names:
+        data = cls(full_name)
+        data.deprecated = False
+        packages.append(data)
+    return packages
+
+
+def measure(cls, names):
+    """Returns the bytes allocated per package by build()"""
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        packages = build(cls, names)
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    # the list holding them is not part of a package
+    return (after - before - sys.getsizeof(packages)) / float(len(names))
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = "Measure the memory use of Package")
+    parser.add_argument("-n", "--nodes", type = int, default = 20000)
+    parser.add_argument("-r", "--repeat", type = int, default = 3)
+    parser.add_argument("--limit", type = float, default = None,
+            help = "exit with status 1 if a Package takes more than this many bytes")
+    args = parser.parse_args(argv)
+
+    names = synthetic.make_tree(args.nodes, 0)[0]
+    benchmarks.init(synthetic)
+    from porthole.db.package import Package
+
+    status = 0
+    for name, cls in [("Package", Package), ("plain class", PlainPackage)]:
+        size = measure(cls, names)
+        seconds = benchmarks.best_of(lambda: build(cls, names), args.repeat)
+        benchmarks.report("%s, %d nodes" %(name, args.nodes), seconds, args.nodes)
+        print("%-40s %10.0f bytes per package" %("", size))
+        if cls is Package and args.limit is not None and size > args.limit:
+            print("  ** REGRESSION: limit was %.0f bytes" %args.limit, file=sys.stderr)
+            status = 1
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+
+'''
+    Porthole Benchmarks: synthetic portage library
+    A stand-in for backends.portage_lib serving a generated tree,
+    so db building can be timed without a real portage tree.
+
+    Copyright (C) 2003 - 2009 Fredrik Arnerup, Daniel G. Taylor
+    Brian Dolbec, Wm. F. Wheeler, Tommy Iorns
+
+    This program is free software; you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation; either version 2 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program; if not, write to the Free Software
+    Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+'''
+
+import random
+import tempfile
+
+
+class SyntheticSettings(object):
+    """The subset of PortageSettings the db code uses"""
+
+    def __init__(self):
+        # an empty dir, so no sync timestamp or user configs are found
+        self.portdir = tempfile.mkdtemp(prefix="porthole-bench-")
+        self.portdir_overlay = ''
+        self.config_root = self.portdir
+        self.user_config_dir = "etc/portage"
+        self._world = frozenset()
+        self.world_version = 0
+
+    def get_world(self):
+        return self._world
+
+    def reload_world(self):
+        self.world_version += 1
+
+
+settings = SyntheticSettings()
+_allnodes = []
+_installed = {}
+
+
+def make_tree(nodes = 20000, installed = 2000, deprecated = 20, world = 200, seed = 0):
+    """(Re)generates the synthetic tree.
+    installed packages are picked from the tree, plus deprecated ones
+    that are only in the vdb"""
+    global _allnodes, _installed
+    rand = random.Random(seed)
+    categories = ["%s-%s" %(rand.choice(["app", "dev", "sys", "net", "media", "x11"]), i)
+                    for i in range(160)]
+    _allnodes = ["%s/pkg%05d" %(rand.choice(categories), i) for i in range(nodes)]
+    picked = rand.sample(_allnodes, installed)
+    picked += ["%s/gone%03d" %(rand.choice(categories), i) for i in range(deprecated)]
+    _installed = {}
+    for cp in picked:
+        _installed[cp] = ["%s-1.%d" %(cp, rand.randint(0, 9))]
+    settings._world = frozenset(rand.sample(picked, min(world, len(picked))))
+    settings.world_version += 1
+    return _allnodes[:], sorted(_installed)
+
+
+def get_allnodes():
+    return _allnodes[:]
+
+def get_installed_list():
+    return list(_installed)
+
+def get_installed_cpvs():
+    return dict((cp, cpvs[:]) for cp, cpvs in _installed.items())
+
+def get_installed(package_name):
+    return _installed.get(package_name, [])[:]
+
+def get_vdb_mtime():
+    return 0.0
+
+def get_versions(full_name, include_masked = True):
+    return ["%s-1.%d" %(full_name, i) for i in range(3)]
+
+def get_name(full_name):
+    return full_name.split('/')[1]
+
+def get_category(full_name):
+    return full_name.split('/')[0]
@@ -0,0 +1,228 @@
+#!/usr/bin/env python
+
+'''
+    Porthole Benchmarks: terminal output tokenizing
+    Times feeding a recorded build log through the terminal's
+    OutputTokenizer, against the old char at a time loop, and checks
+    both produce the same buffer updates.  Without a log a gcc like
+    one with colour escapes, CR-LF line ends and a spinner is generated.
+
+        python -m porthole.benchmarks.terminal_output [--log file] [--size MB] [--limit seconds]
+
+    Copyright (C) 2003 - 2009 Fredrik Arnerup, Daniel G. Taylor
+    Brian Dolbec, Wm. F. Wheeler, Tommy Iorns
+
+    This program is free software; you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation; either version 2 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program; if not, write to the Free Software
+    Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+'''
+
+import argparse
+import random
+import sys
+
+from porthole import benchmarks
+from porthole.terminal.constants import TAB_PROCESS
+from porthole.terminal.tokenizer import OutputTokenizer
+
+# what the ProcessOutputReader hands to update() at a time
+CHUNK_SIZE = 4096
+
+
+class RecordingTerm(object):
+    """Stands in for the TerminalNotebook, records the calls"""
+
+    def __init__(self):
+        self.calls = []
+
+    def append(self, tab, text, tag = None):
+        self.calls.append(('append', text))
+
+    def overwrite(self, tab, text, tag = None):
+        self.calls.append(('overwrite', text))
+
+    def parse_escape_sequence(self, sequence):
+        self.calls.append(('escape', sequence))
+
+
+class Tokenizer(OutputTokenizer):
+    """The tokenizer with ProcessManager.newline() reduced to
+    its buffer updates"""
+
+    def __init__(self):
+        self.term = RecordingTerm()
+        self.LF_check = True
+        self.lines = 0
+        self.reset_tokenizer()
+        # forced writes depend on a timer, leave them out
+        self.force_buffer_write = False
+
+    def newline(self):
+        if self.overwrite_till_nl:
+            self.term.overwrite(TAB_PROCESS, self.line_buffer[:-1])
+            self.term.append(TAB_PROCESS, '\n')
+            self.overwrite_till_nl = False
+        else:
+            self.term.append(TAB_PROCESS, self.process_buffer)
+        self.b_flag = False
+        self.process_buffer = ''
+        self.line_buffer = ''
+        self.lines += 1
+
+
+class CharTokenizer(Tokenizer):
+    """The char at a time loop OutputTokenizer replaced"""
+
+    def feed(self, text):
+        for char in text:
+            ord_char = ord(char)
+            if self.cr_flag:
+                if (self.LF_check and ord_char != 10):
+                    if self.first_cr:
+                        self.term.append(TAB_PROCESS, self.process_buffer, None)
+                        self.first_cr = False
+                        self.overwrite_till_nl = True
+                        self.process_buffer = ''
+                        self.line_buffer = ''
+                    else:
+                        self.term.overwrite(TAB_PROCESS, self.process_buffer, None)
+                        self.process_buffer = ''
+                        self.line_buffer = ''
+                else:
+                    self.first_cr = True
+                self.cr_flag = False
+            if self.catch_seq and ord_char != 27:
+                self.escape_seq += char
+                if self.escape_seq.startswith('['):
+                    if 63 <= ord_char <= 90 or 96 <= ord_char <= 126:
+                        self.catch_seq = False
+                        self.term.parse_escape_sequence(self.escape_seq)
+                        self.escape_seq = ''
+                elif self.escape_seq.startswith(']'):
+                    if ord_char == 7 or self.escape_seq.endswith('\x1b\\'):
+                        self.catch_seq = False
+                        self.term.parse_escape_sequence(self.escape_seq)
+                        self.escape_seq = ''
+                elif self.escape_seq.startswith('k'):
+                    if self.escape_seq.endswith('\x1b\\'):
+                        self.catch_seq = False
+                        self.term.parse_escape_sequence(self.escape_seq)
+                        self.escape_seq = ''
+                else:
+                    self.catch_seq = False
+                    self.term.parse_escape_sequence(self.escape_seq)
+                    self.escape_seq = ''
+            elif ord_char == 27:
+                if self.escape_seq.startswith("k"):
+                    self.escape_seq += char
+                else:
+                    self.catch_seq = True
+                    self.term.append(TAB_PROCESS, self.process_buffer, None)
+                    self.process_buffer = ''
+            elif char == '\b':
+                if self.lastchar != '\b':
+                    if not self.b_flag:
+                        self.term.append(TAB_PROCESS, self.line_buffer)
+                    else:
+                        self.term.overwrite(TAB_PROCESS, self.line_buffer)
+                self.line_buffer = self.line_buffer[:-1]
+                self.b_flag = True
+                self.overwrite_till_nl = True
+            elif ord_char == 13:
+                self.cr_flag = True
+            elif 32 <= ord_char <= 127 or ord_char == 10:
+                self.process_buffer += char
+                self.line_buffer += char
+                if ord_char == 10:
+                    self.newline()
+            self.lastchar = char
+
+
+def synthetic_log(size, seed = 0):
+    """Returns about size chars of emerge output"""
+    rand = random.Random(seed)
+    words = ['-O2', '-pipe', '-march=native', '-fPIC', '-DHAVE_CONFIG_H', '-I.',
+             '-I../include', '-Wall', '-c', '-o', 'x86_64-pc-linux-gnu-gcc',
+             'libtool:', 'compile:', '-MT', '-MD', '-MP', '-g', '-std=gnu99']
+    parts = []
+    length = 0
+    while length < size:
+        choice = rand.random()
+        if choice < 0.8:
+            line = ' '.join(rand.choice(words) for x in range(rand.randint(5, 40)))
+            line += ' src/file%d.c\r\n' %rand.randint(0, 999)
+        elif choice < 0.85:
+            line = 'src/file%d.c:%d: warning: unused variable \u2018x%d\u2019\r\n' \
+                    %(rand.randint(0, 999), rand.randint(1, 2000), rand.randint(0, 99))
+        elif choice < 0.9:
+            line = '\x1b[32;01m * \x1b[39;49;00mChecking for feature %d ...\x1b[34;01m [ ok ]\x1b[0m\r\n' \
+                    %rand.randint(0, 999)
+        elif choice < 0.95:
+            line = '\x1b]2;emerge: (1 of 3) building\x07>>> Compiling source in /var/tmp/portage\r\n'
+        else:
+            line = 'Updating Portage Cache: ' + ''.join('%3d%%\b\b\b\b' %x for x in range(0, 101, 5)) + '\r\n'
+        parts.append(line)
+        length += len(line)
+    return ''.join(parts)
+
+
+def run(tokenizer_class, text):
+    tokenizer = tokenizer_class()
+    for pos in range(0, len(text), CHUNK_SIZE):
+        tokenizer.feed(text[pos:pos + CHUNK_SIZE])
+    return tokenizer
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = "Time terminal output tokenizing")
+    parser.add_argument("--log", default = None,
+            help = "recorded process output, eg. a saved porthole terminal log")
+    parser.add_argument("--size", type = float, default = 8,
+            help = "MB of output to generate when no log is given")
+    parser.add_argument("-r", "--repeat", type = int, default = 3)
+    parser.add_argument("--limit", type = float, default = None,
+            help = "exit with status 1 if the tokenizer exceeds this many seconds")
+    args = parser.parse_args(argv)
+
+    if args.log:
+        _file = open(args.log, "rb")
+        try:
+            text = _file.read().decode("utf_8", "replace")
+        finally:
+            _file.close()
+    else:
+        text = synthetic_log(int(args.size * 1e6))
+    size = len(text)
+
+    seconds = benchmarks.best_of(lambda: run(Tokenizer, text), args.repeat)
+    status = benchmarks.report("OutputTokenizer %.1f MB (chars)" %(size / 1e6), seconds, size, args.limit)
+    seconds = benchmarks.best_of(lambda: run(CharTokenizer, text), args.repeat)
+    benchmarks.report("char at a time loop", seconds, size)
+
+    new = run(Tokenizer, text)
+    old = run(CharTokenizer, text)
+    print("%d lines, %d buffer calls" %(new.lines, len(new.term.calls)))
+    if new.term.calls != old.term.calls:
+        for x, (a, b) in enumerate(zip(new.term.calls, old.term.calls)):
+            if a != b:
+                print("  ** MISMATCH at call %d: %r != %r" %(x, a, b), file = sys.stderr)
+                break
+        else:
+            print("  ** MISMATCH: %d != %d calls" %(len(new.term.calls), len(old.term.calls)),
+                    file = sys.stderr)
+        status = 1
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+
+'''
+    Porthole Benchmarks: version sorting
+    Times sorting with backends.version_sort's VersionKey against
+    portage.vercmp(), and checks that both give the same order.
+    The versions of the installed portage tree are used if there is
+    one, generated versions otherwise.
+
+        python -m porthole.benchmarks.version_sort [-n versions] [--synthetic] [--limit seconds]
+
+    Copyright (C) 2003 - 2009 Fredrik Arnerup, Daniel G. Taylor
+    Brian Dolbec, Wm. F. Wheeler, Tommy Iorns
+
+    This program is free software; you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation; either version 2 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program; if not, write to the Free Software
+    Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+'''
+
+import argparse
+import functools
+import random
+import sys
+
+from porthole import benchmarks
+
+try:
+    import portage
+except ImportError:
+    portage = None
+
+
+def tree_versions():
+    """Returns the versions of all ebuilds in the portage tree"""
+    versions = []
+    for cpv in portage.db[portage.root]["porttree"].dbapi.cpv_all():
+        parts = portage.catpkgsplit(cpv)
+        if parts:
+            version = parts[2]
+            if parts[3] != 'r0':
+                version += '-' + parts[3]
+            versions.append(version)
+    return versions
+
+
+def synthetic_versions(count, seed = 0):
+    """Returns count generated versions, with the odd widths and
+    suffixes real trees have"""
+    rand = random.Random(seed)
+    components = ['0', '1', '2', '3', '9', '10', '12', '01', '05', '007', '123', '2011', '20110111']
+    versions = []
+    for x in range(count):
+        version = str(rand.randint(0, 30))
+        for y in range(rand.randint(0, 4)):
+            version += '.' + rand.choice(components)
+        if rand.random() < 0.1:
+            version += rand.choice('abcz')
+        for y in range(rand.choice([0, 0, 0, 1, 1, 2])):
+            version += '_' + rand.choice(['alpha', 'beta', 'pre', 'rc', 'p']) \
+                    + rand.choice(['', '1', '2', '10', '20110101'])
+        if rand.random() < 0.3:
+            version += '-r' + str(rand.randint(0, 12))
+        versions.append(version)
+    return versions
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = "Time version sorting")
+    parser.add_argument("-n", "--versions", type = int, default = 50000,
+            help = "number of versions, a sample of the tree's or generated")
+    parser.add_argument("-r", "--repeat", type = int, default = 3)
+    parser.add_argument("--synthetic", action = "store_true",
+            help = "use generated versions even if portage is installed")
+    parser.add_argument("--limit", type = float, default = None,
+            help = "exit with status 1 if sorting with VersionKey exceeds this many seconds")
+    args = parser.parse_args(argv)
+
+    from porthole.backends import version_sort
+
+    versions = []
+    if portage is not None and not args.synthetic:
+        try:
+            versions = tree_versions()
+        except Exception as e:
+            print("could not read the portage tree (%s), using generated versions" %str(e))
+        if len(versions) > args.versions:
+            versions = random.Random(0).sample(versions, args.versions)
+    if not versions:
+        versions = synthetic_versions(args.versions)
+    random.Random(1).shuffle(versions)
+    count = len(versions)
+
+    def cold_keys():
+        version_sort.key_cache.clear()
+        for version in versions:
+            version_sort.version_key(version)
+
+    def key_sort():
+        return sorted(versions, key = version_sort.version_key)
+
+    seconds = benchmarks.best_of(cold_keys, args.repeat)
+    benchmarks.report("version_key() %d uncached" %count, seconds, count)
+    seconds = benchmarks.best_of(key_sort, args.repeat)
+    status = benchmarks.report("sorted() on cached VersionKeys", seconds, count, args.limit)
+
+    if portage is None:
+        print("portage is not installed, skipping the vercmp() comparison")
+        return status
+
+    def vercmp_sort():
+        return sorted(versions, key = functools.cmp_to_key(portage.vercmp))
+
+    seconds = benchmarks.best_of(vercmp_sort, args.repeat)
+    benchmarks.report("sorted() with portage.vercmp()", seconds, count)
+    ordered = key_sort()
+    for x in range(1, count):
+        if portage.vercmp(ordered[x - 1], ordered[x]) > 0:
+            print("  ** MISMATCH: %s sorted before %s" %(ordered[x - 1], ordered[x]),
+                    file = sys.stderr)
+            status = 1
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -32,6 +32,171 @@ import re
 from porthole._xml.xmlmgr import XMLManager
 
 
+# the filters of configuration.xml, each with a not-list of exceptions
+FILTERS = ['info', 'warning', 'error', 'caution', 'needaction', 'badpassword']
+# escapes that are not a literal char
+CLASS_ESCAPES = 'sSdDwWbBAZ0123456789'
+ESCAPE_CHARS = {'n': '\n', 't': '\t', 'r': '\r'}
+
+
+class _PatternScanner(object):
+    """Finds the literals a simple regular expression needs to match.
+    scan() returns a set of lowercase strings, one of which is in any
+    (lowercased) string the pattern matches, or None if it can't tell"""
+
+    def __init__(self, pattern):
+        self.pattern = pattern
+        self.pos = 0
+
+    def peek(self):
+        return self.pattern[self.pos:self.pos + 1]
+
+    def scan(self):
+        result = self.alternation()
+        if self.pos != len(self.pattern):
+            return None # unbalanced ')'
+        return result
+
+    def prefix(self):
+        """Returns the lowercase literal an anchored pattern
+        starts with, or ''"""
+        if not self.pattern.startswith('^') or '|' in self.pattern:
+            return ''
+        self.pos = 1
+        run = ''
+        while self.pos < len(self.pattern) and self.peek() not in '()':
+            atom = self.atom()
+            if not isinstance(atom, str):
+                break
+            quantifier = self.peek()
+            if quantifier and quantifier in '?*{':
+                break
+            run += atom
+            if quantifier == '+':
+                break
+        return run
+
+    def alternation(self):
+        branches = [self.sequence()]
+        while self.peek() == '|':
+            self.pos += 1
+            branches.append(self.sequence())
+        if None in branches:
+            return None
+        return set().union(*branches)
+
+    def sequence(self):
+        """Returns the best set of literals of a branch"""
+        candidates = []
+        run = ''
+        while self.pos < len(self.pattern) and self.peek() not in '|)':
+            atom = self.atom()
+            quantifier = self.peek()
+            if quantifier and quantifier in '?*{':
+                # optional, nothing can be required of it
+                self.skip_quantifier()
+                atom = None
+            elif quantifier == '+':
+                self.pos += 1
+                if isinstance(atom, str):
+                    # required once, but not next to what follows
+                    run += atom
+                    atom = None
+            if isinstance(atom, str):
+                run += atom
+                continue
+            if run:
+                candidates.append(set([run]))
+                run = ''
+            if atom:
+                candidates.append(atom)
+        if run:
+            candidates.append(set([run]))
+        if not candidates:
+            return None
+        # the set whose shortest literal is the longest filters best
+        return max(candidates, key = lambda literals: min(len(x) for x in literals))
+
+    def skip_quantifier(self):
+        if self.peek() == '{':
+            end = self.pattern.find('}', self.pos)
+            if end < 0:
+                raise ValueError("unterminated {")
+            self.pos = end + 1
+        else:
+            self.pos += 1
+        if self.peek() == '?': # non greedy
+            self.pos += 1
+
+    def atom(self):
+        """Returns a literal char, a set of literals or None"""
+        char = self.pattern[self.pos]
+        self.pos += 1
+        if char == '(':
+            if self.peek() == '?':
+                if self.pattern.startswith('?:', self.pos):
+                    self.pos += 2
+                elif self.pattern.startswith('?P<', self.pos):
+                    self.pos = self.pattern.index('>', self.pos) + 1
+                else:
+                    raise ValueError("unsupported group")
+            result = self.alternation()
+            if self.peek() != ')':
+                raise ValueError("unterminated group")
+            self.pos += 1
+            return result
+        if char == '[':
+            end = self.pos
+            if self.pattern.startswith('^', end):
+                end += 1
+            end += 1 # a ']' right after '[' or '[^' is a member
+            while self.pattern[end] != ']':
+                if self.pattern[end] == '\\':
+                    end += 1
+                end += 1
+            members = self.pattern[self.pos:end]
+            self.pos = end + 1
+            # [Xx] only differs in case
+            if len(members) == 2 and members[0].lower() == members[1].lower() \
+                    and members[0].isalpha():
+                return members[0].lower()
+            return None
+        if char == '\\':
+            char = self.pattern[self.pos]
+            self.pos += 1
+            if char in CLASS_ESCAPES:
+                return None
+            return ESCAPE_CHARS.get(char, char).lower()
+        if char in '.^$':
+            return None
+        if char in '*+?{':
+            raise ValueError("nothing to repeat")
+        return char.lower()
+
+
+def required_literals(patterns):
+    """Returns (prefixes, literals), lowercase strings one of which is
+    at the start of, or in, every string matching one of patterns,
+    or None if some pattern has neither"""
+    prefixes = set()
+    literals = set()
+    for pattern in patterns:
+        try:
+            prefix = _PatternScanner(pattern).prefix()
+            if prefix:
+                prefixes.add(prefix)
+                continue
+            found = _PatternScanner(pattern).scan()
+        except (ValueError, IndexError):
+            found = None
+        if not found:
+            return None
+        literals |= found
+    # a literal containing another one adds nothing
+    literals = set([x for x in literals if not [y for y in literals if y != x and y in x]])
+    return prefixes, literals
+
+
 class PortholeConfiguration(object):
     """ Holds all of Porthole's developer configurable settings """
     def __init__(self):
@@ -46,96 +211,110 @@ class PortholeConfiguration(object):
         # Handle all the regular expressions.  They will be compiled
         # within this object for the sake of efficiency.
 
-        filterlist = ['info', 'warning', 'error', 'caution', 'needaction', 'badpassword']
-        for filter in filterlist:
+        for filter in FILTERS:
             patternlist = dom.getitem(''.join(['/re_filters/',filter])) # e.g. '/re_filters/info'
-            attrname = ''.join([filter, '_re_list'])
-            setattr(self, attrname, []) # e.g. self.info_re_list = []
-            for regexp in patternlist:
-                getattr(self, attrname).append(re.compile(regexp))
-            patternlist = dom.getitem(''.join(['/re_filters/not',filter])) # e.g. '/re_filters/notinfo'
-            attrname = ''.join([filter, '_re_notlist'])
-            setattr(self, attrname, []) # e.g. self.info_re_notlist = []
-            for regexp in patternlist:
-                getattr(self, attrname).append(re.compile(regexp))
+            notlist = dom.getitem(''.join(['/re_filters/not',filter])) # e.g. '/re_filters/notinfo'
+            setattr(self, filter + '_patterns', patternlist)
+            setattr(self, filter + '_notpatterns', notlist)
+            # e.g. self.info_re_list, self.info_re_notlist
+            setattr(self, filter + '_re_list', [re.compile(regexp) for regexp in patternlist])
+            setattr(self, filter + '_re_notlist', [re.compile(regexp) for regexp in notlist])
+        self.compile_filters()
 
         self.emerge_re = re.compile(dom.getitem('/re_filters/emerge'))
         self.ebuild_re = re.compile(dom.getitem('/re_filters/ebuild'))
         self.merged_re = re.compile(dom.getitem('/re_filters/merged'))
         del dom
 
-    def isInfo(self, teststring):
-        ''' Parse string, return true if it matches info
-            reg exp and its not in the reg exp notlist'''
-        result = False
-        go1 = True
-        for regexp in self.info_re_list:
+    def compile_filters(self):
+        """Combines the filters into one regular expression, matched
+        once per line.  Each filter and not-list is an optional lookahead
+        with a named group, so one match tells all the filters a line is in.
+        A line without any of the literals the filters need is not matched
+        at all"""
+        parts = []
+        for filter in FILTERS:
+            for name, patterns in [(filter, getattr(self, filter + '_patterns')),
+                                   ('not' + filter, getattr(self, filter + '_notpatterns'))]:
+                if patterns:
+                    parts.append('(?:(?=(?P<%s>%s))|)' %(name,
+                            '|'.join(['(?:%s)' %regexp for regexp in patterns])))
+        try:
+            self.filter_re = re.compile(''.join(parts))
+        except (re.error, OverflowError, AssertionError) as e:
+            # eg. back references or inline flags in a pattern
+            print("CONFIGURATION: compile_filters(); can't combine the filters: " + str(e))
+            self.filter_re = None
+        required = required_literals([regexp for filter in FILTERS
+                for regexp in getattr(self, filter + '_patterns')])
+        if required:
+            self.prefilter_prefixes = tuple(required[0])
+            self.prefilter_re = re.compile('|'.join([re.escape(x) for x in
+                    sorted(required[1], key = len, reverse = True)]) or '(?!)')
+        else:
+            self.prefilter_prefixes = ()
+            self.prefilter_re = None
+        self.last_line = None
+        self.last_filters = frozenset()
+
+    def get_filters(self, teststring):
+        """Returns the set of filters teststring is in, e.g. ('info', 'error').
+        The last line is remembered as it is usually tested against
+        several filters in a row"""
+        if teststring == self.last_line:
+            return self.last_filters
+        self.last_filters = self.match_filters(teststring)
+        self.last_line = teststring
+        return self.last_filters
+
+    def match_filters(self, teststring):
+        """get_filters() without remembering the line, safe to
+        call from other threads"""
+        found = set()
+        lower = teststring.lower()
+        if self.prefilter_re is None or lower.startswith(self.prefilter_prefixes) \
+                or self.prefilter_re.search(lower):
+            if self.filter_re is not None:
+                groups = self.filter_re.match(teststring).groupdict()
+                for filter in FILTERS:
+                    if groups.get(filter) is not None and (filter == 'badpassword'
+                            or groups.get('not' + filter) is None):
+                        found.add(filter)
+            else:
+                for filter in FILTERS:
+                    if self._matches(teststring, filter):
+                        found.add(filter)
+        return frozenset(found)
+
+    def _matches(self, teststring, filter):
+        """The filter test get_filters() falls back to"""
+        for regexp in getattr(self, filter + '_re_list'):
             if regexp.match(teststring):
-                for regexpi in self.info_re_notlist:
+                if filter == 'badpassword':
+                    return True
+                for regexpi in getattr(self, filter + '_re_notlist'):
                     if regexpi.match(teststring):
                         # excluded, no match
-                        go1= False
-                        break
-                if go1:
-                    result = True
-                break
-            else:
-                continue
-        return result
+                        return False
+                return True
+        return False
+
+    def isInfo(self, teststring):
+        ''' Parse string, return true if it matches info
+            reg exp and its not in the reg exp notlist'''
+        return 'info' in self.get_filters(teststring)
 
     def isWarning(self, teststring):
         ''' Parse string, return true if it matches warning reg exp '''
-        result = False
-        go1 = True
-        for regexp in self.warning_re_list:
-            if regexp.match(teststring):
-                for regexpi in self.warning_re_notlist:
-                    if regexpi.match(teststring):
-                        # excluded, no match
-                        go1= False
-                        break
-                if go1:
-                    result = True
-                break
-            else:
-                continue
-        return result
+        return 'warning' in self.get_filters(teststring)
 
     def isCaution(self, teststring):
         ''' Parse string, return true if matches caution regexp '''
-        result = False
-        go1 = True
-        for regexp in self.caution_re_list:
-            if regexp.match(teststring):
-                for regexpi in self.caution_re_notlist:
-                    if regexpi.match(teststring):
-                        # excluded, no match
-                        go1= False
-                        break
-                if go1:
-                    result = True
-                break
-            else:
-                continue
-        return result
+        return 'caution' in self.get_filters(teststring)
 
     def isError(self, teststring):
         ''' Parse string, return true if belongs in error tab '''
-        result = False
-        go1 = True
-        for regexp in self.error_re_list:
-            if regexp.match(teststring):
-                for regexpi in self.error_re_notlist:
-                    if regexpi.match(teststring):
-                        # excluded, no match
-                        go1= False
-                        break
-                if go1:
-                    result = True
-                break
-            else:
-                continue
-        return result
+        return 'error' in self.get_filters(teststring)
 
     def isEmerge(self, teststring):
         ''' Parse string, return true if it is the initial emerge line '''
@@ -149,28 +328,8 @@ class PortholeConfiguration(object):
         Returns True if teststring matches the pre-set criteria for notification of an
         action the user is recommended to take, such as etc-update or revdep-rebuild.
         '''
-        result = False
-        go1 = True
-        for regexp in self.needaction_re_list:
-            if regexp.match(teststring):
-                for regexpi in self.needaction_re_notlist:
-                    if regexpi.match(teststring):
-                        # excluded, no match
-                        go1= False
-                        break
-                if go1:
-                    result = True
-                break
-            else:
-                continue
-        return result
+        return 'needaction' in self.get_filters(teststring)
 
     def isBadPassword(self, teststring):
         ''' Parse string, return true if belongs in error tab '''
-        result = False
-        for regexp in self.badpassword_re_list:
-            #print "isBadPassword checking for: ", regexp.pattern
-            if regexp.match(teststring):
-                result = True
-                break #regexp
-        return result
+        return 'badpassword' in self.get_filters(teststring)
@@ -130,7 +130,9 @@ class PortholePreferences:
             ['height', 350],
             ['width_verbose', 500],
             ['all_tabs_use_custom_colors', False],
-            ['font', None]
+            ['font', None],
+            ['max_lines', 20000], # lines kept in each tab, 0 = all
+            ['update_latency', 40] # ms output may wait to be shown, 0 = none
         ]
 
         history = ["",
@@ -269,6 +271,17 @@ class PortholePreferences:
                 value = default
             setattr(self.summary, option, value)
 
+        databaseoptions = [ \
+            ['workers', 0], # worker processes for the db readers, 0 = one per cpu
+        ]
+        self.database = OptionsClass()
+        for option, default in databaseoptions:
+            try:
+                value = dom.getitem(''.join(['/database/', option]))
+            except XMLManagerError:
+                value = default
+            setattr(self.database, option, value)
+
         # Misc. variables
 
         # probably depricated variables, was used for progressbar calc
@@ -401,6 +414,8 @@ class PortholePreferences:
         dom.additem('/window/terminal/font', self.terminal.font)
         dom.additem('/window/terminal/all_tabs_use_custom_colors', \
             self.terminal.all_tabs_use_custom_colors)
+        dom.additem('/window/terminal/max_lines', self.terminal.max_lines)
+        dom.additem('/window/terminal/update_latency', self.terminal.update_latency)
         # generate tag keys from dictionary
         for key in self.TAG_DICT:
             format_list = self.TAG_DICT[key]
@@ -436,6 +451,7 @@ class PortholePreferences:
         dom.additem('/summary/showlicense', self.summary.showlicense)
         dom.additem('/summary/showurl', self.summary.showurl)
         dom.additem('/database/size', self.database_size)
+        dom.additem('/database/workers', self.database.workers)
         #debug.dprint("PREFS: save(); self.dbtime = %d" %self.dbtime)
         #dom.additem('/database/dbtime', self.dbtime)
         #dom.additem('/database/dbtotals', self.dbtotals)
@@ -27,16 +27,21 @@ _id = datetime.datetime.now().microsecond
 print("DATABASE: id initialized to ", _id)
 
 import os
+import stat
 import pickle
 from gi.repository import GObject
 
 from porthole import backends
 from porthole.db.dbreader import DatabaseReader
 from porthole.readers.descriptions import DescriptionReader
+from porthole.readers.revdeps import ReverseDepReader, get_stamp
 from porthole.db.dbbase import DBBase
+from porthole.db.searchindex import SearchIndex
+from porthole.db.descstore import DescriptionStore, DescriptionStoreError, write_store
 from porthole.utils.dispatcher import Dispatcher
 from porthole.backends.utilities import get_sync_info
 from porthole.utils import debug
+from porthole.utils.utils import is_root
 from porthole import config
 
 # Set EPREFIX
@@ -51,23 +56,36 @@ class Database(DBBase):
     def __init__(self, action):
         DBBase.__init__(self)
         self.descriptions = {}
+        # trigram index of the names and descriptions, see SearchIndex
+        self.search_index = None
         self.desc_loaded = False
         self.desc_reloaded = False
         self.db_thread_running = False
         self.db_init_waiting = False
         self.db_init_new_sync = False
         self.db_thread = None
+        # what the packages were read from, see DatabaseReader.get_tree_state()
+        self.tree_state = None
         self.callback = None
         self.desc_callback = None
         self.desc_thread = None
+        # ReverseDepIndex of the installed packages (False) and of the tree (True)
+        self.revdeps = {}
+        self.revdeps_threads = {}
+        # called once the index being read is done
+        self.revdeps_callbacks = {}
         ## get home directory
         ##home = pwd.getpwuid(os.getuid())[5]
-        self._DBFile = EPREFIX + "/var/db/porthole/descriptions.db"
+        self._DBFile = EPREFIX + "/var/db/porthole/descriptions.store"
+        # pickled by older versions, converted by migrate()
+        self._OldDBFile = EPREFIX + "/var/db/porthole/descriptions.db"
         self.valid_sync = False #used for auto-reload disabling
         ##del home
         #if action == NEW:
         self.dispatcher = Dispatcher(self.db_update)
-        self.db_init()
+        # startup is the only time the saved snapshot is trusted,
+        # user requested reloads always rebuild it
+        self.db_init(use_snapshot = True)
         #if action == LOAD:
             #result = self.load()
             #if result < 0:
@@ -110,40 +128,65 @@ class Database(DBBase):
         """saves the db to a file"""
         if self.valid_sync and self.desc_reloaded:
             sync_time, self.valid_sync = get_sync_info()
-            _db = {'sync_date': sync_time, 'descriptions': self.descriptions}
-            debug.dprint("DATABASE: save(); Pickling 'db' to file: " + self._DBFile)
-            # pickle it baby, yeah!
-            pickle.dump(_db, open(self._DBFile, "w"))
-            del _db
+            debug.dprint("DATABASE: save(); writing 'db' to file: " + self._DBFile)
+            try:
+                write_store(self._DBFile, sync_time, self.descriptions, self.search_index)
+            except EnvironmentError as e:
+                debug.dprint("DATABASE: save(); failed to write the file: " + str(e))
 
     def load(self, filename = None):
         """restores the db from a file"""
         debug.dprint("DATABASE: load() loading 'db' from file: " + self._DBFile)
-        _db = None
         current, self.valid_sync = get_sync_info()
-        if self.valid_sync and os.access(self._DBFile, os.F_OK):
-            _db = pickle.load(open(self._DBFile))
-        elif not self.valid_sync:
+        if not self.valid_sync:
             debug.dprint("DATABASE: load(); Current portage tree did Not return a valid sync timestamp, not loading descriptions from the saved file" )
             return -1
-        else:
+        if not os.access(self._DBFile, os.F_OK) and os.access(self._OldDBFile, os.F_OK):
+            self.migrate()
+        if not os.access(self._DBFile, os.F_OK):
             debug.dprint("DATABASE: load(); file does not exist :" + self._DBFile)
             return -1
-        if self.valid_sync and _db['sync_date'] != current:
+        try:
+            store = DescriptionStore(self._DBFile)
+        except DescriptionStoreError as e:
+            debug.dprint("DATABASE: load(); unusable file: " + str(e))
+            return -1
+        if store.sync_date != current:
             debug.dprint("DATABASE: load(); 'db' is out of date")
             return -2
-        self.descriptions = _db['descriptions']
+        # only the file is mapped, descriptions are read as they are used
+        self.descriptions = store
+        self.search_index = SearchIndex(store = store)
         self.desc_loaded = True
         self.desc_mtime = os.stat(self._DBFile).st_mtime
         debug.dprint("DATABASE: load(); file is loaded, mtime = " + str(self.desc_mtime))
-        del _db
         return 1
 
+    def migrate(self):
+        """converts the pickled descriptions.db of older versions.
+        Unpickling runs code from the file, so it is only done as root
+        and for a root owned file nobody else can write to"""
+        if not is_root():
+            debug.dprint("DATABASE: migrate(); not root, leaving " + self._OldDBFile)
+            return
+        info = os.stat(self._OldDBFile)
+        if info.st_uid != os.geteuid() or info.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+            debug.dprint("DATABASE: migrate(); not trusting " + self._OldDBFile)
+            return
+        try:
+            _db = pickle.load(open(self._OldDBFile, "rb"))
+            write_store(self._DBFile, str(_db['sync_date']), _db['descriptions'])
+        except Exception as e:
+            debug.dprint("DATABASE: migrate(); failed: " + str(e))
+            return
+        os.remove(self._OldDBFile)
+        debug.dprint("DATABASE: migrate(); converted " + self._OldDBFile)
+
 
     def set_callback(self, callback):
         self.callback = callback
 
-    def db_init(self, new_sync = False):
+    def db_init(self, new_sync = False, use_snapshot = False):
         if self.db_thread_running:
             self.db_thread_cancell()
             # set the init is waiting flag
@@ -151,7 +194,11 @@ class Database(DBBase):
             self.db_init_new_sync = new_sync
         else:
             self.db_thread_running = True
-            self.db_thread = DatabaseReader(self.dispatcher)
+            old_db = None
+            if new_sync and self.categories:
+                # only add, remove or invalidate what the sync changed
+                old_db = self
+            self.db_thread = DatabaseReader(self.dispatcher, use_snapshot, old_db)
             self.db_thread.start()
             self.db_init_new_sync = False
             if new_sync:
@@ -186,6 +233,8 @@ class Database(DBBase):
             self.db_thread_running = False
             debug.dprint("DATABASE: db_update(); db_thread.join is done...")
             #del self.db  # clean up the old db
+            self.db_thread.invalidate_packages()
+            self.tree_state = self.db_thread.tree_state
             self.db = self.db_thread.get_db()
             self.categories = self.db.categories
             self.list = self.db.list
@@ -196,6 +245,7 @@ class Database(DBBase):
             del self.db  # clean up
             debug.dprint("DATABASE: db_update(); db is updated")
             self.load_descriptions()
+            self.refresh_revdeps()
         if self.db_init_waiting:
             self.db_init_waiting = False
             self.db_init(self.db_init_new_sync)
@@ -230,6 +280,7 @@ class Database(DBBase):
         if self.desc_thread.done:
             # grab the db
             self.descriptions = self.desc_thread.descriptions
+            self.search_index = self.desc_thread.search_index
             if not self.desc_thread.cancelled:
                 self.desc_loaded = True
                 self.desc_reloaded = True
@@ -246,6 +297,53 @@ class Database(DBBase):
                 self.desc_callback(args)
         return True
 
+    def get_dependents(self, full_name, callback = None, tree = False):
+        """Returns [(full_name, ebuilds, kinds),...] of the installed
+        packages that depend on full_name, kinds a mask of revdeps.DEPEND,
+        RDEPEND and PDEPEND.  With tree = True the best ebuild of each
+        package in the tree instead.  While the index is read or updated
+        it answers from the last one, None if there is none yet, and
+        calls callback() once the new one is in place"""
+        index = self.revdeps.get(tree)
+        if tree not in self.revdeps_threads and \
+                (index is None or index.stamp != get_stamp(tree)):
+            self.read_revdeps(tree)
+        if tree in self.revdeps_threads and callback:
+            self.revdeps_callbacks.setdefault(tree, []).append(callback)
+        if index is None:
+            return None
+        return index.get_dependents(full_name)
+
+    def read_revdeps(self, tree = False):
+        """Reads the reverse dependency index in a thread, only the
+        packages that changed if there is one already"""
+        names = None
+        if tree:
+            names = [data.full_name for name, data in self.list]
+        self.revdeps_threads[tree] = ReverseDepReader(self.revdeps.get(tree), tree, names)
+        self.revdeps_threads[tree].start()
+        GObject.timeout_add(100, self.revdeps_thread_update, tree)
+
+    def refresh_revdeps(self):
+        """Updates the reverse dependency indexes read so far, eg.
+        after a merge or a sync"""
+        for tree, index in list(self.revdeps.items()):
+            if tree not in self.revdeps_threads and index.stamp != get_stamp(tree):
+                self.read_revdeps(tree)
+
+    def revdeps_thread_update(self, tree):
+        """ Swaps in the index once it is read """
+        thread = self.revdeps_threads[tree]
+        if not thread.done:
+            return True
+        thread.join()
+        del self.revdeps_threads[tree]
+        if not thread.cancelled:
+            self.revdeps[tree] = thread.index
+        for callback in self.revdeps_callbacks.pop(tree, []):
+            callback()
+        return False
+
     def db_thread_cancell(self):
         if self.db_thread_running:
             self.db_thread.please_die()
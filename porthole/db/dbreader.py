@@ -26,12 +26,30 @@ _id = datetime.datetime.now().microsecond
 print("DBREADER: import id initialized to ", _id)
 
 import os
+import pickle
 import threading
 
 from porthole.utils import debug
+from porthole.utils.utils import is_root, get_user_home_dir
 from porthole.db.package import Package
 from porthole.db.dbbase import DBBase
 from porthole.backends import portage_lib as PMS_LIB
+from porthole.backends.utilities import get_sync_info
+from porthole import config
+
+# Set EPREFIX
+EPREFIX = config.Prefs.EPREFIX
+
+# bump this whenever the snapshot layout changes, old files are then ignored
+SNAPSHOT_VERSION = 1
+
+
+def get_snapshot_file():
+    """Returns the path to the package db snapshot file.
+    The system wide file is used when we can write to it"""
+    if is_root():
+        return EPREFIX + "/var/db/porthole/packages.db"
+    return get_user_home_dir() + "/.porthole/packages.db"
 
 #~ # establish a semaphore for the Database
 #~ Installed_Semaphore = threading.Semaphore()
@@ -45,7 +63,7 @@ from porthole.backends import portage_lib as PMS_LIB
 class DatabaseReader(threading.Thread):
     """Builds the database in a separate thread."""
 
-    def __init__(self, callback):
+    def __init__(self, callback, use_snapshot = False, old_db = None):
         threading.Thread.__init__(self)
         self.setDaemon(1)     # quit even if this thread is still running
         self.id = datetime.datetime.now().microsecond
@@ -63,7 +81,27 @@ class DatabaseReader(threading.Thread):
         #self.new_installed_Semaphore = threading.Semaphore()
         self.installed_list = None
         self.allnodes_length = 0  # used for calculating the progress bar
-        self.world = PMS_LIB.settings.get_world()
+        # if True, try re-using the db saved by a previous run first
+        self.use_snapshot = use_snapshot
+        # the key the snapshot file must match to be re-used
+        self.snapshot_key = None
+        # Package objects of the db being refreshed, keyed by full_name.
+        # copied here so the old db can be swapped out while we run
+        self.old_packages = {}
+        # the get_tree_state() of the old db
+        self.old_tree_state = None
+        if old_db:
+            for packages in old_db.categories.values():
+                for data in packages.values():
+                    self.old_packages[data.full_name] = data
+            self.old_tree_state = old_db.tree_state
+        self.installed_cpvs = None
+        self.refresh_count = {"added": 0, "reused": 0, "invalidated": 0}
+        # (profile stamp, mask atoms, ebuild stamps) the db is read from
+        self.tree_state = None
+        self.profiles_changed = True
+        # [(Package, tree, installed),...] for invalidate_packages()
+        self.invalidated = []
 
     def please_die(self):
         """ Tell the thread to die """
@@ -77,7 +115,19 @@ class DatabaseReader(threading.Thread):
         """Read portage's database and store it nicely"""
         debug.dprint("DBREADER: read_db(); process id = %d *****************" %(os.getpid()))
 
+        self.snapshot_key = self.get_snapshot_key()
+        # read each time, it is what the next refresh compares against
+        self.tree_state = self.get_tree_state()
+        if self.use_snapshot and self.load_snapshot():
+            return
         self.get_installed()
+        if self.old_packages:
+            debug.dprint("DBREADER: read_db(); refreshing %d packages" %len(self.old_packages))
+            self.installed_cpvs = PMS_LIB.get_installed_cpvs()
+            if self.old_tree_state is not None and self.tree_state is not None:
+                self.profiles_changed = (self.old_tree_state[0] != self.tree_state[0] or
+                        self.old_tree_state[1] is None or self.tree_state[1] is None)
+            debug.dprint("DBREADER: read_db(); profiles changed: %s" %str(self.profiles_changed))
         try:
             debug.dprint("DBREADER: read_db(); getting allnodes package list")
             allnodes = PMS_LIB.get_allnodes()
@@ -102,7 +152,7 @@ class DatabaseReader(threading.Thread):
                 count = 0
             count += self.add_pkg(entry)
         # now time to add any remaining installed packages not in the portage tree
-        self.db.deprecated_list = self.installed_list[:]
+        self.db.deprecated_list = sorted(self.installed_list)
         #debug.dprint("DBREADER: read_db(); deprecated installed packages = " + str(self.db.deprecated_list))
         for entry in self.db.deprecated_list:  # remaining installed packages no longer in the tree
             if self.cancelled: self.done = True; return
@@ -120,9 +170,110 @@ class DatabaseReader(threading.Thread):
         debug.dprint("DBREADER: read_db(); end of list build; final nodecount = %d categories = %d sort is next" \
                 %(self.nodecount, len(self.db.categories)))
         #debug.dprint(self.db)
+        if self.installed_cpvs is not None:
+            debug.dprint("DBREADER: read_db(); refresh done: %s, removed = %d"
+                    %(str(self.refresh_count), len(self.old_packages)))
+            self.old_packages = {}
         self.db.list = self.sort(self.db.list)
         #debug.dprint(self.db)
         debug.dprint("DBREADER: read_db(); end of sort, finished")
+        self.save_snapshot()
+
+    def get_tree_state(self):
+        """Returns the (profile stamp, mask atoms, ebuild stamps) of the
+        tree, for telling which packages a sync changed, or None"""
+        try:
+            return (PMS_LIB.get_profile_stamp(), PMS_LIB.get_mask_atoms(),
+                    PMS_LIB.get_ebuild_stamps())
+        except Exception as e:
+            debug.dprint("DBREADER: get_tree_state(); failed: " + str(e))
+            return None
+
+    def get_snapshot_key(self):
+        """Returns the (sync timestamp, vdb mtime, overlays) tuple
+        identifying the state of the tree the db is built from,
+        or None if the sync timestamp is unusable"""
+        sync_time, valid_sync = get_sync_info()
+        vdb_mtime = PMS_LIB.get_vdb_mtime()
+        if not valid_sync or vdb_mtime is None:
+            return None
+        return (sync_time, vdb_mtime, PMS_LIB.settings.portdir_overlay)
+
+    def load_snapshot(self):
+        """Re-creates the db from the snapshot file saved by a previous run.
+        Returns True if it was loaded, False if a full rebuild is needed"""
+        if self.snapshot_key is None:
+            debug.dprint("DBREADER: load_snapshot(); no valid sync timestamp or vdb, skipping")
+            return False
+        filename = get_snapshot_file()
+        try:
+            _file = open(filename, 'rb')
+            try:
+                snapshot = pickle.load(_file)
+            finally:
+                _file.close()
+        except (IOError, OSError) as e:
+            debug.dprint("DBREADER: load_snapshot(); could not read: " + str(e))
+            return False
+        except Exception as e:
+            debug.dprint("DBREADER: load_snapshot(); corrupt snapshot: " + str(e))
+            return False
+        if not isinstance(snapshot, dict) or \
+                snapshot.get('version') != SNAPSHOT_VERSION:
+            debug.dprint("DBREADER: load_snapshot(); unknown snapshot version")
+            return False
+        if snapshot['key'] != self.snapshot_key:
+            debug.dprint("DBREADER: load_snapshot(); snapshot is out of date")
+            return False
+        debug.dprint("DBREADER: load_snapshot(); loading from: " + filename)
+        self.installed_list = set(snapshot['installed'])
+        deprecated = snapshot['deprecated']
+        nodes = snapshot['list']
+        self.allnodes_length = len(nodes)
+        count = 0
+        for entry in nodes:
+            if self.cancelled: self.done = True; return True
+            if count == 250:  # update the statusbar
+                self.nodecount += count
+                self.callback({"nodecount": self.nodecount, "allnodes_length": self.allnodes_length,
+                                "done": self.done, 'db_thread_error': self.error})
+                count = 0
+            count += self.add_pkg(entry, deprecated=(entry in deprecated))
+        self.nodecount += count
+        self.db.deprecated_list = sorted(deprecated)
+        # the saved list was stored already sorted
+        debug.dprint("DBREADER: load_snapshot(); done, nodecount = %d" %self.nodecount)
+        return True
+
+    def save_snapshot(self):
+        """Saves the minimum needed to re-create the db to the snapshot file"""
+        if self.snapshot_key is None or self.cancelled:
+            return
+        deprecated = set(self.db.deprecated_list)
+        installed = []
+        for packages in self.db.installed.values():
+            installed.extend([pkg.full_name for pkg in packages.values()])
+        snapshot = {'version': SNAPSHOT_VERSION,
+                    'key': self.snapshot_key,
+                    'list': [data.full_name for name, data in self.db.list],
+                    'installed': installed,
+                    'deprecated': deprecated}
+        filename = get_snapshot_file()
+        tmpname = filename + ".tmp"
+        debug.dprint("DBREADER: save_snapshot(); saving to: " + filename)
+        try:
+            dirname = os.path.dirname(filename)
+            if not os.access(dirname, os.F_OK):
+                os.makedirs(dirname)
+            _file = open(tmpname, 'wb')
+            try:
+                pickle.dump(snapshot, _file, pickle.HIGHEST_PROTOCOL)
+            finally:
+                _file.close()
+            # replace it in one step so a reader never sees a partial file
+            os.rename(tmpname, filename)
+        except (IOError, OSError) as e:
+            debug.dprint("DBREADER: save_snapshot(); failed: " + str(e))
 
     def add_pkg(self, entry, deprecated = False):
             #debug.dprint("DBREADER: add_pkg(); entry = %s" %entry)
@@ -134,7 +285,12 @@ class DatabaseReader(threading.Thread):
                     name.startswith('.') or \
                     name in ['timestamp.x', 'metadata.xml', 'CVS'] ):
                 return 0
-            data = Package(entry)
+            data = self.old_packages.pop(entry, None)
+            if data is None:
+                data = Package(entry)
+                self.refresh_count["added"] += 1
+            else:
+                self.refresh_package(data)
             data.deprecated = deprecated
             if self.cancelled: self.done = True; return 0
             #self.db.categories.setdefault(category, {})[name] = data;
@@ -153,16 +309,48 @@ class DatabaseReader(threading.Thread):
                 self.db.installed_pkg_count[category] += 1
                 self.db.installed_count += 1
                 #debug.dprint("DBREADER: add_pkg(); adding %s to db.list" %name)
-                # remove entry from installed list since it has been added to the db
-                self.installed_list.remove(entry)
+                # remove entry from installed set since it has been added to the db
+                self.installed_list.discard(entry)
             self.db.list.append((name, data))
             self.db.pkg_count[category] += 1
             return 1
 
+    def refresh_package(self, data):
+        """Works out which cached info of a re-used Package the sync
+        or a merge changed, untouched ones are kept as is.  It is
+        dropped by invalidate_packages(), in the gui thread"""
+        entry = data.full_name
+        installed = data.installed_ebuilds is not None and \
+                set(data.installed_ebuilds) != set(self.installed_cpvs.get(entry, []))
+        tree = self.tree_changed(entry)
+        if tree or installed:
+            self.invalidated.append((data, tree, installed))
+            self.refresh_count["invalidated"] += 1
+        else:
+            self.refresh_count["reused"] += 1
+
+    def tree_changed(self, entry):
+        """Returns True if the sync may have changed the tree data of
+        entry: its ebuilds or masks changed, or those of the profiles"""
+        if self.profiles_changed:
+            return True
+        old_masks, old_stamps = self.old_tree_state[1:]
+        masks, stamps = self.tree_state[1:]
+        return (stamps.get(entry) != old_stamps.get(entry) or
+                masks.get(entry) != old_masks.get(entry))
+
+    def invalidate_packages(self):
+        """Drops the cached info refresh_package() found changed.
+        Called in the gui thread, which may be showing the packages"""
+        for data, tree, installed in self.invalidated:
+            data.invalidate(tree, installed)
+        self.invalidated = []
+
     def get_installed(self):
-        """get a new installed list"""
+        """get a new installed set"""
         debug.dprint("DBREADER: get_installed();")
-        self.installed_list = PMS_LIB.get_installed_list()
+        # a set, add_pkg() checks every node against it
+        self.installed_list = set(PMS_LIB.get_installed_list())
         self.installed_count = len(self.installed_list)
 
     def run(self):
@@ -0,0 +1,258 @@
+#!/usr/bin/env python
+
+'''
+    Porthole DescriptionStore class
+    A read only, memory mapped file of the package descriptions
+    and their search index.  Nothing is read until it is looked up.
+
+    Copyright (C) 2003 - 2009 Fredrik Arnerup, Daniel G. Taylor
+    Brian Dolbec, Wm. F. Wheeler, Tommy Iorns
+
+    This program is free software; you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation; either version 2 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program; if not, write to the Free Software
+    Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+'''
+
+# File layout, all offsets are from the start of the file:
+#
+#   header      HEADER, then the utf_8 sync date, padded to 8 bytes
+#   3 tables    descriptions, name trigrams and description trigrams
+#
+# and each table, padded to 8 bytes:
+#
+#   SECTION     count, size of the keys, size of the values
+#   count + 1   uint32 key offsets
+#   count + 1   uint32 value offsets
+#   keys        utf_8, sorted, padded to 4 bytes
+#   values      descriptions (utf_8) or trigram postings (uint32 ids)
+#
+# Sorting the utf_8 keys gives the same order as sorting the strings,
+# so the description ids match the SearchIndex name ids.
+
+import os
+import mmap
+import struct
+from array import array
+
+from porthole.db.searchindex import SearchIndex
+from porthole.utils import debug
+
+MAGIC = b'PHDESCDB'
+# bump this whenever the file layout changes
+STORE_VERSION = 1
+# written in native byte order, a file from another arch fails this check
+BYTEORDER = 0x01020304
+HEADER = struct.Struct("=8sIIIIII")
+SECTION = struct.Struct("=III")
+
+
+class DescriptionStoreError(Exception):
+    """The file is missing, truncated or of another version"""
+    pass
+
+
+def _padding(size, align = 8):
+    return b'\0' * (-size % align)
+
+
+def pack_table(items):
+    """Returns the file image of a table of (key, value) byte strings,
+    items must be sorted by key"""
+    key_offsets = array('I', [0])
+    value_offsets = array('I', [0])
+    keys = []
+    values = []
+    for key, value in items:
+        keys.append(key)
+        values.append(value)
+        key_offsets.append(key_offsets[-1] + len(key))
+        value_offsets.append(value_offsets[-1] + len(value))
+    keys = b''.join(keys)
+    values = b''.join(values)
+    data = b''.join([SECTION.pack(len(items), len(keys), len(values)),
+            key_offsets.tobytes(), value_offsets.tobytes(),
+            keys, _padding(len(keys), 4), values])
+    return data + _padding(len(data))
+
+
+def write_store(filename, sync_date, descriptions, index = None):
+    """Writes the {name: description} dictionary and its SearchIndex
+    to filename.  The file is replaced atomically so readers that
+    still have the old one mapped are not disturbed"""
+    names = sorted(descriptions)
+    if index is None or list(index.names) != names:
+        index = SearchIndex(descriptions)
+    sync = sync_date.encode('utf_8')
+    tables = [
+        pack_table([(name.encode('utf_8'), (descriptions[name] or '').encode('utf_8'))
+                for name in names]),
+        pack_table(sorted((gram.encode('utf_8'), ids.tobytes())
+                for gram, ids in index.name_grams.items())),
+        pack_table(sorted((gram.encode('utf_8'), ids.tobytes())
+                for gram, ids in index.desc_grams.items()))
+    ]
+    offset = HEADER.size + len(sync)
+    offset += len(_padding(offset))
+    offsets = []
+    for table in tables:
+        offsets.append(offset)
+        offset += len(table)
+    header = HEADER.pack(MAGIC, STORE_VERSION, BYTEORDER, len(sync), *offsets)
+    tmp_name = filename + ".tmp"
+    _file = open(tmp_name, "wb")
+    try:
+        _file.write(header)
+        _file.write(sync)
+        _file.write(_padding(len(header) + len(sync)))
+        for table in tables:
+            _file.write(table)
+    finally:
+        _file.close()
+    # shared by all users
+    os.chmod(tmp_name, 0o644)
+    os.rename(tmp_name, filename)
+    debug.dprint("DESCSTORE: write_store(); %d descriptions written to %s"
+            %(len(names), filename))
+
+
+class StringTable(object):
+    """A sorted table of (key, value) byte strings in a mapped buffer"""
+
+    def __init__(self, buf, offset):
+        count, keys_size, values_size = SECTION.unpack_from(buf, offset)
+        size = 4 * (count + 1)
+        pos = offset + SECTION.size
+        end = pos + 2 * size + keys_size + len(_padding(keys_size, 4)) + values_size
+        if end > len(buf):
+            raise DescriptionStoreError("table at %d is truncated" %offset)
+        self.count = count
+        self.key_offsets = buf[pos:pos + size].cast('I')
+        pos += size
+        self.value_offsets = buf[pos:pos + size].cast('I')
+        pos += size
+        self.keys = buf[pos:pos + keys_size]
+        pos += keys_size + len(_padding(keys_size, 4))
+        self.values = buf[pos:pos + values_size]
+
+    def __len__(self):
+        return self.count
+
+    def key(self, i):
+        return self.keys[self.key_offsets[i]:self.key_offsets[i + 1]]
+
+    def value(self, i):
+        return self.values[self.value_offsets[i]:self.value_offsets[i + 1]]
+
+    def find(self, key):
+        """Returns the index of the (bytes) key, or -1"""
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.key(mid).tobytes() < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.count and self.key(lo) == key:
+            return lo
+        return -1
+
+
+class TextView(object):
+    """Read only sequence of the decoded keys or values of a StringTable"""
+
+    def __init__(self, table, values = False, lower = False):
+        self.table = table
+        self._get = values and table.value or table.key
+        self.lower = lower
+
+    def __len__(self):
+        return len(self.table)
+
+    def __getitem__(self, i):
+        if not 0 <= i < len(self.table):
+            raise IndexError(i)
+        text = str(self._get(i), 'utf_8')
+        if self.lower:
+            return text.lower()
+        return text
+
+    def __iter__(self):
+        for i in range(len(self.table)):
+            yield self[i]
+
+
+class GramTable(object):
+    """{trigram: ids} lookups straight from the mapped postings"""
+
+    def __init__(self, table):
+        self.table = table
+
+    def __len__(self):
+        return len(self.table)
+
+    def get(self, gram, default = None):
+        i = self.table.find(gram.encode('utf_8'))
+        if i < 0:
+            return default
+        return self.table.value(i).cast('I')
+
+
+class DescriptionStore(object):
+    """Read only {name: description} mapping backed by a file written
+    with write_store().  Opening it only maps the file, descriptions
+    are decoded when they are looked up"""
+
+    def __init__(self, filename):
+        try:
+            _file = open(filename, "rb")
+            try:
+                self._map = mmap.mmap(_file.fileno(), 0, access = mmap.ACCESS_READ)
+            finally:
+                _file.close()
+            buf = memoryview(self._map)
+            magic, version, byteorder, sync_size, desc_offset, names_offset, \
+                grams_offset = HEADER.unpack_from(buf, 0)
+            if magic != MAGIC or version != STORE_VERSION or byteorder != BYTEORDER:
+                raise DescriptionStoreError("%s: unknown format or version" %filename)
+            self.sync_date = str(buf[HEADER.size:HEADER.size + sync_size], 'utf_8')
+            self.table = StringTable(buf, desc_offset)
+            self.name_grams = GramTable(StringTable(buf, names_offset))
+            self.desc_grams = GramTable(StringTable(buf, grams_offset))
+        except (EnvironmentError, ValueError, TypeError, struct.error) as e:
+            raise DescriptionStoreError("%s: %s" %(filename, str(e)))
+        self.names = TextView(self.table)
+        self.desc_texts = TextView(self.table, values = True, lower = True)
+
+    def __len__(self):
+        return len(self.table)
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def keys(self):
+        return list(self.names)
+
+    def __contains__(self, name):
+        return self.table.find(name.encode('utf_8')) >= 0
+
+    def __getitem__(self, name):
+        i = self.table.find(name.encode('utf_8'))
+        if i < 0:
+            raise KeyError(name)
+        return str(self.table.value(i), 'utf_8')
+
+    def get(self, name, default = None):
+        try:
+            return self[name]
+        except KeyError:
+            return default
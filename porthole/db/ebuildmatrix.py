@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+
+'''
+    Porthole EbuildMatrix class
+    The versions of a package with everything the Summary tab shows
+    about each of them, read from portage once and kept on the Package
+
+    Copyright (C) 2003 - 2009 Fredrik Arnerup, Daniel G. Taylor
+    Brian Dolbec, Wm. F. Wheeler, Tommy Iorns
+
+    This program is free software; you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation; either version 2 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program; if not, write to the Free Software
+    Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+'''
+
+from porthole.backends.version_sort import ver_sort
+from porthole.utils import debug
+from porthole import backends
+
+
+class EbuildRow(object):
+    """What the Summary tab shows of one ebuild"""
+
+    __slots__ = ('ebuild', 'version', 'slot', 'overlay', 'overlay_name',
+                 'obsolete', 'keywords', 'hardmasked', 'nonmasked',
+                 'status', 'profile_masked', 'reason')
+
+    def __init__(self, ebuild):
+        self.ebuild = ebuild
+        self.version = backends.portage_lib.get_version(ebuild)
+        self.slot = ''
+        self.overlay = ''
+        self.overlay_name = ''
+        # the ebuild is no longer in the tree
+        self.obsolete = False
+        self.keywords = []
+        self.hardmasked = False
+        # visible to portage
+        self.nonmasked = False
+        # the masking status of an available masked ebuild, [] for the
+        # other available ones, None if it is only installed
+        self.status = None
+        self.profile_masked = False
+        # the masking reason, only read for masked ebuilds
+        self.reason = None
+
+    def is_deprecated(self):
+        """True if the ebuild is only installed or deprecated"""
+        return self.status is None or 'deprecated' in self.status
+
+
+class EbuildMatrix(object):
+    """The versions of a package and an EbuildRow for each of them.
+    Only depends on the tree, the installed pkg db and the masking,
+    the user's package.keywords and package.unmask are left to the view"""
+
+    def __init__(self, package):
+        full_name = package.full_name
+        self.installed = list(package.get_installed())
+        versions = [ebuild for ebuild in package.get_versions() if ebuild]
+        # in release order
+        self.versions = ver_sort(versions)
+        available = set(versions)
+        ebuilds = versions + [ebuild for ebuild in self.installed if ebuild not in available]
+        self.ebuilds = ver_sort(ebuilds)
+        nonmasked = set(package.get_versions(include_masked = False))
+        hardmasked = set(package.get_hard_masked())
+        self.rows = {}
+        for ebuild in self.ebuilds:
+            self.rows[ebuild] = self.read_row(package, ebuild, ebuild in available,
+                    ebuild in hardmasked, ebuild in nonmasked)
+        debug.dprint("EBUILDMATRIX: %d ebuilds read for %s" %(len(self.ebuilds), full_name))
+
+    def read_row(self, package, ebuild, available, hardmasked, nonmasked):
+        row = EbuildRow(ebuild)
+        props = package.get_properties(ebuild)
+        row.slot = str(props.get_slot())
+        row.keywords = props.get_keywords()
+        overlay = backends.portage_lib.get_overlay(ebuild)
+        if type(overlay) in (int,): # catch obsolete
+            row.obsolete = True
+        else:
+            row.overlay = overlay
+            row.overlay_name = backends.portage_lib.get_overlay_name(overlay)
+        row.hardmasked = hardmasked
+        row.nonmasked = nonmasked
+        status = backends.portage_lib.get_masking_status(ebuild)
+        row.profile_masked = 'profile' in status
+        if available:
+            row.status = [] if hardmasked or nonmasked else status
+        if hardmasked or row.profile_masked:
+            row.reason = backends.portage_lib.get_masking_reason(ebuild)
+        return row
+
+    def get_row(self, ebuild):
+        return self.rows[ebuild]
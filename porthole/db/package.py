@@ -26,40 +26,65 @@ import datetime
 _id = datetime.datetime.now().microsecond
 print("PACKAGE: id initialized to ", _id)
 
+import sys
 from gettext import gettext as _
 
 ## circular import problem
 ##from porthole.db import userconfigs
 from porthole.backends.version_sort import ver_sort
+from porthole.db.ebuildmatrix import EbuildMatrix
 from porthole.utils import debug
 from porthole import backends
 
 REFRESH = True
 USERCONFIGS = None
 
+# shared by all packages until they get their own, never modify them
+NO_PROPERTIES = {}
+NO_EBUILDS = ()
+
+# the value of a Package attribute that was not set yet
+DEFAULTS = {
+    'latest_ebuild': None,
+    'hard_masked': None,
+    'hard_masked_nocheck': None,
+    'best_ebuild': None,
+    'installed_ebuilds': None,
+    'name': None,
+    'category': None,
+    'properties': NO_PROPERTIES,
+    'upgradable': None,
+    'dep_upgradable': None,
+    'latest_installed': None,
+    'size': None,
+    'digest_file': None,
+    # see is_in_world()
+    'in_world': False,
+    'world_version': None,
+    'is_checked': False,
+    'deprecated': False,
+    'unavailable': NO_EBUILDS,
+    'versions': None,
+    # see get_ebuild_matrix()
+    'ebuild_matrix': None,
+}
+
 class Package:
-    """An entry in the package database"""
+    """An entry in the package database.
+    There is one for every package in the tree, so it has no __dict__
+    and only sets the attributes that differ from DEFAULTS"""
+
+    __slots__ = ('full_name',) + tuple(DEFAULTS)
 
     def __init__(self, full_name):
         self.full_name = full_name
-        self.latest_ebuild = None
-        self.hard_masked = None
-        self.hard_masked_nocheck = None
-        self.best_ebuild = None
-        self.installed_ebuilds = None
-        self.name = None
-        self.category = None
-        self.properties = {}
-        self.upgradable = None
-        self.dep_upgradable = None
 
-        self.latest_installed = None
-        self.size = None
-        self.digest_file = None
-        self.in_world = full_name in backends.portage_lib.settings.get_world()
-        self.is_checked = False
-        self.deprecated = False
-        self.unavailable = []
+    def __getattr__(self, attr):
+        # only called for a slot not set yet
+        try:
+            return DEFAULTS[attr]
+        except KeyError:
+            raise AttributeError(attr)
 
     def in_list(self, _list=None):
         """returns True/False if the package is listed in the list"""
@@ -68,23 +93,61 @@ class Package:
         if self.full_name == _("None"):
             return False
         if _list == "World":
-            return self.in_world
+            return self.is_in_world()
         elif _list == "Dependencies":
             #  redundant I know, but this method leaves room for adding an "Orphaned"  listing next
-            return not self.in_world
+            return not self.is_in_world()
         elif _list:
             #debug.dprint("Package.in_list: " + str(self.full_name in list))
             # insert routine for checking if the package is in the specified list
+            # (a set, for the long ones)
             return self.full_name in _list
         return False
 
+    def is_in_world(self):
+        """returns True/False if the package is in the world file.
+        Looked up again once the world file has been reloaded"""
+        settings = backends.portage_lib.settings
+        if self.world_version != settings.world_version:
+            self.in_world = self.full_name in settings.get_world()
+            self.world_version = settings.world_version
+        return self.in_world
+
 
     def update_info(self):
         """Update the package info"""
         if self.full_name == _("None"):
             return
-        self.is_upgradeable(REFRESH)
-        self.in_world = self.full_name in backends.portage_lib.settings.get_world()
+        self.versions = None
+        self.is_upgradable(REFRESH)
+        self.world_version = None
+
+    def invalidate(self, tree = True, installed = True):
+        """Drop the cached data depending on the portage tree and/or
+        the installed pkg db, it will be re-read on next use"""
+        if tree:
+            self.latest_ebuild = None
+            self.hard_masked = None
+            self.hard_masked_nocheck = None
+            self.best_ebuild = None
+            self.size = None
+            self.digest_file = None
+            self.versions = None
+            self.properties = NO_PROPERTIES
+        if installed:
+            self.installed_ebuilds = None
+            self.latest_installed = None
+            self.unavailable = NO_EBUILDS
+        self.ebuild_matrix = None
+        self.upgradable = None
+        self.dep_upgradable = None
+
+    def has_tree_cache(self):
+        """Returns True if any data depending on the portage tree is cached"""
+        return (self.versions != None or self.best_ebuild != None or
+                self.latest_ebuild != None or self.hard_masked_nocheck != None or
+                self.size != None or self.digest_file != None or
+                self.properties != {})
 
     def get_installed(self, refresh = False):
         """Returns a list of all installed ebuilds."""
@@ -99,7 +162,7 @@ class Package:
         if self.full_name == _("None"):
             return self.full_name
         if self.name == None:
-            self.name = backends.portage_lib.get_name(self.full_name)
+            self.name = sys.intern(backends.portage_lib.get_name(self.full_name))
         return self.name
 
     def get_category(self):
@@ -107,7 +170,8 @@ class Package:
         if self.full_name == _("None"):
             return ''
         if self.category == None:
-            self.category = backends.portage_lib.get_category(self.full_name)
+            # the same few hundred strings, shared by all packages
+            self.category = sys.intern(backends.portage_lib.get_category(self.full_name))
         return self.category
 
     def get_latest_ebuild(self, include_masked = False):
@@ -227,6 +291,8 @@ class Package:
             ebuild = specific_ebuild
         if not ebuild in self.properties:
             #debug.dprint("PACKAGE: geting properties for '%s'" % str(ebuild))
+            if self.properties is NO_PROPERTIES:
+                self.properties = {}
             self.properties[ebuild] = backends.portage_lib.get_properties(ebuild)
         return self.properties[ebuild]
 
@@ -235,9 +301,22 @@ class Package:
         if self.full_name == _("None"):
             return ''
         # Note: this is slow, especially when include_masked is false
-        v = backends.portage_lib.get_versions(self.full_name, include_masked)
-        #debug.dprint("PACKAGE: SUMMARY get_versions(); v = " + str(v))
-        return v
+        if not include_masked:
+            return backends.portage_lib.get_versions(self.full_name, include_masked)
+        if self.versions == None:
+            self.versions = backends.portage_lib.get_versions(self.full_name, include_masked)
+        #debug.dprint("PACKAGE: SUMMARY get_versions(); v = " + str(self.versions))
+        return self.versions
+
+    def get_ebuild_matrix(self, refresh = False):
+        """Returns the EbuildMatrix of the package, the versions and
+        their slot, overlay, keywords and masking for the Summary tab.
+        Slow the first time, call it from a reader thread"""
+        if self.full_name == _("None"):
+            return None
+        if self.ebuild_matrix == None or refresh:
+            self.ebuild_matrix = EbuildMatrix(self)
+        return self.ebuild_matrix
 
     def get_hard_masked(self, check_unmask = False):
         """Returns all versions hard masked by package.mask.
@@ -315,10 +394,13 @@ class Package:
         """
         if self.unavailable:
             return self.unavailable
+        unavailable = []
         ebuilds = self.get_installed()
         for ebuild in ebuilds:
             overlay = backends.portage_lib.get_overlay(ebuild)
             if type(overlay) in (int,): # catch obsolete
                 # add the ebuild to Ebuilds list
-                self.unavailable.append(ebuild)
+                unavailable.append(ebuild)
+        if unavailable:
+            self.unavailable = unavailable
         return self.unavailable
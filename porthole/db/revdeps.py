@@ -0,0 +1,230 @@
+#!/usr/bin/env python
+
+'''
+    Porthole ReverseDepIndex class
+    Which packages depend on a package, read from the dependencies of
+    the installed ebuilds (or those of the tree) and kept as arrays of
+    integer package ids
+
+    Copyright (C) 2003 - 2009 Fredrik Arnerup, Daniel G. Taylor
+    Brian Dolbec, Wm. F. Wheeler, Tommy Iorns
+
+    This program is free software; you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation; either version 2 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program; if not, write to the Free Software
+    Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+'''
+
+from array import array
+
+from porthole.utils import debug
+from porthole import backends
+from porthole.backends.utilities import dep_split
+
+# the kinds of dependency, a mask of them is kept for each edge,
+# in the order of portagelib.DEPEND_KEYS
+DEPEND = 1
+RDEPEND = 2
+PDEPEND = 4
+KINDS = [DEPEND, RDEPEND, PDEPEND]
+
+# packages re-read since the arrays were built, before they are rebuilt
+COMPACT_SIZE = 64
+
+# atom: full_name, the same atoms turn up in most ebuilds
+_names = {}
+
+
+def get_dep_name(atom):
+    """Returns the category/package an atom is for, or ''"""
+    try:
+        return _names[atom]
+    except KeyError:
+        name = _names[atom] = backends.portage_lib.get_full_name(dep_split(atom)[0])
+        return name
+
+
+def depend_names(depends):
+    """Returns {full_name: kinds} of what the (DEPEND, RDEPEND, PDEPEND)
+    strings depends pull in.  Blockers are left out, all the choices
+    of a || group and all USE conditional ones are kept"""
+    names = {}
+    for kind, string in zip(KINDS, depends):
+        for item in string.split():
+            if item in ('(', ')', '||') or item.endswith('?') or item.startswith('!'):
+                continue
+            name = get_dep_name(item)
+            if name:
+                names[name] = names.get(name, 0) | kind
+    return names
+
+
+class ReverseDepIndex(object):
+    """The dependency edges between packages, each package with an
+    integer id.  The edges are kept both ways in CSR form: the edges of
+    package i are targets[offsets[i]:offsets[i + 1]] with the kinds of
+    each in kinds, and the same by target in rev_sources.
+
+    update() re-reads only the packages whose ebuilds changed, their
+    new edges are kept in changed, in place of the ones in the arrays,
+    until there are enough to rebuild the arrays"""
+
+    def __init__(self):
+        # id: full_name
+        self.names = []
+        # full_name: id
+        self.ids = {}
+        # full_name: the ebuilds its edges were read from
+        self.sources = {}
+        self.offsets = array('I', [0])
+        self.targets = array('I')
+        self.kinds = array('B')
+        self.rev_offsets = array('I', [0])
+        self.rev_sources = array('I')
+        self.rev_kinds = array('B')
+        # id: {target id: kinds} read since the arrays were built
+        self.changed = {}
+        # what the index was read from, eg. the vdb mtime
+        self.stamp = None
+
+    def copy(self):
+        """Returns a copy to update, while this one answers queries"""
+        index = ReverseDepIndex()
+        index.names = self.names[:]
+        index.ids = dict(self.ids)
+        index.sources = dict(self.sources)
+        for attr in ['offsets', 'targets', 'kinds', 'rev_offsets', 'rev_sources', 'rev_kinds']:
+            setattr(index, attr, array(getattr(self, attr).typecode, getattr(self, attr)))
+        index.changed = dict(self.changed)
+        index.stamp = self.stamp
+        return index
+
+    def get_id(self, full_name):
+        """Returns the id of full_name, adding it if it is new"""
+        _id = self.ids.get(full_name)
+        if _id is None:
+            _id = self.ids[full_name] = len(self.names)
+            self.names.append(full_name)
+        return _id
+
+    def update(self, sources, read_depends, reader = None):
+        """Re-reads the edges of the packages whose ebuilds changed.
+
+        @param sources: {full_name: tuple of ebuilds} of all the packages
+        @param read_depends: function returning the (DEPEND, RDEPEND, PDEPEND)
+                strings of an ebuild
+        @param reader: optional CommonReader, counted and checked for
+                cancelling
+        @rtype integer: the number of packages read, None if cancelled
+        """
+        count = 0
+        for full_name, ebuilds in sources.items():
+            if self.sources.get(full_name) == ebuilds:
+                continue
+            if reader:
+                if reader.cancelled:
+                    return None
+                reader.count += 1
+            edges = {}
+            for ebuild in ebuilds:
+                try:
+                    names = depend_names(read_depends(ebuild))
+                except Exception as e:
+                    debug.dprint("REVDEPS: update(); failed to read %s: %s" %(ebuild, str(e)))
+                    continue
+                for name, kinds in names.items():
+                    if name != full_name:
+                        target = self.get_id(name)
+                        edges[target] = edges.get(target, 0) | kinds
+            self.changed[self.get_id(full_name)] = edges
+            self.sources[full_name] = ebuilds
+            count += 1
+        for full_name in [name for name in self.sources if name not in sources]:
+            # removed
+            self.changed[self.ids[full_name]] = {}
+            del self.sources[full_name]
+            count += 1
+        if len(self.changed) > COMPACT_SIZE:
+            self.compact()
+        debug.dprint("REVDEPS: update(); %d of %d packages read" %(count, len(sources)))
+        return count
+
+    def get_edges(self, _id):
+        """Returns {target id: kinds} of the package with id _id"""
+        if _id in self.changed:
+            return self.changed[_id]
+        if _id + 1 < len(self.offsets):
+            start, end = self.offsets[_id], self.offsets[_id + 1]
+            return dict(zip(self.targets[start:end], self.kinds[start:end]))
+        return {}
+
+    def compact(self):
+        """Rebuilds the arrays with the changed edges"""
+        count = len(self.names)
+        offsets = array('I', [0])
+        targets = array('I')
+        kinds = array('B')
+        for _id in range(count):
+            edges = self.get_edges(_id)
+            for target in sorted(edges):
+                targets.append(target)
+                kinds.append(edges[target])
+            offsets.append(len(targets))
+        # the same edges by target, a counting sort of them
+        rev_offsets = array('I', [0]) * (count + 1)
+        for target in targets:
+            rev_offsets[target + 1] += 1
+        for _id in range(count):
+            rev_offsets[_id + 1] += rev_offsets[_id]
+        rev_sources = array('I', [0]) * len(targets)
+        rev_kinds = array('B', [0]) * len(targets)
+        pos = rev_offsets[:-1]
+        for _id in range(count):
+            for edge in range(offsets[_id], offsets[_id + 1]):
+                target = targets[edge]
+                rev_sources[pos[target]] = _id
+                rev_kinds[pos[target]] = kinds[edge]
+                pos[target] += 1
+        self.offsets, self.targets, self.kinds = offsets, targets, kinds
+        self.rev_offsets, self.rev_sources, self.rev_kinds = rev_offsets, rev_sources, rev_kinds
+        self.changed = {}
+        debug.dprint("REVDEPS: compact(); %d packages, %d edges" %(count, len(targets)))
+
+    def _result(self, edges):
+        """Returns [(full_name, ebuilds, kinds),...] sorted by name"""
+        return sorted([(self.names[_id], self.sources.get(self.names[_id], ()), kinds)
+                for _id, kinds in edges.items()])
+
+    def get_depends(self, full_name):
+        """Returns [(full_name, ebuilds, kinds),...] of the packages
+        full_name depends on"""
+        _id = self.ids.get(full_name)
+        if _id is None:
+            return []
+        return self._result(self.get_edges(_id))
+
+    def get_dependents(self, full_name):
+        """Returns [(full_name, ebuilds, kinds),...] of the packages
+        that depend on full_name, the ebuilds they were read from"""
+        _id = self.ids.get(full_name)
+        if _id is None:
+            return []
+        edges = {}
+        if _id + 1 < len(self.rev_offsets):
+            for edge in range(self.rev_offsets[_id], self.rev_offsets[_id + 1]):
+                source = self.rev_sources[edge]
+                if source not in self.changed:
+                    edges[source] = self.rev_kinds[edge]
+        for source, targets in self.changed.items():
+            if _id in targets:
+                edges[source] = targets[_id]
+        return self._result(edges)
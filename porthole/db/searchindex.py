@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+
+'''
+    Porthole SearchIndex class
+    A trigram index over the package names and descriptions,
+    answers plain substring searches without scanning the whole db
+
+    Copyright (C) 2003 - 2009 Fredrik Arnerup, Daniel G. Taylor
+    Brian Dolbec, Wm. F. Wheeler, Tommy Iorns
+
+    This program is free software; you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation; either version 2 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program; if not, write to the Free Software
+    Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+'''
+
+from array import array
+
+from porthole.utils import debug
+
+GRAM = 3
+
+
+def trigrams(text):
+    """Returns the set of (lowercase) trigrams in text"""
+    return set([text[i:i + GRAM] for i in range(len(text) - GRAM + 1)])
+
+
+def build_grams(texts):
+    """Returns a {trigram: array of text ids} dictionary.
+    the id arrays are in ascending order"""
+    grams = {}
+    for _id, text in enumerate(texts):
+        for gram in trigrams(text):
+            try:
+                grams[gram].append(_id)
+            except KeyError:
+                grams[gram] = array('I', [_id])
+    return grams
+
+
+class SearchIndex(object):
+    """Trigram index of the package names and their descriptions.
+    Search results are verified against the text, the trigrams only
+    narrow down the candidates"""
+
+    def __init__(self, descriptions = None, store = None):
+        """descriptions is the {name: description} dictionary of the db.
+        store, a DescriptionStore, re-uses the index saved with it"""
+        self._name_set = None
+        self._name_texts = None
+        if store is not None:
+            # all views of the mapped file, nothing is read until searched
+            self.names = store.names
+            self.desc_texts = store.desc_texts
+            self.name_grams = store.name_grams
+            self.desc_grams = store.desc_grams
+        else:
+            descriptions = descriptions or {}
+            self.names = sorted(descriptions)
+            self.desc_texts = [(descriptions.get(name) or '').lower() for name in self.names]
+            self.name_grams = build_grams(self.name_texts)
+            self.desc_grams = build_grams(self.desc_texts)
+        debug.dprint("SEARCHINDEX: %d names, %d name and %d description trigrams"
+                %(len(self.names), len(self.name_grams), len(self.desc_grams)))
+
+    def _get_name_set(self):
+        if self._name_set is None:
+            self._name_set = set(self.names)
+        return self._name_set
+
+    name_set = property(_get_name_set)
+
+    def _get_name_texts(self):
+        if self._name_texts is None:
+            self._name_texts = [name.lower() for name in self.names]
+        return self._name_texts
+
+    name_texts = property(_get_name_texts)
+
+    def candidates(self, term, grams):
+        """Returns the ids of the texts that may contain term"""
+        if len(term) < GRAM:
+            # too short for the index, every text is a candidate
+            return range(len(self.names))
+        postings = []
+        for gram in trigrams(term):
+            ids = grams.get(gram)
+            if ids is None:
+                return ()
+            postings.append(ids)
+        # verifying the shortest list is cheaper than intersecting them all
+        return min(postings, key=len)
+
+    def search(self, term, search_desc = False):
+        """Returns the set of names that (case insensitively) contain term,
+        or whose description does if search_desc"""
+        term = term.lower()
+        found = set()
+        name_texts = self.name_texts
+        for _id in self.candidates(term, self.name_grams):
+            if term in name_texts[_id]:
+                found.add(self.names[_id])
+        if search_desc:
+            desc_texts = self.desc_texts
+            for _id in self.candidates(term, self.desc_grams):
+                if term in desc_texts[_id]:
+                    found.add(self.names[_id])
+        return found
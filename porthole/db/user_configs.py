@@ -409,6 +409,8 @@ class UserConfigs:
 
     def set_config_callback(self, *args):
         debug.dprint(" * USER_CONFIGS: set_config_callback():" )
+        # cached matches may not respect the new masks/keywords
+        backends.portage_lib.clear_xmatch_cache()
         self.reload_file(self.set_type, self.set_file)
         # This is slow, but otherwise portage doesn't notice the change.
         #reload_portage()
@@ -144,11 +144,13 @@ def load_textfile(view, package, mode, version = None):
             debug.dprint("LOADERS: No package sent to load_textfile()!")
             view.set_text(_("%s Not Available") % Textfile_type[mode][1:])
 
-def load_installed_files(window, view, package = None, ebuild = None):
+def load_installed_files(window, view, package = None, ebuild = None, installed_files = None):
         """Obtain and display list of installed files for a package,
-        if installed."""
+        if installed.  installed_files are those of ebuild, if read already"""
         debug.dprint("LOADERS: load_installed_files(); package = %s, ebuild = %s" %(package.full_name,ebuild))
-        if ebuild:
+        if ebuild and installed_files is not None:
+            debug.dprint("LOADERS: load_installed_files(); installed files of ebuild already read")
+        elif ebuild:
             debug.dprint("LOADERS: load_installed_files(); get installed files for ebuild")
             installed_files = backends.portage_lib.get_installed_files(ebuild)
         elif package:
@@ -100,7 +100,7 @@ class PackageHandler(MainBase):
         # the notebook must be sensitive before anything is displayed
         # in the tabs, especially the deps_view
         self.set_package_actions_sensitive(True, package)
-        self.packagebook.set_package(package)
+        self.packagebook.set_package(package, self.package_view.get_neighbours())
 
 
     def package_search(self, widget=None):
@@ -125,7 +125,8 @@ class PackageHandler(MainBase):
             # call the thread
             self.search_thread = SearchReader(db.db.list,
                 config.Prefs.main.search_desc, tmp_search_term,
-                db.db.descriptions, self.search_dispatcher)
+                db.db.descriptions, self.search_dispatcher,
+                db.db.search_index)
             self.search_thread.start()
         return
 
@@ -222,7 +223,7 @@ class PackageHandler(MainBase):
         #debug.dprint(self.packages_list)
         #debug.dprint(self.keyorder)
         for key in self.keyorder:
-            if not self.packages_list[key].in_world:
+            if not self.packages_list[key].is_in_world():
                 debug.dprint("PackageHandler: upgrade_packages(); " +
                     "dependancy selected: " + key)
                 options = config.Prefs.emerge.get_string()
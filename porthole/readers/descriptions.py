@@ -22,28 +22,72 @@
 '''
 
 import os
+import multiprocessing
 
 from porthole.utils import debug
+from porthole import config
+from porthole.db.searchindex import SearchIndex
 from porthole.readers.commonreader import CommonReader
+from porthole.readers.workers import get_pool, read_descriptions
+
+# number of packages handed to a worker process at a time
+CHUNK_SIZE = 100
+
 
 class DescriptionReader( CommonReader ):
     """ Read and store package descriptions for searching """
-    def __init__( self, packages ):
+    def __init__( self, packages, workers = None ):
         """ Initialize """
         CommonReader.__init__(self)
         self.packages = packages
+        if workers is None:
+            workers = config.Prefs.database.workers
+        self.workers = workers or multiprocessing.cpu_count()
+        self.descriptions = {}
+        self.search_index = None
 
     def run( self ):
         """ Load all descriptions """
         debug.dprint("READERS: DescriptionReader(); process id = %d *****************" %os.getpid())
         self.descriptions = {}
-        for name, package in self.packages:
-            if self.cancelled: self.done = True; return
-            self.descriptions[name] = package.get_description()
-            if not self.descriptions[name]:
-                debug.dprint("READERS: DescriptionReader(); No description for " + name)
-            self.count += 1
+        if self.workers > 1 and len(self.packages) > CHUNK_SIZE:
+            self.run_pool()
+        else:
+            for name, package in self.packages:
+                if self.cancelled: self.done = True; return
+                self.descriptions[name] = package.get_description()
+                if not self.descriptions[name]:
+                    debug.dprint("READERS: DescriptionReader(); No description for " + name)
+                self.count += 1
+        if self.cancelled: self.done = True; return
+        # build it here, it takes too long for the gui thread
+        self.search_index = SearchIndex(self.descriptions)
         self.done = True
         debug.dprint("READERS: DescriptionReader(); Done")
 
-
+    def run_pool( self ):
+        """ Shard the package list across a pool of worker processes.
+        The workers load their own portage config """
+        debug.dprint("READERS: DescriptionReader(); starting %d workers" %self.workers)
+        chunks = []
+        for start in range(0, len(self.packages), CHUNK_SIZE):
+            chunks.append([(name, package.full_name) for name, package
+                           in self.packages[start:start + CHUNK_SIZE]])
+        pool = get_pool(self.workers)
+        try:
+            # imap keeps the list order, so duplicate names resolve
+            # the same as the serial loop
+            for results in pool.imap(read_descriptions, chunks):
+                if self.cancelled:
+                    break
+                for name, desc in results:
+                    self.descriptions[name] = desc
+                    if not desc:
+                        debug.dprint("READERS: DescriptionReader(); No description for " + name)
+                self.count += len(results)
+        finally:
+            if self.cancelled:
+                pool.terminate()
+            else:
+                pool.close()
+            pool.join()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+
+'''
+    Porthole Reader Class: Package Info Prefetch Reader
+
+    Copyright (C) 2003 - 2008 Fredrik Arnerup, Brian Dolbec,
+    Daniel G. Taylor and Wm. F. Wheeler, Tommy Iorns
+
+    This program is free software; you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation; either version 2 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program; if not, write to the Free Software
+    Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+'''
+
+from porthole import backends
+from porthole.utils import debug
+from porthole.readers.commonreader import CommonReader
+
+
+class PrefetchReader( CommonReader ):
+    """ Resolves the package view columns of a list of packages.
+        results[i] is the (installed, recommended, size, description)
+        tuple of packages[i], or None if it could not be read.
+        The Package objects cache what is read, so the gui thread
+        only copies the results into the model """
+    def __init__( self, packages, deprecated = False ):
+        """ packages is a list of (name, Package) in display order.
+            deprecated views list ebuilds (cpv's) instead of packages """
+        CommonReader.__init__(self)
+        self.packages = packages
+        self.deprecated = deprecated
+        self.results = []
+
+    def run( self ):
+        """ Read the info of all packages """
+        debug.dprint("READERS: PrefetchReader(); reading %d packages" %len(self.packages))
+        for name, package in self.packages:
+            if self.cancelled: self.done = True; return
+            try:
+                info = self.read_info(name, package)
+            except Exception as e:
+                debug.dprint("READERS: PrefetchReader(); %s: %s" %(package.full_name, str(e)))
+                info = None
+            self.results.append(info)
+            self.count += 1
+        self.done = True
+        debug.dprint("READERS: PrefetchReader(); Done")
+
+    def read_info( self, name, package ):
+        """ Returns the (installed, recommended, size, description) of a row,
+            installed is None for deprecated (ebuild) rows """
+        if not self.deprecated:
+            installed = backends.portage_lib.get_version(package.get_latest_installed())
+            best_ebuild = package.get_best_dep_ebuild()
+        else:
+            installed = None
+            slot = backends.portage_lib.get_slot(name)
+            slot_dep = ':'.join([package.full_name, slot] if slot else [package.full_name])
+            best_ebuild, keyworded_ebuild, masked_ebuild = backends.portage_lib.get_dep_ebuild(slot_dep)
+        latest_ebuild = package.get_latest_ebuild(include_masked = False)
+        if best_ebuild:
+            recommended = backends.portage_lib.get_version(best_ebuild) #  recommended by portage
+        elif latest_ebuild:
+            recommended = "(" + backends.portage_lib.get_version(latest_ebuild) + ")" # latest
+        else:
+            recommended = "masked" # hard masked - don't display
+        try:
+            size = package.get_size()
+        except:
+            debug.dprint("READERS: PrefetchReader(); Had issues getting size for '%s'" % str(package.full_name))
+            size = None
+        try:
+            description = package.get_properties().description
+        except:
+            debug.dprint("READERS: PrefetchReader(); Failed to get item description for '%s'" % package.full_name)
+            description = None
+        return installed, recommended, size, description
+
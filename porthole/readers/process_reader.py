@@ -23,6 +23,9 @@
 '''
 
 import os
+import codecs
+import queue
+import select
 import threading
 import time
 
@@ -31,6 +34,12 @@ from gi.repository import Gdk
 from porthole.utils import debug
 #from porthole.utils.dispatcher import Dispatcher
 
+# bytes read from the process at a time
+CHUNK_SIZE = 4096
+# ms to wait for process output before checking self.die again
+POLL_TIMEOUT = 100
+
+
 class ProcessOutputReader(threading.Thread):
     """ Reads output from processes """
     def __init__(self, dispatcher, dprint_output = ''):
@@ -42,29 +51,50 @@ class ProcessOutputReader(threading.Thread):
         self.process_running = False
         # initialize only, self.fd set by ProcessManager._run()
         self.fd = None
-        # initialize only, both set by Processmanager.fill_buffer()
-        self.file_input = False
-        self.f = None
-        # string to store input from process
-        self.string = ""
-        # lock to prevent losing characters from simultaneous accesses
-        self.string_locked = False
+        # decoded chunks of output, see get_output()
+        self.queue = queue.Queue()
         self.record_output = True
+        # wait for get_output() to collect everything before signalling
+        # the end of a process or file.  Off if nobody reads the output
+        # until the process is done
+        self.wait_for_update = True
         self.dprint_output = dprint_output
         self.dprint_string = ''
         self.die = False
+        self.decoder = None
+
+    def get_output(self):
+        """ Returns (and removes) all output read so far, safe to call
+            from any thread """
+        chunks = []
+        try:
+            while True:
+                chunks.append(self.queue.get_nowait())
+        except queue.Empty:
+            pass
+        return ''.join(chunks)
 
     def run(self):
         """ Watch for process output """
         debug.dprint("PROCESS_READER: ProcessOutputReader(); process id = %d" %os.getpid())
-        char = None
+        poller = None
+        poll_fd = None
         while not self.die:
-            if self.process_running or self.file_input:
+            if self.process_running:
+                if self.decoder is None:
+                    self.decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+                data = None
                 # get the output and pass it to self.callback()
                 if self.process_running and (self.fd != None):
+                    if poll_fd != self.fd:
+                        poller = select.poll()
+                        poller.register(self.fd, select.POLLIN | select.POLLPRI)
+                        poll_fd = self.fd
                     try:
-                        char = os.read(self.fd, 1)
-                    except OSError as e:
+                        if not poller.poll(POLL_TIMEOUT):
+                            continue # no output yet
+                        data = os.read(self.fd, CHUNK_SIZE)
+                    except (OSError, select.error) as e:
                         if e.args[0] == 5: # 5 = i/o error
                             debug.dprint("PROCESS_READER: ProcessOutputReader: process finished, closing")
                             try:
@@ -77,49 +107,36 @@ class ProcessOutputReader(threading.Thread):
                         else:
                             # maybe the process died?
                             debug.dprint("PROCESS_READER: ProcessOutputReader: .fd OSError: %s" % e)
-                        char = None
-                elif self.file_input:
-                    try:
-                        # keep read(number) small so as to not cripple the
-                        # system reading large files.  even 2 can hinder gui response
-                        char = self.f.read(1)
-                    except OSError as e:
-                        debug.dprint("PROCESS_READER: ProcessOutputReader: .f OSError: %s" % e)
-                        # maybe the process died?
-                        char = None
-                if char:
-                    # if the string is currently being accessed
-                    while(self.string_locked):
-                        # wait 50 ms and check again
-                        time.sleep(0.05)
-                    if self.record_output:
-                        # lock the string
-                        self.string_locked = True
-                        # add the character to the string
-                        self.string += char.decode(encoding="utf-8", errors="replace")
-                        # unlock the string
-                        self.string_locked = False
-                    if self.dprint_output:
-                       self.dprint_string += char
-                       if char == '\n':
-                           debug.dprint(self.dprint_output + self.dprint_string[:-1])
-                           self.dprint_string = ''
+                        data = None
+                if data:
+                    self.add_output(self.decoder.decode(data))
                 else:
                     # clean up, process is terminated
+                    self.add_output(self.decoder.decode(b'', True))
+                    self.decoder = None
+                    poll_fd = poller = None
                     self.process_running = False
-                    while self.string != "":
+                    while self.wait_for_update and not self.queue.empty() and not self.die:
                         #debug.dprint("PROCESS_READER: ProcessOutputReader: waiting for update to finish")
                         # wait for update_callback to finish
-                        time.sleep(.5)
-                    if self.file_input:
-                        self.file_input = False
-                    else:
-                        Gdk.threads_enter()
-                        self.dispatcher()
-                        Gdk.threads_leave()
+                        time.sleep(.05)
+                    Gdk.threads_enter()
+                    self.dispatcher()
+                    Gdk.threads_leave()
             else:
                 # sleep for .5 seconds before we check again
                 if time:
                     time.sleep(.5)
         # quit thread
 
+    def add_output(self, text):
+        """ Queue decoded text for get_output() """
+        if not text:
+            return
+        if self.record_output:
+            self.queue.put(text)
+        if self.dprint_output:
+            lines = (self.dprint_string + text).split('\n')
+            self.dprint_string = lines.pop()
+            for line in lines:
+                debug.dprint(self.dprint_output + line)
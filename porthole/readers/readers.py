@@ -134,7 +134,7 @@ class UpgradableListReader(CommonReader):
             utils.debug.dprint("READERS: UpgradableListReader; waiting for an 'emerge -ep system'...")
             while self.terminal.reader.process_running:
                 time.sleep(0.10)
-            self.categories["System"] = self.make_list(self.terminal.reader.string)
+            self.categories["System"] = self.make_list(self.terminal.reader.get_output())
         else:
             self.categories["System"] = backends.portage_lib.get_system_pkgs()
         self.progress = 2
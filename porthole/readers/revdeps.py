@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+
+'''
+    Porthole Reader Class: Reverse Dependency Reader
+
+    Copyright (C) 2003 - 2009 Fredrik Arnerup, Brian Dolbec,
+    Daniel G. Taylor and Wm. F. Wheeler, Tommy Iorns
+
+    This program is free software; you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation; either version 2 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program; if not, write to the Free Software
+    Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+'''
+
+from porthole.utils import debug
+from porthole import backends
+from porthole.db.revdeps import ReverseDepIndex
+from porthole.readers.commonreader import CommonReader
+
+
+def get_stamp(tree):
+    """Returns what the index of the installed packages or of the tree
+    was read from, it is out of date once this changed"""
+    if tree:
+        return backends.portage_lib.get_xmatch_generation()
+    return backends.portage_lib.get_vdb_mtime()
+
+
+class ReverseDepReader( CommonReader ):
+    """ Reads or updates a ReverseDepIndex, of the installed packages
+    or of the best ebuild of each package in the tree """
+    def __init__( self, index = None, tree = False, names = None ):
+        """ Initialize
+        @param index: the index to update, it is copied first
+        @param names: the full_names of the packages in the tree
+        """
+        CommonReader.__init__(self)
+        self.tree = tree
+        self.names = names or []
+        self.index = index.copy() if index else ReverseDepIndex()
+
+    def run( self ):
+        """ Read the ebuilds that changed """
+        debug.dprint("READERS: ReverseDepReader(); reading the %s index"
+                %("tree" if self.tree else "installed"))
+        # taken first, a change while reading gets it read again
+        stamp = get_stamp(self.tree)
+        if self.tree:
+            sources = {}
+            for full_name in self.names:
+                if self.cancelled: self.done = True; return
+                ebuild = backends.portage_lib.get_best_ebuild(full_name)
+                if ebuild:
+                    sources[full_name] = (ebuild,)
+            read_depends = backends.portage_lib.get_ebuild_depends
+        else:
+            sources = dict((full_name, tuple(sorted(ebuilds))) for full_name, ebuilds
+                    in backends.portage_lib.get_installed_cpvs().items())
+            read_depends = backends.portage_lib.get_installed_depends
+        if self.index.update(sources, read_depends, self) is not None:
+            self.index.stamp = stamp
+        self.done = True
+        debug.dprint("READERS: ReverseDepReader(); Done")
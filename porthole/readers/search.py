@@ -32,7 +32,7 @@ EXCEPTION_LIST = ['.','^','$','*','+','?','(',')','\\','[',']','|','{','}']
 class SearchReader( CommonReader ):
     """Create a list of matching packages to search term"""
     
-    def __init__( self, db_list, search_desc, tmp_search_term, desc_db = None, callback = None ):
+    def __init__( self, db_list, search_desc, tmp_search_term, desc_db = None, callback = None, index = None ):
         """ Initialize """
         CommonReader.__init__(self)
         self.db_list = db_list
@@ -40,6 +40,8 @@ class SearchReader( CommonReader ):
         self.tmp_search_term = tmp_search_term
         self.desc_db = desc_db
         self.callback = callback
+        # the db's SearchIndex if it has been built
+        self.index = index
         # hack for statusbar updates
         self.progress = 1
         self.package_list = {}
@@ -59,6 +61,9 @@ class SearchReader( CommonReader ):
                 self.search_term += char 
             debug.dprint("READERS: SearchReader(); ===> escaped search_term = :%s" %self.search_term)
             re_object = re.compile(self.search_term, re.I)
+            if self.index is not None:
+                self.search_index(re_object)
+                return
             # no need to sort self.db_list; it is already sorted
             for name, data in self.db_list:
                 if self.cancelled: self.done = True; return
@@ -79,6 +84,23 @@ class SearchReader( CommonReader ):
             debug.dprint("READERS: SearchReader(); found %s entries for search_term: %s" %(self.pkg_count,self.search_term))
             self.do_callback()
 
+    def search_index( self, re_object ):
+        """ Answer the search from the index.  The term is always
+        matched literally (see EXCEPTION_LIST) so it is a plain
+        substring search """
+        matches = self.index.search(self.tmp_search_term, self.search_desc)
+        known = self.index.name_set
+        for name, data in self.db_list:
+            if self.cancelled: self.done = True; return
+            self.count += 1
+            # packages added to the db after the index was built
+            # can only be matched by name
+            if name in matches or (name not in known and re_object.search(name)):
+                self.pkg_count += 1
+                self.package_list[data.full_name] = data
+        debug.dprint("READERS: SearchReader(); index found %s entries for search_term: %s" %(self.pkg_count,self.search_term))
+        self.do_callback()
+
     def do_callback(self):
         if self.callback:
             self.done = True
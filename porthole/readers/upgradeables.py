@@ -25,27 +25,35 @@ import os
 import time
 import _thread
 import threading
+import multiprocessing
 from sys import stderr
 from gettext import gettext as _
 
 from porthole.utils import debug
+from porthole import config
 from porthole.sterminal import SimpleTerminal
 from porthole import backends
 from porthole import db
 from porthole.db.package import Package
 from porthole.readers.commonreader import CommonReader
+from porthole.readers.workers import get_pool, check_upgradables
 from porthole.utils.utils import get_set_name
 
 
 PRIORITIES = {_("System"): 0, _("Sets"):1, _("World"):2, _("Dependencies"):3}
+# number of packages handed to a worker process at a time
+CHUNK_SIZE = 50
 
 
 class UpgradableListReader(CommonReader):
     """ Read available upgrades and store them in a tuple """
-    def __init__( self, installed, sets = None ):
+    def __init__( self, installed, sets = None, workers = None ):
         """ Initialize """
         CommonReader.__init__(self)
         self.installed_items = installed
+        if workers is None:
+            workers = config.Prefs.database.workers
+        self.workers = workers or multiprocessing.cpu_count()
         ##self.upgrade_only = upgradeonly
         self.sets = sets
         self.reader_type = "Upgradable"
@@ -77,18 +85,17 @@ class UpgradableListReader(CommonReader):
             self.pkg_count[key] = 0
         ##upgradeflag = self.upgrade_only and True or False
         # find upgradable packages
-        for cat, packages in self.installed_items:
-            for name, package in list(packages.items()):
+        packages = []
+        for cat, _packages in self.installed_items:
+            packages.extend(list(_packages.values()))
+        if self.workers > 1 and len(packages) > CHUNK_SIZE:
+            self.run_pool(packages)
+        else:
+            for package in packages:
                 self.count += 1
                 if self.cancelled: self.done = True; return
-                upgradable = package.is_upgradable()
-                # if upgradable: # is_upgradable() = 1 for upgrade, -1 for downgrade
-                if upgradable == 1 or upgradable == -1:
-                    for key in self.cat_order:
-                        if package.in_list(self.categories[key]):
-                            self.pkg_dict[key][package.full_name] = package
-                            self.pkg_count[key] += 1
-                            break
+                self.add_package(package, package.is_upgradable())
+        if self.cancelled: self.done = True; return
         self.pkg_dict_total = 0
         for key in self.pkg_count:
             self.pkg_dict_total += self.pkg_count[key]
@@ -102,6 +109,50 @@ class UpgradableListReader(CommonReader):
         self.done = True
         return
 
+    def run_pool( self, packages ):
+        """ Shard the installed packages across a pool of worker processes.
+        The workers load their own portage config """
+        debug.dprint("READERS: UpgradableListReader(); starting %d workers" %self.workers)
+        by_name = {}
+        chunks = []
+        for start in range(0, len(packages), CHUNK_SIZE):
+            chunk = packages[start:start + CHUNK_SIZE]
+            for package in chunk:
+                by_name[package.full_name] = package
+            chunks.append([package.full_name for package in chunk])
+        pool = get_pool(self.workers)
+        try:
+            # imap keeps the list order, so the packages are listed
+            # the same as by the serial loop
+            for results in pool.imap(check_upgradables, chunks):
+                if self.cancelled:
+                    break
+                for full_name, upgradable, best, installed in results:
+                    package = by_name[full_name]
+                    # save the workers' results, so they are not looked up again
+                    package.upgradable = upgradable
+                    package.best_ebuild = best
+                    if installed:
+                        package.latest_installed = installed
+                    self.add_package(package, upgradable)
+                self.count += len(results)
+        finally:
+            if self.cancelled:
+                pool.terminate()
+            else:
+                pool.close()
+            pool.join()
+
+    def add_package( self, package, upgradable ):
+        """ Adds package to the first category it is listed in """
+        # if upgradable: # is_upgradable() = 1 for upgrade, -1 for downgrade
+        if upgradable == 1 or upgradable == -1:
+            for key in self.cat_order:
+                if package.in_list(self.categories[key]):
+                    self.pkg_dict[key][package.full_name] = package
+                    self.pkg_count[key] += 1
+                    break
+
 
 
     def get_system_list( self, emptytree = False ):
@@ -112,19 +163,19 @@ class UpgradableListReader(CommonReader):
             debug.dprint("READERS: UpgradableListReader; waiting for an 'emerge -ep system'...")
             while self.terminal.reader.process_running:
                 time.sleep(0.10)
-            self.categories[_("System")] = self.make_list(self.terminal.reader.string)
+            self.categories[_("System")] = self.make_list(self.terminal.reader.get_output())
         else:
             self.categories[_("System")] = backends.portage_lib.get_system_pkgs()
         self.progress = 2
         debug.dprint("READERS: UpgradableListReader; new system pkg list %s" %str(self.categories[_("System")]))
 
     def make_list(self, from_string):
-        """parse terminal output and return a list"""
+        """parse terminal output and return a frozenset"""
         list1 = from_string.split('\n')
         list2 = []
         for pkg in list1:
             list2.append(backends.portage_lib.get_full_name(pkg.rstrip("\r")))
-        return list2
+        return frozenset(list2)
 
     def get_sets( self):
         """Get any package lists stored in the /etc/portage/sets directory
@@ -132,7 +183,8 @@ class UpgradableListReader(CommonReader):
         sets_list = []
         for key in db.userconfigs.get_source_keys("SETS"):
             name = get_set_name(key)
-            self.categories[_("Sets")+"-"+name] = db.userconfigs.get_source_cplist("SETS", key)
+            # a set, so in_list() is a hash lookup
+            self.categories[_("Sets")+"-"+name] = frozenset(db.userconfigs.get_source_cplist("SETS", key))
             sets_list.append(_("Sets")+"-"+name)
         self.cat_order = [_("System")] + sets_list + [_("World"), _("Dependencies")]
         return #sets_lists
@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+
+'''
+    Porthole Reader Worker Processes
+    The functions the readers run in a pool of worker processes.  The
+    workers are started by a forkserver, so each imports this module
+    anew: it must not import porthole.db, whose import reads the package
+    database and the user configs, and calls the backend directly instead.
+
+    Copyright (C) 2003 - 2009 Fredrik Arnerup, Brian Dolbec,
+    Daniel G. Taylor and Wm. F. Wheeler, Tommy Iorns
+
+    This program is free software; you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation; either version 2 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program; if not, write to the Free Software
+    Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+'''
+
+import multiprocessing
+
+from porthole.utils import debug
+from porthole import config
+from porthole import backends
+from porthole.backends.version_sort import ver_sort
+
+# the prefs startup.main() adds, the rest are not used by the workers
+WORKER_PREFS = ["DATA_PATH", "APP", "i18n_DIR", "RUN_LOCAL", "LOG_FILE_DIR",
+                "PORTAGE", "EPREFIX"]
+
+
+class WorkerPrefs(object):
+    """The preferences of a worker process, those startup.main() adds.
+    The full PortholePreferences would save the prefs file from each worker"""
+    def __init__(self, prefs_additions):
+        for option, value in prefs_additions:
+            setattr(self, option, value)
+
+
+def init_worker(prefs_additions):
+    """Pool initializer, loads the backend in a new worker process
+    as startup.main() does"""
+    config.Prefs = WorkerPrefs(prefs_additions)
+    backends.load(config.Prefs.PORTAGE or 'portagelib')
+
+
+def get_pool(workers):
+    """Returns a multiprocessing Pool of workers started by a forkserver.
+    The readers run in a thread, forking the gui process from it
+    can leave a lock the other threads held locked in the child"""
+    prefs_additions = [[option, getattr(config.Prefs, option, None)]
+                       for option in WORKER_PREFS]
+    return multiprocessing.get_context('forkserver').Pool(workers,
+            init_worker, (prefs_additions,))
+
+
+def get_latest_installed(full_name):
+    """Returns the latest installed ebuild, as Package.get_latest_installed()"""
+    installed = backends.portage_lib.get_installed(full_name)
+    if not installed:
+        return ''
+    return ver_sort(installed)[-1]
+
+
+def get_default_ebuild(full_name):
+    """Returns the ebuild Package.get_default_ebuild() shows"""
+    portage_lib = backends.portage_lib
+    best = portage_lib.get_best_ebuild(full_name)
+    if best:
+        return best
+    versions = portage_lib.get_versions(full_name)
+    hardmasked = portage_lib.get_hard_masked(full_name)[1]
+    return (portage_lib.best([ebuild for ebuild in versions if ebuild not in hardmasked]) or
+            portage_lib.best(versions) or
+            get_latest_installed(full_name))
+
+
+def read_descriptions(packages):
+    """Worker process function.
+    Returns [(name, description),...] for a chunk of (name, full_name) pairs"""
+    results = []
+    for name, full_name in packages:
+        try:
+            desc = backends.portage_lib.get_properties(get_default_ebuild(full_name)).description
+        except Exception as e:
+            debug.dprint("READERS: read_descriptions(); %s: %s" %(full_name, str(e)))
+            desc = ''
+        results.append((name, desc))
+    return results
+
+
+def check_upgradables(full_names):
+    """Worker process function.
+    Returns [(full_name, upgradable, best, installed),...] for a chunk of
+    package names, upgradable as Package.is_upgradable()"""
+    portage_lib = backends.portage_lib
+    results = []
+    for full_name in full_names:
+        try:
+            best = portage_lib.get_best_ebuild(full_name)
+            installed = get_latest_installed(full_name)
+            upgradable = 0
+            if best and installed and best != installed:
+                better = portage_lib.best([best, installed])
+                if better == best:
+                    upgradable = 1
+                elif better == installed:
+                    upgradable = -1
+        except Exception as e:
+            debug.dprint("READERS: check_upgradables(); %s: %s" %(full_name, str(e)))
+            upgradable, best, installed = 0, None, None
+        results.append((full_name, upgradable, best, installed))
+    return results
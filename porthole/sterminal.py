@@ -47,6 +47,8 @@ class SimpleTerminal:
         # create the process reader
         self.reader = ProcessOutputReader(Dispatcher(self.cleanup), dprint_output)
         self.reader.record_output = need_output
+        # the output is collected once the process is done
+        self.reader.wait_for_update = False
         self.callback = callback
         # start the reader
         self.reader.start()
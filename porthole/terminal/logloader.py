@@ -0,0 +1,218 @@
+#!/usr/bin/env python
+
+"""
+    Terminal log loader
+    Loads a saved log for the log viewer.  The file is memory mapped,
+    its lines indexed and sorted into the info, warning and caution
+    tabs by a background thread, a block of lines at a time.
+
+    Copyright (C) 2003 - 2009 Fredrik Arnerup, Brian Dolbec,
+    Daniel G. Taylor, Wm. F. Wheeler, Tommy Iorns
+
+    This program is free software; you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation; either version 2 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program; if not, write to the Free Software
+    Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+"""
+
+import mmap
+import queue
+import re
+import threading
+import time
+from array import array
+
+from porthole.utils import debug
+from porthole import config
+from porthole.terminal.constants import TAB_WARNING, TAB_CAUTION, TAB_INFO
+
+# lines classified and shown at a time
+BLOCK_LINES = 2000
+# lines shown before the background thread starts
+FIRST_SCREEN = 100
+# blocks allowed to pile up, so a big log is not decoded
+# (much) faster than it is shown
+MAX_PENDING = 8
+
+# escape sequences and the control chars the terminal would not show.
+# A saved log has none, captured emerge output may
+control_re = re.compile("\x1b(?:\\[[^\x40-\x7e]*[\x40-\x7e]|\\][^\x07]*\x07?|.)"
+                        "|[\x00-\x08\x0b-\x1f]")
+# any of them, ESC is one too
+control_char_re = re.compile("[\x00-\x08\x0b-\x1f]")
+
+
+def clean_line(line):
+    """Returns line as the terminal would have shown it"""
+    if line.endswith('\r\n'):
+        line = line[:-2] + '\n'
+    if '\r' in line:
+        # the last overwrite of the line
+        end = '\n' if line.endswith('\n') else ''
+        line = line.rstrip('\n').rsplit('\r', 1)[-1] + end
+    while '\b' in line:
+        pos = line.index('\b')
+        line = line[:max(pos - 1, 0)] + line[pos + 1:]
+    return control_re.sub('', line)
+
+
+def classify(line):
+    """Returns the process tab tag of line and the other
+    tabs it goes to, as ProcessManager.newline() sorts them"""
+    if config.Config.isEmerge(line):
+        return 'emerge', [(TAB_INFO, 'emerge'), (TAB_WARNING, 'emerge')]
+    filters = config.Config.match_filters(line)
+    if 'needaction' in filters:
+        return 'caution', [(TAB_INFO, 'caution')]
+    if 'info' in filters:
+        if 'error' in filters:
+            return 'error', [(TAB_INFO, 'error')]
+        return 'info', [(TAB_INFO, None)]
+    if 'warning' in filters:
+        return 'warning', [(TAB_WARNING, None)]
+    if 'caution' in filters:
+        return 'caution', [(TAB_CAUTION, None)]
+    return None, []
+
+
+class LogBlock(object):
+    """A block of classified lines"""
+
+    def __init__(self, first_line):
+        # 1 based number of the first line
+        self.first_line = first_line
+        self.count = 0
+        # [[tag, [text,...]],...] for the process tab
+        self.runs = []
+        # [(tab, line number, tag, text),...] for the others
+        self.tab_lines = []
+
+    def add(self, line):
+        tag, tabs = classify(line)
+        if self.runs and self.runs[-1][0] == tag:
+            self.runs[-1][1].append(line)
+        else:
+            self.runs.append([tag, [line]])
+        for tab, tab_tag in tabs:
+            self.tab_lines.append((tab, self.first_line + self.count, tab_tag, line))
+        self.count += 1
+
+
+class LogLoader(threading.Thread):
+    """Indexes and classifies the lines of a log file"""
+
+    def __init__(self, filename):
+        threading.Thread.__init__(self)
+        self.setDaemon(1)  # quit even if this thread is still running
+        self.filename = filename
+        # raises IOError, for the caller to report
+        self.file = open(filename, "rb")
+        try:
+            self.data = mmap.mmap(self.file.fileno(), 0, access = mmap.ACCESS_READ)
+        except ValueError: # an empty file can't be mapped
+            self.data = b''
+        # offsets[i] is where line i starts, offsets[-1] the end of the file
+        self.offsets = array('Q', [0])
+        self.indexed = False
+        self.blocks = queue.Queue()
+        self.shown = 0 # lines handed out by get_block()
+        self.finished = False
+        self.die = False
+
+    def first_screen(self):
+        """Returns the block of the first lines, read before the
+        thread is started so they can be shown at once"""
+        self.index_lines(FIRST_SCREEN)
+        block = self.read_block(0, len(self.offsets) - 1)
+        self.shown = block.count
+        return block
+
+    def run(self):
+        debug.dprint("LOGLOADER: run(); indexing " + self.filename)
+        start = time.time()
+        self.index_lines()
+        self.indexed = True
+        debug.dprint("LOGLOADER: run(); %d lines indexed in %.2f seconds"
+                %(self.get_line_count(), time.time() - start))
+        line = self.shown
+        total = len(self.offsets) - 1
+        while line < total and not self.die:
+            if self.blocks.qsize() >= MAX_PENDING:
+                time.sleep(0.05)
+                continue
+            block = self.read_block(line, min(line + BLOCK_LINES, total))
+            self.blocks.put(block)
+            line += block.count
+        self.finished = True
+
+    def index_lines(self, limit = None):
+        """Adds the offsets of the lines after the last one indexed,
+        up to limit lines.  An unterminated last line counts as a line"""
+        data = self.data
+        offsets = self.offsets
+        size = len(data)
+        find = data.find
+        pos = offsets[-1]
+        while pos < size and not self.die:
+            if limit is not None and len(offsets) > limit:
+                return
+            pos = find(b'\n', pos) + 1
+            if not pos:
+                pos = size
+            offsets.append(pos)
+
+    def read_block(self, start, end):
+        """Returns the classified lines start up to end"""
+        block = LogBlock(start + 1)
+        text = self.data[self.offsets[start]:self.offsets[end]].decode('utf_8', 'replace')
+        lines = text.split('\n')
+        last = lines.pop()
+        if control_char_re.search(text):
+            # a saved log has no control chars, skip the per line test
+            search = control_char_re.search
+        else:
+            search = lambda line: False
+        for line in lines:
+            line += '\n'
+            if search(line):
+                line = clean_line(line)
+            block.add(line)
+        if last:
+            if search(last):
+                last = clean_line(last)
+            block.add(last)
+        return block
+
+    def get_line_count(self):
+        return len(self.offsets) - 1
+
+    def get_block(self):
+        """Returns the next block to show, or None"""
+        try:
+            block = self.blocks.get_nowait()
+        except queue.Empty:
+            return None
+        self.shown += block.count
+        return block
+
+    def is_done(self):
+        """True once every block has been handed out"""
+        return self.finished and self.blocks.empty()
+
+    def close(self):
+        self.die = True
+        if self.is_alive():
+            self.join()
+        if self.data:
+            self.data.close()
+            self.data = b''
+        self.file.close()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+
+"""
+    Terminal log store
+    Keeps the full text of the process tab in an unlinked temporary
+    file with a line offset index, so the text buffers only need to
+    hold the lines in view.
+
+    Copyright (C) 2003 - 2009 Fredrik Arnerup, Brian Dolbec,
+    Daniel G. Taylor, Wm. F. Wheeler, Tommy Iorns
+
+    This program is free software; you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation; either version 2 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program; if not, write to the Free Software
+    Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+"""
+
+import codecs
+import mmap
+import tempfile
+from array import array
+
+from porthole.utils import debug
+
+# bytes copied at a time by write_to()
+COPY_SIZE = 1 << 20
+
+
+class LogStore(object):
+    """The lines of a log, appended and overwritten the way the
+    process tab is.  Complete lines go to the file, the line still
+    being written stays in memory until its LF arrives"""
+
+    def __init__(self):
+        self.file = tempfile.TemporaryFile(prefix = "porthole-log-")
+        self.reset()
+
+    def reset(self):
+        self.file.seek(0)
+        self.file.truncate()
+        # offsets[i] is where line i starts, offsets[-1] the end of the file
+        self.offsets = array('Q', [0])
+        # the unfinished last line
+        self.current = ''
+        self._map = None
+
+    def close(self):
+        self._map = None
+        self.file.close()
+
+    def __len__(self):
+        """Returns the number of lines, counting an unfinished one"""
+        return len(self.offsets) - 1 + (self.current != '')
+
+    def append(self, text):
+        """Adds text to the end of the log"""
+        self.current += text
+        if '\n' in self.current:
+            end = self.current.rfind('\n') + 1
+            self._write(self.current[:end])
+            self.current = self.current[end:]
+
+    def overwrite(self, text):
+        """Replaces the unfinished last line with text"""
+        self.current = ''
+        self.append(text)
+
+    def _write(self, text):
+        data = text.encode('utf_8', 'replace')
+        base = self.offsets[-1]
+        pos = data.find(b'\n')
+        while pos >= 0:
+            self.offsets.append(base + pos + 1)
+            pos = data.find(b'\n', pos + 1)
+        self.file.seek(base)
+        self.file.write(data)
+
+    def _get_map(self):
+        """Returns a map of the file covering all complete lines"""
+        size = self.offsets[-1]
+        if self._map is None or len(self._map) < size:
+            self.file.flush()
+            try:
+                self._map = mmap.mmap(self.file.fileno(), size, access = mmap.ACCESS_READ)
+            except (ValueError, EnvironmentError) as e:
+                debug.dprint("LOGSTORE: _get_map(); " + str(e))
+                return b''
+        return self._map
+
+    def get_line(self, index):
+        """Returns line index (0 based), with its LF"""
+        if index == len(self.offsets) - 1 and self.current:
+            return self.current
+        if not 0 <= index < len(self.offsets) - 1:
+            raise IndexError(index)
+        data = self._get_map()
+        return data[self.offsets[index]:self.offsets[index + 1]].decode('utf_8', 'replace')
+
+    def get_lines(self, start, end = None):
+        """Returns lines start up to end as one string"""
+        complete = len(self.offsets) - 1
+        if end is None or end > len(self):
+            end = len(self)
+        text = ''
+        if start < min(end, complete):
+            data = self._get_map()
+            text = data[self.offsets[start]:self.offsets[min(end, complete)]].decode('utf_8', 'replace')
+        if end > complete:
+            text += self.current
+        return text
+
+    def write_to(self, _file):
+        """Writes the whole log to the (text) file object _file"""
+        data = self._get_map()
+        # a chunk may end inside a multi byte char
+        decoder = codecs.getincrementaldecoder('utf_8')('replace')
+        for pos in range(0, self.offsets[-1], COPY_SIZE):
+            _file.write(decoder.decode(data[pos:pos + COPY_SIZE]))
+        _file.write(decoder.decode(b'', True))
+        _file.write(self.current)
@@ -29,9 +29,14 @@
         from notebook import TerminalNotebook
 """
 import gi; gi.require_version('Gtk', '3.0')
+gi.require_version('PangoCairo', '1.0')
 from gi.repository import Gdk
 from gi.repository import Gtk
+from gi.repository import GObject
 from gi.repository import Pango
+from gi.repository import PangoCairo
+
+from array import array
 
 from gettext import gettext as _
 
@@ -45,9 +50,17 @@ from porthole.terminal.constants import (
     TAB_WARNING,
     TAB_PROCESS,
 )
+from porthole.terminal.logstore import LogStore
 from porthole.utils import debug
 from porthole import config
 
+# lines trimmed from the top of a buffer at a time, as a fraction of
+# the lines kept.  Deleting a few hundred lines at once is much cheaper
+# than one at a time
+TRIM_FRACTION = 10
+# room for a six digit line number
+GUTTER_CHARS = 7
+
 class TerminalNotebook:
     """generates a terminal notebook structure containing all needed views,
     buffers,handler id's, etc."""
@@ -73,6 +86,25 @@ class TerminalNotebook:
         self.auto_scroll = [True, False, False, False, False]
         self.end_mark = [] # hold the end of buffer text marks for autoscrolling
         self.last_text = [] # keep a record of the last text entered
+        # the full process log, the buffers only keep the last max_lines
+        self.store = LogStore()
+        self.max_lines = config.Prefs.terminal.max_lines
+        # 1 based number of the process line being written
+        self.line_count = 1
+        # line numbers are drawn beside the text: the process buffer's
+        # first line is line first_line + 1, each line of the other
+        # buffers has its process line number in line_index
+        self.first_line = 0
+        self.line_index = [None, array('L'), array('L'), array('L')]
+        # text waiting for the next flush(), coalesced into one insert
+        # per run of equally tagged text: [[tags, [text,...]],...] per tab
+        self.latency = config.Prefs.terminal.update_latency
+        self.pending = [[], [], [], []]
+        # the buffer's last line is to be deleted before inserting
+        self.pending_overwrite = [False, False, False, False]
+        self.at_line_start = [True, True, True, True]
+        self.flush_id = None
+        self.flush_callbacks = []
         self.get_tab_list() # initialize to default state
 
         # save the tab contents and remove them until we need em
@@ -99,6 +131,8 @@ class TerminalNotebook:
             if bg: view.modify_base(Gtk.StateType.NORMAL, Gdk.color_parse(bg))
             if fg: view.modify_text(Gtk.StateType.NORMAL, Gdk.color_parse(fg))
             if font: view.modify_font(Pango.FontDescription(font))
+            self.set_gutter(view)
+            view.connect_after("draw", self.draw_line_numbers, len(self.view) - 1)
         del buff
         widget_labels = ["scrolledwindow2", "scrolledwindow8", "scrolledwindow7",
                          "scrolledwindow5", "scrolledwindow4"]
@@ -231,6 +265,14 @@ class TerminalNotebook:
 
     def clear_buffers(self, *widget):
         """ Clear the text buffers """
+        self.store.reset()
+        self.line_count = 1
+        self.first_line = 0
+        for index in self.line_index[1:]:
+            del index[:]
+        self.pending = [[], [], [], []]
+        self.pending_overwrite = [False, False, False, False]
+        self.at_line_start = [True, True, True, True]
         self.view_buffer[TAB_PROCESS].set_text('')
         self.view_buffer[TAB_WARNING].set_text('')
         self.view_buffer[TAB_CAUTION].set_text('')
@@ -263,14 +305,21 @@ class TerminalNotebook:
             bufcoords = widget.window_to_buffer_coords(Gtk.TextWindowType.TEXT,x,y)
             # Set start iter at beginning of line (0)
             iStart = widget.get_iter_at_location(0,bufcoords[1])
-            # Set end iter far enough right to grab number (100)
-            iEnd = widget.get_iter_at_location(100,bufcoords[1])
             try:
-                # get line number from textbuffer (0 based)
+                # get the process line number of the clicked line,
+                # then its line in the process buffer (0 based)
                 # we'll do this inside a try clause in case the user
                 # clicks on a line without a number or anything else
                 # goes wrong!
-                line = int(iStart.get_text(iEnd)[0:6]) - 1
+                number = self.get_line_number(self.view.index(widget), iStart.get_line())
+                if not number:
+                    return False
+                line = number - 1 - self.first_line
+                if line < 0:
+                    # trimmed from the buffer
+                    self.set_statusbar(_("*** Line %d is no longer shown, save the log to see it")
+                            % number)
+                    return False
                 # Get the iter based on the line number index
                 iter = self.view_buffer[TAB_PROCESS].get_iter_at_line_index(line,0)
                 # Scroll to the line, try to position mid-screen
@@ -356,11 +405,7 @@ class TerminalNotebook:
         }
 
     def overwrite(self, num, text, tagname = None):
-        """ Overwrite text to a text buffer.  Line numbering based on
-            the process window line count is automatically added.
-            BUT -- if multiple text buffers are going to be updated,
-            always update the process buffer LAST to guarantee the
-            line numbering is correct.
+        """ Overwrite the last line of a text buffer.
             Optionally, text formatting can be applied as well
         """
         if text == '':
@@ -368,46 +413,182 @@ class TerminalNotebook:
             return
         #debug.dprint("Notebook: overwrite() -- num= " + str(num) + "..." + text)
         #debug.dprint(self.current_tab)
-        line_number = self.view_buffer[TAB_PROCESS].get_line_count()
-        iter = self.view_buffer[num].get_iter_at_line(line_number)
-        if iter.get_chars_in_line() >= 7:
-            iter.set_line_offset(7)
-        else:
-            debug.dprint("*** Notebook: overwrite: less than 7 chars in line... no linenumber???")
-            iter.set_line_offset(0)
-        end = iter.copy()
-        end.forward_line()
-        self.view_buffer[num].delete(iter, end)
+        self.drop_last_line(num)
         if tagname == None:
-           self.view_buffer[num].insert_with_tags_by_name(iter, text, *self.current_tagnames)
+            self.queue(num, text, tuple(self.current_tagnames))
         else:
-           self.view_buffer[num].insert_with_tags_by_name(iter, text, tagname)
+            self.queue(num, text, (tagname,))
+        if num == TAB_PROCESS:
+            self.store.overwrite(text)
+            self.line_count = len(self.store.offsets)
+        self.at_line_start[num] = text.endswith('\n')
 
-    def append(self, num, text, tagname = None):
+    def append(self, num, text, tagname = None, line_number = None):
         """ Append text to a text buffer.  Line numbering based on
             the process window line count is automatically added.
             BUT -- if multiple text buffers are going to be updated,
             always update the process buffer LAST to guarantee the
-            line numbering is correct.
+            line numbering is correct, or pass the line_number.
             Optionally, text formatting can be applied as well
         """
         #debug.dprint("Notebook: append() -- num= " + str(num) + "..." + text)
         #debug.dprint(self.current_tab)
-        line_number = self.view_buffer[TAB_PROCESS].get_line_count()
-        iter = self.view_buffer[num].get_end_iter()
-        lntext = str(line_number).zfill(6) + ' '
-        if self.last_text[num].endswith('\n'):
-            self.view_buffer[num].insert_with_tags_by_name(iter, lntext, 'linenumber')
+        if not text:
+            return
+        if num != TAB_PROCESS and self.at_line_start[num]:
+            self.line_index[num].append(line_number or self.line_count)
         if tagname == None:
-            #self.view_buffer[num].insert(iter, text)
             #debug.dprint("Notebook: append(): attempting to set text with tagnames " + str(self.current_tagnames))
-            self.view_buffer[num].insert_with_tags_by_name(iter, text, *self.current_tagnames)
+            self.queue(num, text, tuple(self.current_tagnames))
         else:
-            self.view_buffer[num].insert_with_tags_by_name(iter, text, tagname)
-        if self.auto_scroll[num] and num == self.current_tab:
-            self.scroll_current_view()
+            self.queue(num, text, (tagname,))
+        if num == TAB_PROCESS:
+            self.store.append(text)
+            self.line_count = len(self.store.offsets)
+        self.at_line_start[num] = text.endswith('\n')
         self.last_text[num] = text
 
+    def queue(self, num, text, tags):
+        """ Adds text to what the next flush() inserts """
+        pending = self.pending[num]
+        if pending and pending[-1][0] == tags:
+            pending[-1][1].append(text)
+        else:
+            pending.append([tags, [text]])
+        self.schedule_flush()
+
+    def drop_last_line(self, num):
+        """ Removes the unfinished last line from the pending text,
+            or marks the buffer's one for deletion """
+        pending = self.pending[num]
+        while pending:
+            text = ''.join(pending[-1][1])
+            end = text.rfind('\n') + 1
+            if end:
+                pending[-1][1] = [text[:end]]
+                return
+            del pending[-1]
+        self.pending_overwrite[num] = True
+
+    def schedule_flush(self):
+        if self.latency <= 0:
+            self.flush()
+        elif self.flush_id is None:
+            self.flush_id = GObject.timeout_add(self.latency, self.flush)
+
+    def after_flush(self, callback):
+        """ Calls callback() once the pending text is in the buffers """
+        self.flush_callbacks.append(callback)
+        self.schedule_flush()
+
+    def flush(self):
+        """ Inserts the pending text, one insert per tagged run.
+            Buffers are trimmed and scrolled once per flush """
+        if self.flush_id is not None:
+            GObject.source_remove(self.flush_id)
+            self.flush_id = None
+        for num in [TAB_PROCESS, TAB_WARNING, TAB_CAUTION, TAB_INFO]:
+            if not self.pending[num] and not self.pending_overwrite[num]:
+                continue
+            buff = self.view_buffer[num]
+            if self.pending_overwrite[num]:
+                iter = buff.get_end_iter()
+                iter.set_line_offset(0)
+                buff.delete(iter, buff.get_end_iter())
+                self.pending_overwrite[num] = False
+            iter = buff.get_end_iter()
+            for tags, texts in self.pending[num]:
+                buff.insert_with_tags_by_name(iter, ''.join(texts), *tags)
+            self.pending[num] = []
+            # don't move the text the user is reading
+            if self.auto_scroll[num] or num != self.current_tab:
+                self.trim(num)
+            if self.auto_scroll[num] and num == self.current_tab:
+                self.scroll_current_view()
+        callbacks = self.flush_callbacks
+        self.flush_callbacks = []
+        for callback in callbacks:
+            callback()
+        return False # don't repeat call
+
+    def trim(self, num):
+        """ Deletes the oldest lines of a buffer holding more than
+            max_lines.  The process lines stay in the store """
+        if not self.max_lines:
+            return
+        buff = self.view_buffer[num]
+        excess = buff.get_line_count() - self.max_lines
+        if excess < max(1, self.max_lines // TRIM_FRACTION):
+            return
+        buff.delete(buff.get_start_iter(), buff.get_iter_at_line(excess))
+        if num == TAB_PROCESS:
+            self.first_line += excess
+        else:
+            del self.line_index[num][:excess]
+
+    def get_line_number(self, num, line):
+        """ Returns the 1 based process line number of line
+            (0 based) of a buffer, or 0 if it has none """
+        if num == TAB_PROCESS:
+            return self.first_line + line + 1
+        if line < len(self.line_index[num]):
+            return self.line_index[num][line]
+        return 0
+
+    def set_gutter(self, view):
+        """ Makes room for the line numbers left of the text """
+        layout = view.create_pango_layout('0' * GUTTER_CHARS)
+        width = layout.get_pixel_size()[0]
+        view.set_border_window_size(Gtk.TextWindowType.LEFT, width)
+
+    def draw_line_numbers(self, view, cr, num):
+        """ Draws the line numbers of the visible lines """
+        window = view.get_window(Gtk.TextWindowType.LEFT)
+        if not window or not Gtk.cairo_should_draw_window(cr, window):
+            return False
+        cr.save()
+        Gtk.cairo_transform_to_window(cr, view, window)
+        fg = config.Prefs.TAG_DICT['linenumber'][0]
+        color = Gdk.RGBA()
+        if fg and color.parse(fg):
+            Gdk.cairo_set_source_rgba(cr, color)
+        rect = view.get_visible_rect()
+        iter = view.get_line_at_y(rect.y)[0]
+        layout = view.create_pango_layout('')
+        while True:
+            y, height = view.get_line_yrange(iter)
+            if y > rect.y + rect.height:
+                break
+            number = self.get_line_number(num, iter.get_line())
+            if number:
+                layout.set_text(str(number).zfill(6), -1)
+                x, y = view.buffer_to_window_coords(Gtk.TextWindowType.LEFT, 0, y)
+                cr.move_to(0, y)
+                PangoCairo.show_layout(cr, layout)
+            if not iter.forward_line():
+                break
+        cr.restore()
+        return False
+
+    def write_tab(self, num, _file):
+        """ Writes a tab's text to the file object _file.  The
+            whole process log is written, the other tabs with
+            their line numbers """
+        if num == TAB_PROCESS:
+            self.store.write_to(_file)
+            return
+        self.flush()
+        buff = self.view_buffer[num]
+        start = buff.get_start_iter()
+        while not start.is_end():
+            end = start.copy()
+            end.forward_line()
+            number = self.get_line_number(num, start.get_line())
+            if number:
+                _file.write(str(number).zfill(6) + ' ')
+            _file.write(buff.get_text(start, end, False))
+            start = end
+
     def append_all(self, text, all = False, tag = None):
         """ Append text to all buffers """
         # we need certain info in all tabs to know where
@@ -475,6 +656,7 @@ class TerminalNotebook:
             return False
 
     def set_startmark( self ):
+        self.flush()
         start_iter = self.view_buffer[TAB_PROCESS].get_end_iter()
         if self.command_start:
             # move the start mark
@@ -67,6 +67,8 @@ from types import (
 #from porthole.readers import ProcessOutputReader
 from porthole.utils.utils import get_treeview_selection
 from porthole.utils import debug
+from porthole.utils.emergelog import BadLogFile
+from porthole.utils.buildtime import BuildETA, get_predictor, progress_re, format_eta
 from porthole.terminal.constants import (
     COMPLETED,
     EXECUTE,
@@ -192,6 +194,8 @@ class TerminalQueue:
         self.play_btn.modify_fg(Gtk.StateType.PRELIGHT, Gdk.color_parse("#58F64A"))
         # initialize the model
         self.queue_model = QueueModel()
+        # remaining time of the running emerge, created when first needed
+        self.eta = None
         # initialize some variables
         self.task_completed = True
         self.queue_paused = False
@@ -367,6 +371,8 @@ class TerminalQueue:
         self.process_id = self.get_id()
         debug.dprint("TERM_QUEUE: There are pending processes, running now..id = " + str(self.process_id) + ". [" + command + "]" )
         self.task_completed = False
+        if self.eta:
+            self.eta.reset()
         self.set_process(EXECUTE)
         self._run(command, self.process_id)
         self.last_run_iter = self.process_iter.copy()
@@ -719,6 +725,8 @@ class TerminalQueue:
 
     def done( self, result):
         debug.dprint("TERM_QUEUE: done(); result = " + str(result))
+        if self.eta:
+            self.eta.reset()
         self.set_process(result)
         if self.last_run_iter:
             self.last_run_iter = self.process_iter.copy() #self.queue_model.iter_next(self.last_run_iter)
@@ -735,6 +743,41 @@ class TerminalQueue:
             wait_for = self.clicked()
             del wait_for
 
+    def get_eta( self ):
+        """Returns the BuildETA, or None if there is no build history"""
+        if self.eta is None:
+            try:
+                self.eta = BuildETA(get_predictor())
+            except BadLogFile as e:
+                debug.dprint("TERM_QUEUE: get_eta(); " + str(e))
+        return self.eta
+
+    def plan_merges( self, cpvs ):
+        """Sets the packages the next emerge is expected to merge"""
+        eta = self.get_eta()
+        if eta:
+            eta.plan(cpvs)
+
+    def merge_started( self, line ):
+        """Updates the ETA from an '>>> emerge (x of y) cpv' line"""
+        match = progress_re.search(line)
+        eta = self.get_eta()
+        if match and eta:
+            eta.started(match.group(3), int(match.group(1)), int(match.group(2)))
+
+    def merge_completed( self, cpv ):
+        """Updates the ETA after cpv was merged"""
+        if self.eta:
+            self.eta.completed(cpv)
+
+    def get_eta_string( self ):
+        """Returns the remaining time of the running emerge
+        for the statusbar, or an empty string"""
+        remaining = self.eta and self.eta.remaining()
+        if remaining is None:
+            return ""
+        return " (" + format_eta(remaining) + ")"
+
     def get_callback( self ):
         if self.process_iter:
             return self.queue_model.get_value(self.process_iter, self.queue_model.column['callback'])
@@ -60,8 +60,6 @@ from gi.repository import Pango
 import os
 import pty
 import signal
-import time
-import datetime
 import errno
 from base64 import (
     b64encode,
@@ -83,11 +81,19 @@ from gettext import gettext as _
     #~ path.append("/usr/lib/porthole")
 
 # import custom modules
-from porthole import backends
 from porthole.readers.process_reader import ProcessOutputReader
 from porthole.utils.dispatcher import Dispatcher
 from porthole.utils import debug
-from porthole.utils.utils import estimate, pretend_check
+from porthole.utils.utils import pretend_check
+from porthole.utils.emergelog import BadLogFile, split_cpv
+from porthole.utils.buildtime import (
+    SOURCE_PACKAGE,
+    SOURCE_SERIES,
+    format_duration,
+    get_predictor,
+    get_size,
+    strip_repo,
+)
 from porthole.terminal.term_queue import TerminalQueue
 from porthole.terminal.constants import (
     COMPLETED,
@@ -101,11 +107,16 @@ from porthole.terminal.constants import (
     TAB_PROCESS,
     TERMINATED_STRING,
 )
+from porthole.terminal.logloader import LogLoader
 from porthole.terminal.notebook import TerminalNotebook
+from porthole.terminal.tokenizer import OutputTokenizer
 from porthole.dialogs.fileselector import FileSelector2
 from porthole import config
 
-class ProcessManager: #dbus.service.Object):
+# blocks of log lines shown per update() while loading a log
+LOG_BLOCKS = 4
+
+class ProcessManager(OutputTokenizer): #dbus.service.Object):
     """ Manages queued and running processes """
     def __init__(self, env = {}, log_mode = False):
         """ Initialize """
@@ -150,6 +161,8 @@ class ProcessManager: #dbus.service.Object):
         self.clipboard = Gtk.Clipboard()
         # create the process reader
         self.reader = ProcessOutputReader(Dispatcher(self.process_done))
+        # loads the log opened in log mode, see fill_buffer()
+        self.loader = None
         # Added a Line Feed check in order to bypass code if LF's are not used ==> CR only
         self.LF_check = True #False
         #self.cr_count = 0
@@ -159,19 +172,9 @@ class ProcessManager: #dbus.service.Object):
 
 
     def reset_buffer_update(self):
-        # clear process output buffer
-        self.process_buffer = ''
-        self.line_buffer = ''
-        # set some persistent variables for text capture
-        self.catch_seq = False
-        self.escape_seq = "" # to catch the escape sequence in
-        self.first_cr = True  # first time cr is detected for a line
-        self.overwrite_till_nl = False  # overwrite until after a '\n' detected for this line
+        # clear process output buffer and the text capture state
+        self.reset_tokenizer()
         self.resume_line = None
-        self.lastchar = ''
-        self.cr_flag = False
-        self.b_flag = False
-        self.force_buffer_write = True
 
     def show_window(self):
         """ Show the process window """
@@ -470,12 +473,10 @@ class ProcessManager: #dbus.service.Object):
     def kill(self):
         """Kill process."""
         if self.log_mode:
-            self.reader.file_input = False
-            debug.dprint("LOG: kill() wait for reader to notice")
-            # wait for ProcessOutputReader to notice
-            time.sleep(.5)
-            debug.dprint("LOG: kill() -- self.reader.f.close()")
-            self.reader.f.close()
+            if self.loader:
+                debug.dprint("LOG: kill() -- self.loader.close()")
+                self.loader.close()
+                self.loader = None
             self.file_input = False
             debug.dprint("LOG: leaving kill()")
             return True
@@ -551,6 +552,10 @@ class ProcessManager: #dbus.service.Object):
         debug.dprint("TERMINAL: done cleaning up emerge processes")
         return retval
 
+    def buffer_written(self):
+        """ Allow the next forced buffer write once this one is shown """
+        self.term.after_flush(self.force_buffer_write_timer)
+
     def force_buffer_write_timer(self):
         """ Indicates that text in the buffer should be displayed immediately. """
         #debug.dprint("TERMINAL: force_buffer_write_timer(): setting True")
@@ -588,7 +593,8 @@ class ProcessManager: #dbus.service.Object):
             self.term.append(TAB_WARNING, self.line_buffer, tag)
             if not self.file_input:
                 self.set_file_name(self.line_buffer)
-                self.set_statusbar(self.line_buffer[:-1])
+                self.process_queue.merge_started(self.line_buffer)
+                self.set_statusbar(self.line_buffer[:-1] + self.process_queue.get_eta_string())
                 self.resume_line = self.line_buffer
                 if self.callback_armed:
                     self.do_callback()
@@ -634,6 +640,9 @@ class ProcessManager: #dbus.service.Object):
                 self.callback_package = self.line_buffer.split()[1]
                 self.callback_armed = True
                 debug.dprint("TERMINAL: update(); Detected sucessfull merge of package: " + self.callback_package)
+                self.process_queue.merge_completed(self.callback_package)
+                if self.resume_line:
+                    self.set_statusbar(self.resume_line[:-1] + self.process_queue.get_eta_string())
             #else:
                 #debug.dprint("TERMINAL: update(); merge not detected")
 
@@ -677,143 +686,68 @@ class ProcessManager: #dbus.service.Object):
         # stores line of text in buffer
         # if the string is locked, we'll get it on the next round
         #cr_flag = False   # Carriage Return flag
-        if self.reader.string_locked:
-            return True
+        text = self.reader.get_output()
         if not self.window_visible:
-            self.reader.string = ''
             return True
-        # lock the string
-        self.reader.string_locked = True
-        for char in self.reader.string:
-            if char:
-                ord_char = ord(char)
-                #if ord_char <=31 or (ord_char >=127 and ord_char<=160):
-                #    debug.dprint("TERMINAL: adding control char to buffer: %s" % (ord_char ))
-                # if we find a CR without a LF, switch to overwrite mode
-                if self.cr_flag:
-                    # gcc and some emerge output no longer outputs a LF so addded a bypass switch
-                    # no, seems gcc is sending 2 <cr>'s before a LF
-                    if (self.LF_check and ord_char != 10): # or ord(self.lastchar) == 13:
-                        #debug.dprint("TERMINAL: self.LF_check = True and the next char != 10, but = %d, self.cr_count = %d, self.lastchar = %d" %(ord_char, self.cr_count,ord(self.lastchar)))
-                        tag = None
-                        if self.first_cr:
-                            #debug.dprint("TERMINAL: self.first_cr = True")
-                            self.term.append(TAB_PROCESS, self.process_buffer, tag)
-                            self.first_cr = False
-                            #debug.dprint("TERMINAL: resetting self.first_cr to True, setting self.overwrite_till_nl = True")
-                            self.overwrite_till_nl = True
-                            self.process_buffer = ''
-                            self.line_buffer = ''
-                        # overwrite until after a '\n' detected for this line
-                        else:
-                            #debug.dprint("TERMINAL: self.first_cr = False, calling overwrite()")
-                            self.term.overwrite(TAB_PROCESS, self.process_buffer, tag)
-                            self.process_buffer = ''
-                            self.line_buffer = ''
-                    else:
-                        # reset for next time
-                        self.first_cr = True
-                    self.cr_flag = False
-                # catch portage escape sequences for colour and terminal title
-                if self.catch_seq and ord_char != 27:
-                    self.escape_seq += char
-                    if self.escape_seq.startswith('['):
-                        # xterm escape sequence. terminated with:
-                        # @ (63), A to Z (64 to 90), a to z (97 to 122), {,|,},~ (123 to 126)
-                        # and _perhaps_ '`' (96) (an erroneous character may be output to the
-                        # screen after this)
-                        # also note: this list may not be exhaustive......
-                        if 63 <= ord_char <= 90 or 96 <= ord_char <= 126:
-                            self.catch_seq = False
-                            #debug.dprint('escape_seq = ' + self.escape_seq)
-                            self.term.parse_escape_sequence(self.escape_seq)
-                            self.escape_seq = ''
-                    elif self.escape_seq.startswith(']'):
-                        if ord_char == 7 or self.escape_seq.endswith('\x1b\\'):
-                            self.catch_seq = False
-                            self.term.parse_escape_sequence(self.escape_seq)
-                            self.escape_seq = ''
-                    elif self.escape_seq.startswith('k'): # note - terminated with chr(27) + \
-                        if self.escape_seq.endswith('\x1b\\'): # \x1b = chr(27)
-                            self.catch_seq = False
-                            self.term.parse_escape_sequence(self.escape_seq)
-                            self.escape_seq = ''
-                    else: # don't know how to handle this - stop now
-                        self.catch_seq = False
-                        self.term.parse_escape_sequence(self.escape_seq)
-                        self.escape_seq = ''
-                elif ord_char == 27:
-                    if self.escape_seq.startswith("k"):
-                        self.escape_seq += char
-                    else:
-                        self.catch_seq = True
-                        self.term.append(TAB_PROCESS, self.process_buffer, None)
-                        self.process_buffer = ''
-                elif char == '\b' : # backspace
-                    # this is used when portage prints ">>> Updating Portage Cache"
-                    # it uses backspaces to update the number. So on each update
-                    # we display the old value (better than waiting for \n)
-                    # (it's also used for the spinner and some other stuff)
-                    if self.lastchar != '\b': # i.e. starting to delete old value
-                        if not self.b_flag: # initial display
-                            self.term.append(TAB_PROCESS, self.line_buffer)
-                        else: # every other display until \n is found
-                            #debug.dprint("TERMINAL: self.b_flag = True, calling overwrite()")
-                            self.term.overwrite(TAB_PROCESS, self.line_buffer)
-                    #self.process_buffer = ''
-                    self.line_buffer = self.line_buffer[:-1]
-                    self.b_flag = True
-                    #debug.dprint("TERMINAL: self.b_flag = True, setting self.overwrite_till_nl = True")
-                    self.overwrite_till_nl = True
-                elif ord(char) == 13:  # carriage return
-                    self.cr_flag = True
-                    #self.cr_count += 1
-                    #debug.dprint("TERMINAL: update(); <cr> detected, self.cr_count = %d, self.lastchar = %d" %(self.cr_count, ord(self.lastchar)))
-                elif 32 <= ord_char <= 127 or ord_char == 10: # no unprintable
-                    self.process_buffer += char
-                    self.line_buffer += char
-                    if ord_char == 10: # newline
-                        #debug.dprint("TERMINAL: update(); <LF> detected, self.cr_count = " + str(self.cr_count))
-                        self.newline()
-                    elif self.force_buffer_write:
-                        if self.overwrite_till_nl:
-                            self.term.overwrite(TAB_PROCESS, self.line_buffer)
-                            self.line_buffer = ''
-                        else:
-                            self.term.append(TAB_PROCESS, self.process_buffer)
-                            self.process_buffer = ''
-                        self.force_buffer_write = False
-                        GObject.timeout_add(200, self.force_buffer_write_timer)
-                self.lastchar = char
-        else: # if reader string is empty... maybe waiting for input
-            if self.force_buffer_write and self.process_buffer:
-                #debug.dprint("TERMINAL: update(): nothing else to do - forcing text to buffer")
-                if self.overwrite_till_nl:
-                    #self.term.overwrite(TAB_PROCESS, self.line_buffer)
-                    #self.line_buffer = ''
-                    pass
-                else:
-                    self.term.append(TAB_PROCESS, self.process_buffer)
-                    self.process_buffer = ''
-                self.force_buffer_write = False
-                GObject.timeout_add(200, self.force_buffer_write_timer)
-                # perhaps sudo is waiting for a password
-                # note: the prompt is set to "Password:" in the command string
-                # to override any default.
-                if self.line_buffer.startswith("Password:"):
-                    self.do_password_popup()
-        self.reader.string = ""
-        #debug.dprint("TERMINAL: update() checking file input/reader finished")
-        if self.file_input and not self.reader.file_input: # reading file finished
-            debug.dprint("LOG: update()... end of file input... cleaning up")
-            self.term.view_buffer[TAB_PROCESS].set_modified(False)
+        if self.loader:
+            self.update_log()
+            return True
+        self.feed(text)
+        # if reader string is empty... maybe waiting for input
+        if self.force_buffer_write and self.process_buffer:
+            #debug.dprint("TERMINAL: update(): nothing else to do - forcing text to buffer")
+            if self.overwrite_till_nl:
+                #self.term.overwrite(TAB_PROCESS, self.line_buffer)
+                #self.line_buffer = ''
+                pass
+            else:
+                self.term.append(TAB_PROCESS, self.process_buffer)
+                self.process_buffer = ''
+            self.force_buffer_write = False
+            self.buffer_written()
+            # perhaps sudo is waiting for a password
+            # note: the prompt is set to "Password:" in the command string
+            # to override any default.
+            if self.line_buffer.startswith("Password:"):
+                self.do_password_popup()
+        return True
+
+    def update_log(self):
+        """ Shows the blocks of the log loaded so far """
+        for x in range(LOG_BLOCKS):
+            block = self.loader.get_block()
+            if block is None:
+                break
+            self.show_log_block(block)
+        if self.loader.is_done(): # reading file finished
+            debug.dprint("LOG: update_log()... end of file input... cleaning up")
             self.finish_update()
-            self.set_statusbar(_("*** Log loading complete : %s") % self.filename)
-            self.reader.f.close()
+            self.term.flush()
+            self.term.view_buffer[TAB_PROCESS].set_modified(False)
+            self.set_statusbar(_("*** Log loading complete : %s") % self.loader.filename)
+            self.loader.close()
+            self.loader = None
             self.file_input = False
-        # unlock the string
-        self.reader.string_locked = False
-        return True
+        elif self.loader.indexed:
+            self.set_statusbar(_("*** Loading File : %(filename)s, line %(line)d of %(count)d")
+                    % {"filename": self.loader.filename, "line": self.loader.shown,
+                       "count": self.loader.get_line_count()})
+
+    def show_log_block(self, block):
+        """ Adds a block of log lines to the tabs, as newline() would """
+        for num, line_number, tag, text in block.tab_lines:
+            if tag != 'emerge':
+                if not self.term.tab_showing[num]:
+                    self.term.show_tab(num)
+                    self.term.view_buffer[num].set_modified(True)
+                if num == TAB_WARNING:
+                    self.warning_count += 1
+                elif num == TAB_CAUTION:
+                    self.caution_count += 1
+            self.term.append(num, text, tag, line_number)
+        # the process tab LAST, see TerminalNotebook.append()
+        for tag, lines in block.runs:
+            self.term.append(TAB_PROCESS, ''.join(lines), tag)
 
     def do_password_popup(self):
         """ Pops up a dialog asking for the users password """
@@ -972,7 +906,7 @@ class ProcessManager: #dbus.service.Object):
             killed_string = _(KILLED_STRING)
             self.term.append_all(killed_string,True)
             self.set_statusbar(killed_string[:-1])
-            self.reader.string = ''
+            self.reader.get_output() # discard the rest
             self.reset_buffer_update()
             # remove stored password
             #if hasattr(self, 'password'):
@@ -1036,51 +970,48 @@ class ProcessManager: #dbus.service.Object):
 
     def estimate_build_time(self):
         """Estimates build times based on emerge --pretend output"""
+        self.term.flush()
         start_iter = self.term.view_buffer[TAB_PROCESS].get_iter_at_mark(self.term.command_start)
         output = self.term.view_buffer[TAB_PROCESS].get_text(start_iter,
                                  self.term.view_buffer[TAB_PROCESS].get_end_iter(), False)
         package_list = []
-        total = datetime.timedelta()
+        sizes = {}
         for line in output.split("\n"):
             if config.Config.ebuild_re.match(line):
                 tokens = line.split(']')
                 tokens = tokens[1].split()
-                tmp_name = backends.portage_lib.get_name(tokens[0])
-                name = ""
-                # We want to get rid of the version number in the package name
-                # because if a user is upgrading from, for instance, mozilla 1.4 to
-                # 1.5, there's a good chance the build times will be pretty close.
-                # So, we want to match only on the name
-                for j in range(0, len(tmp_name)):
-                    if tmp_name[j] == "-" and tmp_name[j+1].isdigit():
-                        break
-                    else:
-                        name += tmp_name[j]
-                package_list.append(name)
+                cpv = strip_repo(tokens[0])
+                package_list.append(cpv)
+                size = get_size(line)
+                if size is not None:
+                    sizes[split_cpv(cpv)[0]] = size
         if len(package_list) > 0:
-            for package in package_list:
-                try:
-                    curr_estimate = estimate(package)
-                except:
-                    return None
-                if curr_estimate != None:
-                    total += curr_estimate
-                else:
-                    self.term.append(TAB_PROCESS, _(
-                            "*** Unfortunately, you don't have enough " \
-                            "logged information about the listed packages " \
-                            "to calculate estimated build times " \
-                            "accurately.\n"), 'note')
-                    return None
+            try:
+                predictor = get_predictor()
+            except BadLogFile as e:
+                debug.dprint("TERMINAL: estimate_build_time(); " + str(e))
+                return None
+            predictor.add_sizes(sizes)
+            total = high = 0.0
+            guessed = 0
+            for cpv in package_list:
+                seconds, seconds_high, source = predictor.predict(cpv)
+                total += seconds
+                high += seconds_high
+                if source not in (SOURCE_SERIES, SOURCE_PACKAGE):
+                    guessed += 1
+            self.process_queue.plan_merges(package_list)
             self.term.append(TAB_PROCESS, _(
                         "*** Based on the build history of these packages " \
                         "on your system, I can estimate that emerging them " \
-                        "usually takes, on average, " \
-                        "%(days)d days, %(hours)d hrs, %(minutes)d mins, and %(seconds)d secs.\n") %
-                        {'days': total.seconds // (24 * 3600),\
-                         'hours': (total.seconds % (24 * 3600)) // 3600,\
-                         'minutes': ((total.seconds % (24 * 3600))  % 3600) //  60,\
-                         'seconds': ((total.seconds % (24 * 3600))  % 3600) %  60}, 'note')
+                        "usually takes %(total)s, and rarely more than %(high)s.\n") %
+                        {'total': format_duration(total), 'high': format_duration(high)}, 'note')
+            if guessed:
+                self.term.append(TAB_PROCESS, _(
+                        "*** %(guessed)d of the %(count)d packages were never " \
+                        "built on your system, their times are guessed from " \
+                        "similar packages.\n") %
+                        {'guessed': guessed, 'count': len(package_list)}, 'note')
             self.term.append(TAB_PROCESS, _(
                         "*** Note: If you have a lot of programs running on " \
                         "your system while porthole is emerging packages, " \
@@ -1219,14 +1150,18 @@ class ProcessManager: #dbus.service.Object):
             return filename
 
     def fill_buffer(self, filename):
-        """loads a file into the reader.string"""
+        """loads a file, the first lines at once and
+        the rest from update() as they are read"""
         debug.dprint("LOG: Entering fill_buffer")
+        if self.loader:
+            self.loader.close()
+            self.loader = None
         self.clear_buffer(None)
         self.warning_count = 0
         self.caution_count = 0
-        self.set_statusbar(_("*** Loading File : %s") % self.filename)
+        self.set_statusbar(_("*** Loading File : %s") % filename)
         try:
-            self.reader.f = open(filename, "r")
+            loader = LogLoader(filename)
         except IOError as xxx_todo_changeme1:
             (errnum, errmsg) = xxx_todo_changeme1.args
             d = {"filename" : filename, "errmsg" : errmsg}
@@ -1239,8 +1174,10 @@ class ProcessManager: #dbus.service.Object):
             dialog.destroy()
             return False
 
+        self.show_log_block(loader.first_screen())
+        self.loader = loader
+        self.loader.start()
         self.file_input = True
-        self.reader.file_input = True
         return True
 
     def save_buffer(self):
@@ -1271,21 +1208,8 @@ class ProcessManager: #dbus.service.Object):
         self.set_statusbar(_("*** saving file: %s") % self.filename)
         try:
             file = open(self.filename, "w")
-            # if buffer is "Process" strip line numbers
-            if self.buffer_num == TAB_PROCESS:
-                start = self.buffer_to_save.get_start_iter()
-                while not start.is_end():
-                    end = start.copy(); end.forward_line()
-                    chars = self.buffer_to_save.get_text(start, end, False)
-                    file.write(chars[7:])
-                    chars = ""
-                    start.forward_line()
-
-            else: # save the entire buffer
-                start, end = self.buffer_to_save.get_bounds()
-                chars = self.buffer_to_save.get_text(start, end, False)
-                file.write(chars)
-
+            # the whole log, not just the lines still in the buffer
+            self.term.write_tab(self.buffer_num, file)
             file.close()
             self.buffer_to_save.set_modified(False)
             result = True
@@ -0,0 +1,200 @@
+#!/usr/bin/env python
+
+"""
+    Terminal output tokenizer
+    Splits process output into text runs, lines, escape sequences and
+    CR/backspace overwrites, a run at a time instead of a char at a time.
+
+    Copyright (C) 2003 - 2009 Fredrik Arnerup, Brian Dolbec,
+    Daniel G. Taylor, Wm. F. Wheeler, Tommy Iorns
+
+    This program is free software; you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation; either version 2 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program; if not, write to the Free Software
+    Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+"""
+
+import re
+
+from porthole.terminal.constants import TAB_PROCESS
+
+# printable chars are ord 32 to 127, everything else but LF, BS, CR
+# and ESC is dropped
+token_re = re.compile("([\x20-\x7f]*\r?\n)"          # a complete line
+                      "|([\x20-\x7f]+)"              # text with no LF yet
+                      "|([^\x08\x0a\x0d\x1b\x20-\x7f]+)" # unprintable, dropped
+                      "|(.)", re.S)                  # BS, CR or ESC
+# the rest of an xterm escape sequence, terminated with:
+# @ (63), A to Z (64 to 90), a to z (97 to 122), {,|,},~ (123 to 126)
+# and _perhaps_ '`' (96) (an erroneous character may be output to the
+# screen after this)
+# also note: this list may not be exhaustive......
+csi_re = re.compile("[^\x1b\x3f-\x5a\x60-\x7e]*[\x3f-\x5a\x60-\x7e]")
+
+
+class OutputTokenizer(object):
+    """Mixin feeding process output to a TerminalNotebook.
+    The class using it provides self.term, self.LF_check, newline(),
+    which is called with the complete line in self.line_buffer,
+    and optionally buffer_written()"""
+
+    def reset_tokenizer(self):
+        """Clears the buffers and the state kept between feeds"""
+        self.process_buffer = ''
+        self.line_buffer = ''
+        # set some persistent variables for text capture
+        self.catch_seq = False
+        self.escape_seq = "" # to catch the escape sequence in
+        self.first_cr = True  # first time cr is detected for a line
+        self.overwrite_till_nl = False  # overwrite until after a '\n' detected for this line
+        self.lastchar = ''
+        self.cr_flag = False
+        self.b_flag = False
+        self.force_buffer_write = True
+
+    def buffer_written(self):
+        """Called after the unfinished line was forced to the buffer,
+        set force_buffer_write again when it should be done next"""
+        pass
+
+    def feed(self, text):
+        """Tokenizes text, which may end anywhere in a line
+        or escape sequence"""
+        pos = 0
+        end = len(text)
+        match_token = token_re.match
+        while pos < end:
+            if self.cr_flag:
+                self.carriage_return(text[pos])
+            if self.catch_seq:
+                pos = self.escape_char(text, pos)
+                continue
+            match = match_token(text, pos)
+            pos = match.end()
+            if match.lastindex == 1:
+                line = match.group(1)
+                if line.endswith('\r\n'):
+                    # the CR is followed by the LF, no overwrite
+                    line = line[:-2] + '\n'
+                    self.first_cr = True
+                self.process_buffer += line
+                self.line_buffer += line
+                self.newline()
+            elif match.lastindex == 2:
+                run = match.group(2)
+                self.process_buffer += run
+                self.line_buffer += run
+                if self.force_buffer_write:
+                    if self.overwrite_till_nl:
+                        self.term.overwrite(TAB_PROCESS, self.line_buffer)
+                        self.line_buffer = ''
+                    else:
+                        self.term.append(TAB_PROCESS, self.process_buffer)
+                        self.process_buffer = ''
+                    self.force_buffer_write = False
+                    self.buffer_written()
+            elif match.lastindex == 4:
+                self.control_char(match.group(4))
+            self.lastchar = text[pos - 1]
+
+    def carriage_return(self, char):
+        """Handles the char after a CR, without consuming it"""
+        # if we find a CR without a LF, switch to overwrite mode
+        # gcc and some emerge output no longer outputs a LF so addded a bypass switch
+        # no, seems gcc is sending 2 <cr>'s before a LF
+        if self.LF_check and char != '\n':
+            tag = None
+            if self.first_cr:
+                self.term.append(TAB_PROCESS, self.process_buffer, tag)
+                self.first_cr = False
+                self.overwrite_till_nl = True
+                self.process_buffer = ''
+                self.line_buffer = ''
+            # overwrite until after a '\n' detected for this line
+            else:
+                self.term.overwrite(TAB_PROCESS, self.process_buffer, tag)
+                self.process_buffer = ''
+                self.line_buffer = ''
+        else:
+            # reset for next time
+            self.first_cr = True
+        self.cr_flag = False
+
+    def escape_char(self, text, pos):
+        """Adds text[pos] (and for xterm sequences everything up to the
+        terminator) to the escape sequence, returns the next position"""
+        char = text[pos]
+        if char == '\x1b':
+            self.control_char(char)
+            self.lastchar = char
+            return pos + 1
+        if self.escape_seq.startswith('[') or (not self.escape_seq and char == '['):
+            start = pos
+            if not self.escape_seq:
+                # the '[' itself is not a terminator
+                start += 1
+            match = csi_re.match(text, start)
+            if match:
+                self.escape_seq += text[pos:match.end()]
+                self.finish_escape()
+                pos = match.end()
+            else:
+                # the sequence continues in the next feed or at an ESC
+                stop = text.find('\x1b', pos)
+                if stop < 0:
+                    stop = len(text)
+                self.escape_seq += text[pos:stop]
+                pos = stop
+            self.lastchar = text[pos - 1]
+            return pos
+        self.escape_seq += char
+        self.lastchar = char
+        if self.escape_seq.startswith(']'):
+            if char == '\x07' or self.escape_seq.endswith('\x1b\\'):
+                self.finish_escape()
+        elif self.escape_seq.startswith('k'): # note - terminated with chr(27) + \
+            if self.escape_seq.endswith('\x1b\\'): # \x1b = chr(27)
+                self.finish_escape()
+        else:
+            # don't know how to handle this - stop now
+            self.finish_escape()
+        return pos + 1
+
+    def finish_escape(self):
+        self.catch_seq = False
+        self.term.parse_escape_sequence(self.escape_seq)
+        self.escape_seq = ''
+
+    def control_char(self, char):
+        """Handles an ESC, backspace or CR"""
+        if char == '\x1b':
+            if self.escape_seq.startswith("k"):
+                self.escape_seq += char
+            else:
+                self.catch_seq = True
+                self.term.append(TAB_PROCESS, self.process_buffer, None)
+                self.process_buffer = ''
+        elif char == '\b' : # backspace
+            # this is used when portage prints ">>> Updating Portage Cache"
+            # it uses backspaces to update the number. So on each update
+            # we display the old value (better than waiting for \n)
+            # (it's also used for the spinner and some other stuff)
+            if self.lastchar != '\b': # i.e. starting to delete old value
+                if not self.b_flag: # initial display
+                    self.term.append(TAB_PROCESS, self.line_buffer)
+                else: # every other display until \n is found
+                    self.term.overwrite(TAB_PROCESS, self.line_buffer)
+            self.line_buffer = self.line_buffer[:-1]
+            self.b_flag = True
+            self.overwrite_till_nl = True
+        elif char == '\r':  # carriage return
+            self.cr_flag = True
@@ -0,0 +1,280 @@
+#!/usr/bin/env python
+
+'''
+    Porthole build time prediction
+    Predicts how long merging a package takes from the build history
+    in the emerge.log index, and keeps a running ETA of an emerge.
+
+    Copyright (C) 2003 - 2009 Fredrik Arnerup, Daniel G. Taylor
+    Brian Dolbec, Wm. F. Wheeler, Tommy Iorns
+
+    This program is free software; you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation; either version 2 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program; if not, write to the Free Software
+    Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+'''
+
+import re
+import time
+from gettext import gettext as _
+
+from porthole.utils import debug
+from porthole.utils.emergelog import LOG_FILE, get_index, split_cpv, strip_repo
+
+# where a prediction came from, best first
+SOURCE_SERIES = 'series'
+SOURCE_PACKAGE = 'package'
+SOURCE_SIZE = 'size'
+SOURCE_CATEGORY = 'category'
+SOURCE_DEFAULT = 'default'
+# the percentile reported as the pessimistic estimate
+HIGH_PERCENTILE = 0.9
+# used when there is no history at all
+DEFAULT_SECONDS = 300
+# how far the ETA may scale the predictions to match the actual builds
+MIN_FACTOR = 0.25
+MAX_FACTOR = 4.0
+
+# the major.minor version series of a version
+series_re = re.compile("^(\\d+)(\\.\\d+)?")
+# "(3 of 10) sys-apps/foo-1.2::gentoo" in the emerge lines
+progress_re = re.compile("\\((\\d+) of (\\d+)\\) (\\S+)")
+# the download size at the end of an emerge --pretend --verbose line
+size_re = re.compile("\\s([\\d,.]+) ([kKMG])i?B\\s*$")
+SIZE_UNITS = {'k': 1 << 10, 'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30}
+
+
+def percentile(values, fraction):
+    """Returns the fraction (0.0 - 1.0) percentile of the sorted values,
+    interpolating between the two nearest ones"""
+    if not values:
+        return None
+    pos = (len(values) - 1) * fraction
+    low = int(pos)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (pos - low)
+
+def median(values):
+    """Returns the median of the sorted values"""
+    return percentile(values, 0.5)
+
+def version_series(version):
+    """Returns the major.minor series of version, '' if it has none"""
+    match = series_re.match(version)
+    if match:
+        return match.group(0)
+    return ''
+
+def get_size(line):
+    """Returns the download size (in bytes) listed on an
+    emerge --pretend line, or None"""
+    match = size_re.search(line)
+    if not match:
+        return None
+    try:
+        return int(float(match.group(1).replace(",", "")) * SIZE_UNITS[match.group(2)])
+    except ValueError:
+        return None
+
+def format_duration(seconds):
+    """Returns seconds as a '1 days, 2 hrs, 3 mins, and 4 secs' string"""
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    days, hours = divmod(hours, 24)
+    return _("%(days)d days, %(hours)d hrs, %(minutes)d mins, and %(seconds)d secs") % \
+            {'days': days, 'hours': hours, 'minutes': minutes, 'seconds': seconds}
+
+def format_eta(seconds):
+    """Returns a short remaining time string for the statusbar"""
+    minutes = int(seconds + 59) // 60
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return _("about %(hours)d hrs %(minutes)d mins left") % \
+                {'hours': hours, 'minutes': minutes}
+    return _("about %d mins left") % minutes
+
+
+class BuildPredictor(object):
+    """Predicts build durations from an EmergeLogIndex.
+    Packages without history fall back to the rate per byte of
+    download size, then to their category, then to all packages"""
+
+    def __init__(self, index):
+        self.index = index
+        # {category/package: download size in bytes}, learned from
+        # emerge --pretend output
+        self.sizes = {}
+        self.reset()
+
+    def reset(self):
+        """Forgets the statistics, call it when the index changed"""
+        # {key: sorted durations}, key is cp or (cp, series)
+        self.durations = {}
+        # {category: sorted package medians}
+        self.categories = None
+        self.all_medians = None
+        self.size_rate = None
+
+    def get_durations(self, cp, series = None):
+        """Returns the sorted build durations of cp, only those
+        of the version series if it is given"""
+        key = series is None and cp or (cp, series)
+        if key not in self.durations:
+            history = self.index.durations.get(cp, [])
+            if series is not None:
+                history = [entry for entry in history
+                        if version_series(entry[1]) == series]
+            self.durations[key] = sorted(entry[2] for entry in history)
+        return self.durations[key]
+
+    def get_categories(self):
+        """Returns {category: sorted medians of its packages}"""
+        if self.categories is None:
+            self.categories = {}
+            for cp in self.index.durations:
+                durations = self.get_durations(cp)
+                if durations:
+                    self.categories.setdefault(cp.split("/")[0], []).append(median(durations))
+            for medians in self.categories.values():
+                medians.sort()
+            self.all_medians = sorted(m for medians in self.categories.values()
+                    for m in medians)
+        return self.categories
+
+    def add_sizes(self, sizes):
+        """Adds {category/package: download size} to what is known"""
+        self.sizes.update(sizes)
+        self.size_rate = None
+
+    def get_size_rate(self):
+        """Returns the median build seconds per byte downloaded of the
+        packages with both a history and a known size, or None"""
+        if self.size_rate is None:
+            rates = sorted(median(self.get_durations(cp)) / size
+                    for cp, size in self.sizes.items()
+                    if size and self.get_durations(cp))
+            # a single package says nothing about the others
+            self.size_rate = len(rates) > 1 and median(rates) or 0
+        return self.size_rate or None
+
+    def predict(self, cpv, size = None):
+        """Returns (median, high, source) of the build time of cpv in
+        seconds, high is the HIGH_PERCENTILE duration"""
+        cp, version = split_cpv(strip_repo(cpv))
+        durations = self.get_durations(cp, version_series(version))
+        source = SOURCE_SERIES
+        if not durations:
+            durations = self.get_durations(cp)
+            source = SOURCE_PACKAGE
+        if durations:
+            return median(durations), percentile(durations, HIGH_PERCENTILE), source
+        if size is None:
+            size = self.sizes.get(cp)
+        rate = size and self.get_size_rate()
+        if rate:
+            return size * rate, size * rate, SOURCE_SIZE
+        medians = self.get_categories().get(cp.split("/")[0])
+        source = SOURCE_CATEGORY
+        if not medians:
+            medians = self.all_medians
+            source = SOURCE_DEFAULT
+        if not medians:
+            return DEFAULT_SECONDS, DEFAULT_SECONDS, SOURCE_DEFAULT
+        return median(medians), percentile(medians, HIGH_PERCENTILE), source
+
+
+class BuildETA(object):
+    """Remaining time of a running emerge, updated as each merge
+    starts and completes.  The predictions are scaled by how fast
+    the completed merges were compared to what was predicted"""
+
+    def __init__(self, predictor):
+        self.predictor = predictor
+        self.planned = []
+        self.reset()
+
+    def reset(self):
+        """Forgets the running emerge, the plan is kept"""
+        # (cpv, predicted seconds, start time) of the merge in progress
+        self.current = None
+        # merges still to come that are not in the plan
+        self.unplanned = 0
+        self.predicted_total = 0.0
+        self.actual_total = 0.0
+        # predictions of the merges seen so far, for the unplanned ones
+        self.seen = []
+
+    def plan(self, cpvs):
+        """Sets the cpvs the next emerge is expected to merge, in order"""
+        self.planned = [strip_repo(cpv) for cpv in cpvs]
+
+    def get_factor(self):
+        if not self.predicted_total:
+            return 1.0
+        return min(MAX_FACTOR, max(MIN_FACTOR, self.actual_total / self.predicted_total))
+
+    def started(self, cpv, num, total, now = None):
+        """Merge num of total, cpv, has started"""
+        cpv = strip_repo(cpv)
+        if now is None:
+            now = time.time()
+        if cpv in self.planned:
+            # drop it and whatever was skipped before it
+            del self.planned[:self.planned.index(cpv) + 1]
+            self.unplanned = max(0, total - num - len(self.planned))
+        else:
+            self.planned = []
+            self.unplanned = max(0, total - num)
+        predicted = self.predictor.predict(cpv)[0]
+        self.seen.append(predicted)
+        self.current = (cpv, predicted, now)
+
+    def completed(self, cpv, now = None):
+        """cpv has been merged"""
+        if not self.current or self.current[0] != strip_repo(cpv):
+            return
+        if now is None:
+            now = time.time()
+        self.predicted_total += self.current[1]
+        self.actual_total += now - self.current[2]
+        self.current = None
+
+    def remaining(self, now = None):
+        """Returns the seconds left, or None if no emerge is running"""
+        if not self.current and not self.planned and not self.unplanned:
+            return None
+        if now is None:
+            now = time.time()
+        factor = self.get_factor()
+        left = 0.0
+        if self.current:
+            left += max(0.0, self.current[1] * factor - (now - self.current[2]))
+        for cpv in self.planned:
+            left += self.predictor.predict(cpv)[0] * factor
+        if self.unplanned and self.seen:
+            left += self.unplanned * factor * sum(self.seen) / len(self.seen)
+        return left
+
+
+# one predictor per log, its index is updated as it is used
+_predictors = {}
+
+def get_predictor(log_file = LOG_FILE):
+    """Returns the BuildPredictor of log_file, up to date with the log.
+    Raises BadLogFile if the log can not be read"""
+    predictor = _predictors.get(log_file)
+    if predictor is None:
+        predictor = _predictors[log_file] = BuildPredictor(get_index(log_file))
+    elif predictor.index.update():
+        debug.dprint("BUILDTIME: get_predictor(); log changed, resetting the statistics")
+        predictor.reset()
+    return predictor
@@ -0,0 +1,248 @@
+#!/usr/bin/env python
+
+'''
+    Porthole emerge.log index
+    Collects the build durations of all packages from emerge.log in one
+    pass, and keeps them up to date by reading only what was appended.
+
+    Copyright (C) 2003 - 2009 Fredrik Arnerup, Daniel G. Taylor
+    Brian Dolbec, Wm. F. Wheeler, Tommy Iorns
+
+    This program is free software; you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation; either version 2 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program; if not, write to the Free Software
+    Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+'''
+
+import os
+import re
+import json
+import datetime
+from gettext import gettext as _
+
+from porthole import config
+from porthole.utils import debug
+from porthole.utils.utils import is_root, get_user_home_dir
+
+# Set EPREFIX
+EPREFIX = config.Prefs.EPREFIX
+
+LOG_FILE = EPREFIX + "/var/log/emerge.log"
+# bump this whenever the saved index layout changes
+INDEX_VERSION = 2
+
+# emerge.log lines look like:
+# 1300000000:  >>> emerge (1 of 3) sys-apps/foo-1.2 to /
+# 1300000100:  ::: completed emerge (1 of 3) sys-apps/foo-1.2 to /
+# newer portage adds the repository, sys-apps/foo-1.2::gentoo
+line_re = re.compile(b"^(\\d+):  (>>>|::: completed) emerge \\([^)\\n]*\\) (\\S+)", re.M)
+# bytes of the log scanned at a time
+CHUNK_SIZE = 1 << 22
+# builds kept per package, older ones say little about this hardware
+HISTORY_SIZE = 50
+# splits a cpv into cp and version, the shortest cp that leaves a valid version
+cpv_re = re.compile("^(.+?)-(\\d+(\\.\\d+)*[a-zA-Z]?(_(pre|p|beta|alpha|rc)\\d*)*(-r\\d+)?)$")
+
+
+class BadLogFile(Exception):
+    """ Raised when we encounter errors parsing the log file."""
+
+
+def get_index_file():
+    """Returns the path to the saved index.
+    The system wide file is used when we can write to it"""
+    if is_root():
+        return EPREFIX + "/var/db/porthole/emerge_log.idx"
+    return get_user_home_dir() + "/.porthole/emerge_log.idx"
+
+def strip_repo(cpv):
+    """Returns cpv without a trailing ::repository"""
+    return cpv.split("::")[0]
+
+def split_cpv(cpv):
+    """Returns (category/package, version) of cpv, version is '' if it has none"""
+    match = cpv_re.match(cpv)
+    if match:
+        return match.group(1), match.group(2)
+    return cpv, ''
+
+
+class EmergeLogIndex(object):
+    """Build durations of every package merged according to emerge.log.
+    durations is {category/package: [[end time, version, seconds],...]}
+    in log order, the last HISTORY_SIZE builds of each package"""
+
+    def __init__(self, log_file = LOG_FILE, index_file = None):
+        self.log_file = log_file
+        self.index_file = index_file or get_index_file()
+        self.reset()
+        self.load()
+
+    def reset(self):
+        # where the next scan() starts, always at the start of a line
+        self.offset = 0
+        # the log's inode, a new one means it was rotated
+        self.inode = None
+        # {cpv: start time} of merges not completed (yet)
+        self.pending = {}
+        self.durations = {}
+        # {package: [category/package,...]}, built by get_names()
+        self.names = None
+        # {cpv: split_cpv(cpv)}, the same versions are merged over and over
+        self.split_cache = {}
+
+    def load(self):
+        """Restores the index saved by save(), if it is for this log"""
+        try:
+            _file = open(self.index_file, "r")
+            try:
+                saved = json.load(_file)
+            finally:
+                _file.close()
+        except (IOError, OSError, ValueError) as e:
+            debug.dprint("EMERGELOG: load(); no saved index: " + str(e))
+            return
+        if saved.get('version') != INDEX_VERSION or saved.get('log_file') != self.log_file:
+            debug.dprint("EMERGELOG: load(); saved index is for another version or log")
+            return
+        self.offset = saved['offset']
+        self.inode = saved['inode']
+        self.pending = saved['pending']
+        self.durations = saved['durations']
+
+    def save(self):
+        """Saves the index, replacing the file in one step"""
+        saved = {'version': INDEX_VERSION,
+                 'log_file': self.log_file,
+                 'offset': self.offset,
+                 'inode': self.inode,
+                 'pending': self.pending,
+                 'durations': self.durations}
+        tmpname = self.index_file + ".tmp"
+        try:
+            dirname = os.path.dirname(self.index_file)
+            if not os.access(dirname, os.F_OK):
+                os.makedirs(dirname)
+            _file = open(tmpname, "w")
+            try:
+                _file.write(json.dumps(saved))
+            finally:
+                _file.close()
+            os.rename(tmpname, self.index_file)
+        except (IOError, OSError) as e:
+            debug.dprint("EMERGELOG: save(); failed: " + str(e))
+
+    def update(self):
+        """Reads whatever was appended to the log since the last update.
+        Raises BadLogFile if the log can not be read"""
+        try:
+            info = os.stat(self.log_file)
+            if info.st_ino != self.inode or info.st_size < self.offset:
+                # new or rotated log, start over
+                debug.dprint("EMERGELOG: update(); indexing " + self.log_file)
+                self.reset()
+                self.inode = info.st_ino
+            if info.st_size == self.offset:
+                return False
+            _file = open(self.log_file, "rb")
+            try:
+                _file.seek(self.offset)
+                self.scan(_file)
+            finally:
+                _file.close()
+        except (IOError, OSError) as e:
+            debug.dprint("EMERGELOG: update(); " + str(e))
+            raise BadLogFile(_("Error reading emerge log file.  Check file "
+                "permissions, or check for corrupt log file."))
+        self.save()
+        return True
+
+    def scan(self, _file):
+        """Collects the durations in the rest of _file"""
+        pending = self.pending
+        rest = b""
+        while True:
+            data = _file.read(CHUNK_SIZE)
+            if not data:
+                # an incomplete last line is still being written,
+                # read it next time
+                break
+            data = rest + data
+            end = data.rfind(b"\n") + 1
+            rest = data[end:]
+            for match in line_re.finditer(data, 0, end):
+                stamp = int(match.group(1))
+                try:
+                    cpv = strip_repo(match.group(3).decode("utf_8"))
+                except UnicodeDecodeError:
+                    continue
+                if match.group(2) == b">>>":
+                    # a second start without a completed one means the first
+                    # one failed or was interrupted, forget it
+                    pending[cpv] = stamp
+                elif cpv in pending:
+                    self.add(cpv, pending.pop(cpv), stamp)
+            self.offset += end
+
+    def add(self, cpv, start, end):
+        cpv = strip_repo(cpv)
+        try:
+            cp, version = self.split_cache[cpv]
+        except KeyError:
+            cp, version = self.split_cache[cpv] = split_cpv(cpv)
+        if cp not in self.durations:
+            self.names = None
+        history = self.durations.setdefault(cp, [])
+        history.append([end, version, end - start])
+        if len(history) > HISTORY_SIZE:
+            del history[0]
+
+    def get_names(self):
+        """Returns the {package: [category/package,...]} dictionary"""
+        if self.names is None:
+            self.names = {}
+            for cp in self.durations:
+                self.names.setdefault(cp.split("/")[-1], []).append(cp)
+        return self.names
+
+    def get_durations(self, package):
+        """Returns the list of build durations (in seconds) of package,
+        a category/package or just a package name"""
+        if "/" in package:
+            cps = [package]
+        else:
+            cps = self.get_names().get(package, [])
+        durations = []
+        for cp in cps:
+            durations.extend([entry[2] for entry in self.durations.get(cp, [])])
+        return durations
+
+    def estimate(self, package):
+        """Returns the average build time of package as a timedelta,
+        or None if it was never built"""
+        durations = self.get_durations(package)
+        if not durations:
+            return None
+        return datetime.timedelta(seconds = float(sum(durations)) / len(durations))
+
+
+# one index per log, updated as it is used
+_indexes = {}
+
+def get_index(log_file = LOG_FILE):
+    """Returns the up to date EmergeLogIndex of log_file.
+    Raises BadLogFile if the log can not be read"""
+    if log_file not in _indexes:
+        _indexes[log_file] = EmergeLogIndex(log_file)
+    index = _indexes[log_file]
+    index.update()
+    return index
@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+
+'''
+    Porthole Views
+    The view of the packages depending on the selected package
+
+    Copyright (C) 2003 - 2009 Fredrik Arnerup, Daniel G. Taylor,
+    Brian Dolbec, Wm. F. Wheeler, Tommy Iorns
+
+    This program is free software; you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation; either version 2 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program; if not, write to the Free Software
+    Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+'''
+
+import gi; gi.require_version("Gtk", "3.0") # make sure we have the right version
+from gi.repository import Gtk
+from gi.repository import GObject
+
+from gettext import gettext as _
+
+from porthole import backends
+from porthole.db import revdeps
+from porthole.views.commontreeview import CommonTreeView
+
+# how each kind of dependency is shown
+KIND_NAMES = [(revdeps.DEPEND, _("build")), (revdeps.RDEPEND, _("run")),
+              (revdeps.PDEPEND, _("post"))]
+
+
+class DependentsView(CommonTreeView):
+    """ The packages depending on a package """
+    def __init__(self):
+        """ Initialize """
+        CommonTreeView.__init__(self)
+        self.column = {
+            "name": 0,
+            "versions": 1,
+            "kinds": 2
+        }
+        self.model = Gtk.ListStore(GObject.TYPE_STRING,   # package name
+                                   GObject.TYPE_STRING,   # versions depending on it
+                                   GObject.TYPE_STRING)   # kinds of dependency
+        for title, column in [(_("Package"), "name"), (_("Versions"), "versions"),
+                              (_("Needed at"), "kinds")]:
+            text = Gtk.CellRendererText()
+            view_column = Gtk.TreeViewColumn(title, text, text = self.column[column])
+            view_column.set_resizable(True)
+            view_column.set_sort_column_id(self.column[column])
+            self.append_column(view_column)
+        self.set_model(self.model)
+        # make it easier to read across columns
+        self.set_rules_hint(True)
+
+    def fill(self, dependents):
+        """ Show the [(full_name, ebuilds, kinds),...] of
+            Database.get_dependents() """
+        self.model.clear()
+        if not dependents:
+            self.show_message(_("No package depends on it"))
+            return
+        for full_name, ebuilds, kinds in dependents:
+            versions = ', '.join([backends.portage_lib.get_version(ebuild) for ebuild in ebuilds])
+            names = ', '.join([name for kind, name in KIND_NAMES if kinds & kind])
+            self.model.append([full_name, versions, names])
+
+    def show_message(self, message):
+        """ Show message in place of the packages """
+        self.model.clear()
+        self.model.append([message, '', ''])
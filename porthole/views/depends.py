@@ -31,6 +31,7 @@ from gettext import gettext as _
 from porthole.utils import utils
 from porthole import backends
 from porthole.views.packagebook.dependstree import DependsTree
+from porthole.views.packagebook.depends import dep_graph
 from porthole.views.commontreeview import CommonTreeView
 from porthole.utils import debug
 #from porthole.views.helpers import *
@@ -184,7 +185,7 @@ class DependsView(CommonTreeView):
                     debug.dprint("DependsView: populate_info(); found package: " + name)
                     latest_installed = package.get_latest_installed()
                     debug.dprint("DependsView: populate_info(); latest_installed: %s, getting best_ebuild" %str(latest_installed))
-                    best_ebuild, keyworded_ebuild, masked_ebuild = backends.portage_lib.get_dep_ebuild(model.get_value(iter,model.column["depend"]))
+                    best_ebuild, keyworded_ebuild, masked_ebuild = dep_graph.get_dep_ebuild(model.get_value(iter,model.column["depend"]))
                     debug.dprint("DependsView: populate_info(); best_ebuild: %s, getting latest_ebuild" %str(best_ebuild))
                     #latest_ebuild = package.get_latest_ebuild(False) # include_masked = False
                     #debug.dprint("DependsView: populate_info(); latest_ebuild: %s" %str(latest_ebuild))
@@ -37,6 +37,7 @@ from porthole.backends import utilities
 from porthole import config
 from porthole import db
 from porthole.views.commontreeview import CommonTreeView
+from porthole.readers.prefetch import PrefetchReader
 from porthole.utils import utils
 from porthole.utils import debug
 from porthole.views.models import (
@@ -55,12 +56,20 @@ TEMP = 7
 MODEL_NAMES = ["All", "Installed", "Search", "Upgradable", "Deprecated", "Sets", "Blank", "Temp"]
 GROUP_SELECTABLE = [UPGRADABLE, DEPRECATED , SETS]
 
+# rows filled in from the prefetched info per timeout
+INFO_CHUNK = 50
+INFO_INTERVAL = 50 # ms
+# rows on each side of the selected one read ahead for the notebook
+NEIGHBOURS = 2
+
 
 class PackageView(CommonTreeView):
     """ Self contained treeview of packages """
     def __init__(self):
         """ Initialize """
         self.info_thread = None
+        self.info_rows = []
+        self.info_count = 0
         self.iter = None
         self.model = None
         self.current_view = None
@@ -175,7 +184,7 @@ class PackageView(CommonTreeView):
     def _init_view(self):
         """ Set the treeview column """
         # stop info_thread if running
-        self.infothread_die = "Please"
+        self.stop_info_thread()
         self.model = None
         self.iter = None
         # clear the columns
@@ -413,12 +422,11 @@ class PackageView(CommonTreeView):
         debug.dprint("VIEWS: Populating package view")
         debug.dprint("VIEWS: PackageView.populate(); process_id = %s" %str(os.getpid()))
         self._installed_column.set_visible(True)
+        self.stop_info_thread()
         if not packages:
             debug.dprint("VIEWS: clearing package view model")
             self.get_model().clear()
             return
-        # ask info_thread to die, if alive
-        self.infothread_die = "Please"
         self.model = None
         self.iter = None
         if locate_name:
@@ -442,7 +450,7 @@ class PackageView(CommonTreeView):
             if name != _("None"):
                 model.set_value(iter, MODEL_ITEM["package"], packages[name])
                 model.set_value(iter, MODEL_ITEM["checkbox"], (packages[name].is_checked))
-                model.set_value(iter, MODEL_ITEM["world"], (packages[name].in_world))
+                model.set_value(iter, MODEL_ITEM["world"], (packages[name].is_in_world()))
                 upgradable = packages[name].is_dep_upgradable()
                 if upgradable == MODEL_ITEM["checkbox"]: # portage wants to upgrade
                     model.set_value(iter, MODEL_ITEM["text_colour"], config.Prefs.views.upgradable_fg)
@@ -465,26 +473,21 @@ class PackageView(CommonTreeView):
                         #self.mainwindow_callback("set path", path)
         if locate_count == 1: # found unique exact result - select it
             self.set_cursor(path)
-        debug.dprint("VIEWS: starting info_thread")
-        self.infothread_die = False
         self.get_model().set_sort_column_id(MODEL_ITEM["name"], Gtk.SortType.ASCENDING)
         #self.disable_column_sort()
         self.model = self.get_model()
-        self.iter = model.get_iter_first()
-        self.deprecated_info = False
-        GObject.idle_add(self.populate_info)
+        self.start_info_thread(deprecated = False)
 
     def populate_cpv(self, packages, locate_name = None, ):
         """ Populate the current view with packages """
         debug.dprint("VIEWS: Populating package view")
         debug.dprint("VIEWS: PackageView.populate_cpv(); process_id = %s" %str(os.getpid()))
         self._installed_column.set_visible(False)
+        self.stop_info_thread()
         if not packages:
             debug.dprint("VIEWS: clearing package view model")
             self.get_model().clear()
             return
-        # ask info_thread to die, if alive
-        self.infothread_die = "Please"
         self.model = None
         self.iter = None
         if locate_name:
@@ -508,7 +511,7 @@ class PackageView(CommonTreeView):
             if name != _("None"):
                 model.set_value(iter, MODEL_ITEM["package"], packages[name])
                 model.set_value(iter, MODEL_ITEM["checkbox"], (packages[name].is_checked))
-                model.set_value(iter, MODEL_ITEM["world"], (packages[name].in_world))
+                model.set_value(iter, MODEL_ITEM["world"], (packages[name].is_in_world()))
                 upgradable = packages[name].is_dep_upgradable()
                 if upgradable == MODEL_ITEM["checkbox"]: # portage wants to upgrade
                     model.set_value(iter, MODEL_ITEM["text_colour"], config.Prefs.views.upgradable_fg)
@@ -531,88 +534,91 @@ class PackageView(CommonTreeView):
                         #self.mainwindow_callback("set path", path)
         if locate_count == 1: # found unique exact result - select it
             self.set_cursor(path)
-        debug.dprint("VIEWS: starting info_thread")
-        self.infothread_die = False
         self.get_model().set_sort_column_id(MODEL_ITEM["name"], Gtk.SortType.ASCENDING)
         #self.disable_column_sort()
         self.model = self.get_model()
-        self.iter = model.get_iter_first()
-        self.deprecated_info = True
-        GObject.idle_add(self.populate_info)
-
-    def populate_info(self):
-        """ Populate the current view with package info"""
-        if self.infothread_die:
+        self.start_info_thread(deprecated = True)
+
+    def get_neighbours(self, count = NEIGHBOURS):
+        """ Returns the packages of up to count rows on each side of
+            the selected one, the nearest first, the one below before
+            the one above """
+        model, iter = self.get_selection().get_selected()
+        if not iter:
+            return []
+        below = []
+        above = []
+        for rows, step in [(below, model.iter_next), (above, model.iter_previous)]:
+            row = step(iter)
+            while row and len(rows) < count:
+                package = model.get_value(row, MODEL_ITEM["package"])
+                if package and package.full_name != _("None"):
+                    rows.append(package)
+                row = step(row)
+        neighbours = []
+        for x in range(count):
+            neighbours += below[x:x + 1] + above[x:x + 1]
+        return neighbours
+
+    def stop_info_thread(self):
+        """ Stop filling in the package info, the rows are about to go """
+        self.infothread_die = "Please"
+        if self.info_thread:
+            self.info_thread.please_die()
+            self.info_thread = None
+        self.info_rows = []
+
+    def start_info_thread(self, deprecated = False):
+        """ Read the info of all rows in a PrefetchReader thread,
+            populate_info() fills it into the model as it arrives """
+        model = self.model
+        rows = []
+        packages = []
+        iter = model.get_iter_first()
+        while iter:
+            # in display order so the visible rows are filled in first
+            name = model.get_value(iter, MODEL_ITEM["name"])
+            if name != _("None"):
+                rows.append(iter)
+                packages.append((name, model.get_value(iter, MODEL_ITEM["package"])))
+            iter = model.iter_next(iter)
+        debug.dprint("VIEWS: starting info_thread")
+        self.infothread_die = False
+        self.info_rows = rows
+        self.info_count = 0
+        self.info_thread = PrefetchReader(packages, deprecated)
+        self.info_thread.start()
+        GObject.timeout_add(INFO_INTERVAL, self.populate_info, self.info_thread)
+
+    def populate_info(self, reader):
+        """ Fill the model with the next chunk of package info read by reader """
+        if self.infothread_die or reader is not self.info_thread:
             return False # will not be called again
-        #Gtk.threads_enter()
-        #model = self.get_model()
-        #iter = model.get_iter_first()
         model = self.model
-        iter = self.iter
-        #Gtk.threads_leave()
-        #while iter and not (self.infothread_die):
-        if iter and not model.get_value(iter,MODEL_ITEM["name"]) == _("None"):
-            try:
-                #Gtk.threads_enter()
-                package = model.get_value(iter, MODEL_ITEM["package"])
-                if not self.deprecated_info: # else pass
-                    #debug.dprint("VIEWS: populate_info(); getting latest_installed")
-                    latest_installed = package.get_latest_installed()
-                    #debug.dprint("VIEWS: populate_info(); latest_installed: %s, getting best_ebuild" %str(latest_installed))
-                    best_ebuild = package.get_best_dep_ebuild()
-                    #debug.dprint("VIEWS: populate_info(); best_dep_ebuild: %s, getting latest_ebuild" %str(best_ebuild))
-                    latest_ebuild = package.get_latest_ebuild(include_masked = False)
-                    #debug.dprint("VIEWS: populate_info(); latest_ebuild: %s" %str(latest_ebuild))
-                    model.set_value(iter, MODEL_ITEM["installed"], backends.portage_lib.get_version(latest_installed)) # installed
-                else:
-                    ebuild = model.get_value(iter,MODEL_ITEM["name"])
-                    #debug.dprint("VIEWS: populate_info(); ebuild: '%s', getting latest..." % str(ebuild))
-                    latest_installed = ''
-                    debug.dprint("VIEWS: populate_info(); latest_installed: '%s', getting slot_dep" % str(latest_installed))
-                    slot = backends.portage_lib.get_slot(ebuild)
-                    slot_dep = ':'.join([package.full_name, slot] if slot else [package.full_name])
-                    debug.dprint("VIEWS: populate_info(); slot_dep: '%s', getting best_ebuild" % slot_dep)
-                    best_ebuild, keyworded_ebuild, masked_ebuild = backends.portage_lib.get_dep_ebuild(slot_dep)
-                    debug.dprint("VIEWS: populate_info(); best_dep_ebuild: %s, getting latest_ebuild" % str(best_ebuild))
-                    latest_ebuild = package.get_latest_ebuild(include_masked = False)
-                    debug.dprint("VIEWS: populate_info(); latest_ebuild: %s" %str(latest_ebuild))
-
-                try:
-                    size = package.get_size()
-                    #debug.dprint("VIEWS: populate_info(); size = " + size)
-                    model.set_value(iter, MODEL_ITEM["size"], size) # Size
-                except:
-                    debug.dprint("VIEWS: populate_info(); Had issues getting size for '%s'" % str(package.full_name))
-                if best_ebuild:
-                    model.set_value(iter, MODEL_ITEM["recommended"], backends.portage_lib.get_version(best_ebuild)) #  recommended by portage
-                    #debug.dprint("VIEWS populate_info(): got best ebuild for '%s' = %s" % (package.full_name, best_ebuild))
-                elif latest_ebuild:
-                    model.set_value(iter, MODEL_ITEM["recommended"], "(" + backends.portage_lib.get_version(latest_ebuild) + ")") # latest
-                    #debug.dprint("VIEWS populate_info(): got latest ebuild for '%s' = %s" % (package.full_name, latest_ebuild))
-                else:
-                    model.set_value(iter, MODEL_ITEM["recommended"], "masked") # hard masked - don't display
-                    #debug.dprint("VIEWS populate_info(): got masked ebuild for '%s' = %s" % (package.full_name, "masked"))
-                try:
-                    model.set_value(iter, MODEL_ITEM["description"], package.get_properties().description) # Description
-                except:
-                    debug.dprint("VIEWS populate_info(): Failed to get item description for '%s'" % package.full_name)
-                self.iter = model.iter_next(iter)
-                #Gtk.threads_leave()
-            except Exception as e:
-                debug.dprint("VIEWS: populate_info(): Stopping due to exception '%s'" % e)
-                #self.iter = model.iter_next(iter)
-                return False # will not be called again
-                #Gtk.threads_leave()
-            return True # will be called again
-        #if not self.infothread_die:
-        else: # reached last iter
-            #Gtk.threads_enter()
+        results = reader.results
+        end = min(len(results), self.info_count + INFO_CHUNK)
+        for i in range(self.info_count, end):
+            if results[i] is None:
+                continue
+            installed, recommended, size, description = results[i]
+            iter = self.info_rows[i]
+            if installed is not None:
+                model.set_value(iter, MODEL_ITEM["installed"], installed) # installed
+            if size is not None:
+                model.set_value(iter, MODEL_ITEM["size"], size) # Size
+            model.set_value(iter, MODEL_ITEM["recommended"], recommended)
+            if description is not None:
+                model.set_value(iter, MODEL_ITEM["description"], description) # Description
+        self.info_count = end
+        if reader.done and end == len(results): # reached last row
+            self.info_thread = None
+            self.info_rows = []
             self.queue_draw()
             #debug.dprint("VIEWS: populate_info(); enabling column sort")
             self.enable_column_sort()
             debug.dprint("VIEWS: populate_info(); Package info populated")
             return False # will not be called again
-            #Gtk.threads_leave()
+        return True # will be called again
 
     def deselect_all(self, widget):
         """upgrades view deselect all packages callback"""
@@ -27,13 +27,20 @@ from gettext import gettext as _
 from porthole.utils import debug
 from porthole import backends
 from porthole.backends.utilities import dep_split
-import datetime
+import itertools
 
 #from exceptions import Exception
 
 
 LAZYNAME = "Loading dependencies..."
 
+# the IDs of the levels Depends.parse() reads, unique among all the
+# parsers as DependsTree merges the atoms of several into its DepCache
+_level_ids = itertools.count(1)
+# dep_split() of the atoms parsed, the same ones turn up in most ebuilds
+_dep_parts = {}
+DEP_PARTS_SIZE = 50000
+
 class DuplicateAtom(Exception):
     """Exception type definition. Duplicate Atom"""
     def __init__(self):
@@ -56,7 +63,7 @@ class DependKey(object):
         @param mytype:string = one of  ['USING', 'NOTUSING', 'OPTION', 'GROUP',...]
         @param useflag: string  ie.  'ffmpeg'
         @param atom: string  ie. '>=app-portage/porthole-0.6.0'
-        @param parent: tuple containing a unigue id
+        @param parent: integer ID of a Depends.parse() level, or a key for LAZY
 
         @rtype key: tuple of values
         """
@@ -162,13 +169,13 @@ class DependAtom(DependKey):
         """ self.mytype == 'DEP
         @param use_flags: string of space separated use flags
         @rtype: non-empty if satisfied'"""
-        return backends.portage_lib.get_installed(self.get_depname() + self.get_required_use())
+        return dep_graph.get_installed(self.get_depname() + self.get_required_use())
 
     def _BLOCKER_is_satisfied(self, use_flags):
         """ self.mytype == 'BLOCKER
         @param use_flags: string of space separated use flags
         @rtype: non-empty if satisfied????'"""
-        return not backends.portage_lib.get_installed(self.get_depname() + self.get_required_use())
+        return not dep_graph.get_installed(self.get_depname() + self.get_required_use())
 
     def _GROUP_is_satisfied(self, use_flags):
         """ self.mytype == 'GROUP'
@@ -210,7 +217,7 @@ class DependAtom(DependKey):
         """ self.mytype == 'REVISIONABLE'
         @param use_flags: string of space separated use flags
         @rtype: nonempty if is satisfied"""
-        return backends.portage_lib.get_installed(self.get_depname() + self.get_required_use())
+        return dep_graph.get_installed(self.get_depname() + self.get_required_use())
 
     def _OPTION_is_satisfied(self, use_flags):
         """ self.mytype == 'OPTION'
@@ -299,7 +306,7 @@ class DepCache(DependKey):
         @param mytpe: string = one of  ['USING', 'NOTUSING', 'OPTION', 'GROUP',...]
         @param useflag: string  ie.  'ffmpeg'
         @param mydep: string  ie. '>=app-portage/porthole-0.6.0'
-        @param parent: tuple containing a unigue id
+        @param parent: integer ID of the Depends.parse() level the atom is in
         @param children: list of child atom keys
 
         @rtype key: a DependKey generated key used to reference the DependAtom instance
@@ -359,7 +366,12 @@ class DepCache(DependKey):
         Please refer to the add() for all other input parameter details.
         """
         #debug.dprint("DepCache: new atom: %s, %s, %s " %(mytype, useflag, mydep))
-        name, cmp, slot, use = dep_split(mydep)
+        try:
+            name, cmp, slot, use = _dep_parts[mydep]
+        except KeyError:
+            if len(_dep_parts) >= DEP_PARTS_SIZE:
+                _dep_parts.clear()
+            name, cmp, slot, use = _dep_parts[mydep] = dep_split(mydep)
         atom = DependAtom(atom=mydep, mytype=mytype, useflag=useflag, parent=parent,
                 name=name, cmp=cmp, slot=slot,req_use=use, children=children)
         atom.key = key
@@ -386,6 +398,16 @@ class DepCache(DependKey):
             pass
         return
 
+    def load(self, other):
+        """Resets the cache to a copy of the DepCache other,
+        for a package/ebuild parsed by another Depends instance"""
+        self._cache = dict(other._cache)
+
+    def merge(self, other):
+        """Adds the atoms of the DepCache other, for a dependency's
+        ebuild parsed by another Depends instance"""
+        self._cache.update(other._cache)
+
     def reset(self):
         """Resets the cache to empty.  A must for each
         new package/ebuild to be parsed"""
@@ -411,145 +433,100 @@ class Depends(object):
         self.cache = DepCache()
         self.flags = []
 
-    def parse(self, depends_list, parent=''):
+    def parse(self, depends_list):
         """DEPENDS string parsing function. Takes a list of the form:
         portage.portdb.aux_get(<ebuild>, ["DEPEND"]).split()
         and arranges it into a list of nested list-like DependAtom()s.
-        if more closing brackets are encountered than opening ones then it
-        will return, meaning we can recursively pass the unparsed part of the
-        list back to ourselves...
+
+        A single pass over the list, which is left as it is.  The levels
+        of parentheses being read are kept on a stack, each with a new
+        integer ID for the groups it contains.  The same USE flag twice
+        in a level gives one atom with the children of both.
+        If more closing parentheses are encountered than opening ones,
+        the rest of the list is ignored.  Groups not closed at the end
+        of the list are closed there.
 
         @param depends_list: of the form:
                 portage.portdb.aux_get(<ebuild>, ["DEPEND"]).split()
-        @param parent: string if a unique parent DependAtom ID that any DependAtoms
-                created from this code instance belong to.
-        @rtype a nested list of DependAtom instances ready for use.
+        @rtype a nested list of DependAtom instances ready for use, in
+                the order of depends_list.
         """
-        atomized_set = set()
-        I_am = None
-        while depends_list:
-            item_type = useflag = ''
-            children = []
-            a_key = None
-            item = depends_list[0]
-            if item.startswith("||"):
-                item_type = 'OPTION'
-                if item != "||":
-                    depends_list[0] = item[2:]
-                else:
-                    depends_list.pop(0)
-                item = depends_list[0]
-            elif item.endswith("?"):
-                if item.startswith("!"):
-                    item_type = 'NOTUSING'
-                    useflag=item[1:-1]
+        cache = self.cache
+        # (keys, level ID, mytype, useflag) of the levels enclosing the current one
+        stack = []
+        # the keys of the current level's atoms, in order
+        keys = {}
+        level = next(_level_ids)
+        item_type = useflag = ''
+        for item in depends_list:
+            pos = 0
+            while pos < len(item):
+                char = item[pos]
+                if char == '|' and item.startswith('||', pos):
+                    item_type = 'OPTION'
+                    pos += 2
+                elif char == '(':
+                    stack.append((keys, level, item_type or 'GROUP', useflag))
+                    keys = {}
+                    level = next(_level_ids)
+                    item_type = useflag = ''
+                    pos += 1
+                elif char == ')':
+                    if not stack:
+                        debug.dprint("DEPENDS: Depends.parse(); unbalanced ')', " +
+                            "ignoring the rest of: " + ' '.join(depends_list))
+                        return self._atomized_list(keys)
+                    keys, level = self._close_level(stack, keys)
+                    item_type = useflag = ''
+                    pos += 1
                 else:
-                    item_type = 'USING'
-                    useflag=item[:-1]
-                depends_list.pop(0)
-                item = depends_list[0]
-            if item.startswith("("):
-                if item_type == '': # two '(' in a row. Need to create a new atom?
-                    item_type = 'GROUP'
-                if item != "(":
-                    depends_list[0] = item[1:]
-                else:
-                    if not I_am:
-                        I_am = tuple((parent, datetime.datetime.now()))
-                    group, depends_list = self.split_group(depends_list)
-                    children = self.parse(group, I_am)
-                    a_key = self.cache.add(mytype=item_type, parent=I_am,
-                                            useflag=useflag, children=children)
-                    atomized_set.add(a_key)
-                    a_key = None
-                    continue
-                if not I_am:
-                    I_am = tuple((parent, datetime.datetime.now()))
-                children = self.parse(depends_list, I_am)
-                a_key = self.cache.add(mytype=item_type, parent=I_am,
-                                        useflag=useflag, children=children)
-                atomized_set.add(a_key)
-                a_key = None
-                continue
-            elif item.startswith(")"):
-                if item != ")":
-                    depends_list[0] = item[1:]
-                else:
-                    depends_list.pop(0)
-                return self._atomized_list(atomized_set)
-            else: # hopefully a nicely formatted dependency
-                #if filter(lambda a: a in item, ['(', '|', ')']):<== EAPI 3 will kill this [flag1(+), flag2(-)]
-                    #  removed '?' from the list due to required USE flags that may have it.
-                    #~ debug.dprint(" *** DEPENDS: atomize_depends_list: DEPENDS PARSE ERROR!!! " + \
-                        #~ "Please report this to the authorities. (item = %s)" % item)
-                if item.startswith("!"):
-                    item_type = "BLOCKER"
-                    item = item[1:]
-                elif item.startswith('~'):
-                    item_type = "REVISIONABLE"
-                    item = item[1:]
-                else:
-                    item_type = "DEP"
+                    if pos:
+                        item = item[pos:]
+                    if item.endswith('?'):
+                        if item.startswith('!'):
+                            item_type = 'NOTUSING'
+                            useflag = item[1:-1]
+                        else:
+                            item_type = 'USING'
+                            useflag = item[:-1]
+                    else: # hopefully a nicely formatted dependency
+                        if item.startswith('!'):
+                            keys[cache.add(mydep=item[1:], mytype='BLOCKER')] = None
+                        elif item.startswith('~'):
+                            keys[cache.add(mydep=item[1:], mytype='REVISIONABLE')] = None
+                        else:
+                            keys[cache.add(mydep=item, mytype='DEP')] = None
+                        item_type = useflag = ''
+                    break
+        while stack:
+            keys, level = self._close_level(stack, keys)
+        return self._atomized_list(keys)
+
+    def _close_level(self, stack, keys):
+        """Adds the atom of the group whose children are keys to the
+        enclosing level on the stack
 
-                a_key = self.cache.add(mydep=item, mytype=item_type)
-                atomized_set.add(a_key)
-                a_key = None
-                depends_list.pop(0)
-        #~ debug.dprint("Depends: atomize_depends_list(); finished recursion level," + \
-            #~ "returning atomized list")
-        return self._atomized_list(atomized_set)
+        @rtype (keys, level): the keys and ID of the enclosing level
+        """
+        children = self._atomized_list(keys)
+        keys, level, mytype, useflag = stack.pop()
+        keys[self.cache.add(mytype=mytype, parent=level, useflag=useflag,
+                children=children)] = None
+        return keys, level
 
-    def _atomized_list(self, a_set):
-        """Converts a set of atom keys into a list of DependAtom instances
+    def _atomized_list(self, keys):
+        """Converts atom keys into a list of DependAtom instances
 
-        @param a_set: set of DependKey keys for conversion
+        @param keys: iterable of DependKey keys for conversion
         @rtype a_list: the list of DependAtom instances referenced by the keys
         """
         a_list = []
-        while a_set:
-            key = a_set.pop()
+        for key in keys:
             atom = self.cache.get(key)
             if atom:
                 a_list.append(atom)
-        #if a_list:
-        #    a_list.reverse()
         return a_list
 
-    def split_group(self, dep_list):
-        """Separate out the ( ) grouped dependencies from a dependency list
-
-        @param dep_list: the list of dependencies to split
-        @rtype group: list of dependency members contained within the group
-        @rtype dep_list: the remainder of the dendency list supplied for splitting
-        """
-        #debug.dprint("Depends: split_group(); starting")
-        group = []
-        #remainder = []
-        if dep_list[0] != '(':
-            debug.dprint("Depends: split_group();dep_list passed does not " + \
-                "start with a '(', returning")
-            return group, dep_list
-        dep_list.pop(0)
-        nest_level = 0
-        while dep_list:
-            x = dep_list[0]
-            #debug.dprint("Depends: split_group(); x = " + x)
-            if x in '(':
-                    nest_level += 1
-                    #debug.dprint("Depends: split_group(); nest_level = " + str(nest_level))
-            elif x in ')':
-                if nest_level == 0:
-                    dep_list.pop(0)
-                    break
-                else:
-                    nest_level -= 1
-                    #debug.dprint("Depends: split_group(); nest_level = " + str(nest_level))
-            group.append(x)
-            dep_list.pop(0)
-        #debug.dprint("Depends: split_group(); dep_list parsed, group = " + str(group))
-        #debug.dprint("Depends: split_group(); dep_list parsed, remainder = " + str(dep_list))
-        return group, dep_list
-
     def get_depends(self, package, ebuild):
         """Returns a list of DEPEND atoms for a given package and ebuild
 
@@ -584,16 +561,106 @@ class Depends(object):
         @param depends: list of DEPEND atom strings
         @rtype depends: list of DEPEND atom strings ready for parsing.
         """
-        for flag in self.flags:
-            x = 0
-            while x < len(depends):
-                if depends[x] == flag:
-                    depends.pop(x) # remove flag
-                    depends.pop(x) # remove (
-                    level = 1
-                    while level:
-                        if depends[x] == "(": level += 1
-                        if depends[x] == ")": level -= 1
-                        depends.pop(x)
-                else: x += 1
-        return depends
+        flags = set(self.flags)
+        result = []
+        x = 0
+        while x < len(depends):
+            if depends[x] in flags:
+                x += 2 # skip the flag and its (
+                level = 1
+                while level and x < len(depends):
+                    if depends[x] == "(": level += 1
+                    elif depends[x] == ")": level -= 1
+                    x += 1
+            else:
+                result.append(depends[x])
+                x += 1
+        return result
+
+class ParsedDepends(object):
+    """The dependencies of an ebuild as DepGraph keeps them.
+    cache holds the atoms, it is only read once stored"""
+
+    def __init__(self, depends, atoms, cache):
+        self.depends = depends
+        self.atoms = atoms
+        self.cache = cache
+
+
+class DepGraph(object):
+    """The parsed dependencies of ebuilds and what portage has to
+    say about each atom, kept for all the dependency trees.  A
+    package's tree and the popups opened from it share the ebuilds
+    and atoms they have in common, and showing a package again
+    costs no portage calls at all.
+
+    Only valid for the tree, config and installed packages it was
+    read from, check() drops it all once they changed.  Safe to use
+    from the notebook's worker threads, at worst an entry is read
+    twice.
+
+    Important methods/functions:
+        check(), get_parsed(), get_dep_ebuild(), get_installed()
+    """
+
+    def __init__(self):
+        # the flags whose dependencies are left out, as DependsTree does
+        self.flags = ["!bootstrap?"]
+        self.key = None
+        self.reset()
+
+    def reset(self):
+        # ebuild: ParsedDepends
+        self.parsed = {}
+        # atom: (best, keyworded, masked)
+        self.dep_ebuilds = {}
+        # atom: installed ebuilds
+        self.installed = {}
+
+    def check(self):
+        """Drops everything if the tree, the configs or the
+        installed packages changed since it was read"""
+        key = (backends.portage_lib.get_xmatch_generation(),
+               backends.portage_lib.get_vdb_mtime())
+        if key != self.key:
+            if self.key is not None:
+                debug.dprint("DEPENDS: DepGraph.check(); dropping %d ebuilds, %d atoms"
+                        %(len(self.parsed), len(self.dep_ebuilds)))
+            self.reset()
+            self.key = key
+
+    def get_parsed(self, package, ebuild):
+        """Returns the ParsedDepends of package's ebuild"""
+        # a reset() meanwhile drops what is read here
+        cache = self.parsed
+        parsed = cache.get(ebuild)
+        if parsed is not None:
+            return parsed
+        parser = Depends()
+        parser.flags = self.flags[:]
+        depends = parser.get_depends(package, ebuild)
+        atoms = parser.parse(depends)
+        parsed = ParsedDepends(depends, atoms, parser.cache)
+        if package is not None:
+            cache[ebuild] = parsed
+        return parsed
+
+    def get_dep_ebuild(self, atom):
+        """Returns portage's (best, keyworded, masked) ebuilds for atom"""
+        cache = self.dep_ebuilds
+        result = cache.get(atom)
+        if result is None:
+            result = cache[atom] = tuple(backends.portage_lib.get_dep_ebuild(atom))
+        return result
+
+    def get_installed(self, dep):
+        """Returns the installed ebuilds matching dep"""
+        cache = self.installed
+        result = cache.get(dep)
+        if result is None:
+            result = cache[dep] = backends.portage_lib.get_installed(dep)
+        return result
+
+
+# shared by all the dependency trees and the notebook workers
+dep_graph = DepGraph()
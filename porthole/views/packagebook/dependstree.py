@@ -32,7 +32,7 @@ from porthole.utils import debug
 from porthole import backends
 from porthole.backends.utilities import get_reduced_flags
 from porthole import db
-from porthole.views.packagebook.depends import  Depends, LAZYNAME
+from porthole.views.packagebook.depends import  Depends, LAZYNAME, dep_graph
 
 # used for timing some sections of code
 #import datetime
@@ -206,9 +206,9 @@ class DependsTree(Gtk.TreeStore):
         dep_ebuild = self._get_ebuild(atom)
         # be carefull of depth
         if dep_ebuild:
-            dep_deps = self.dep_parser.get_depends(pack, dep_ebuild)
-            dep_atomized_list = self.dep_parser.parse(dep_deps)
-            if dep_atomized_list == None: dep_atomized_list = []
+            parsed = dep_graph.get_parsed(pack, dep_ebuild)
+            self.dep_parser.cache.merge(parsed.cache)
+            dep_atomized_list = parsed.atoms
             #debug.dprint("DependsTree: _add_kids(): new atomized_list for: "
             #    +atom.get_depname()+' = '+str(dep_atomized_list)+' '+str(dep_ebuild))
             self._add_list(dep_atomized_list, depends_view, iter,
@@ -253,7 +253,7 @@ class DependsTree(Gtk.TreeStore):
             debug.dprint("DependsTree:  _get_ebuild(): atom.atom = Null for atom:%s"
                 %atom.__repr__())
             return None
-        best, keyworded, masked  = backends.portage_lib.get_dep_ebuild(atom.atom) #__repr__())
+        best, keyworded, masked  = dep_graph.get_dep_ebuild(atom.atom) #__repr__())
         #debug.dprint("DependsTree:  _get_ebuild(): results = " + \
             #', '.join([best,keyworded,masked]))
         #
@@ -268,6 +268,7 @@ class DependsTree(Gtk.TreeStore):
 
     def expand_lazy(self, treeview, iter, path):
         #debug.dprint("DependsTree:  expand_lazy(): activated by  'test-expand-row'")
+        dep_graph.check()
         # first find out if there are already kids to expand
         kid_iter = self.iter_children(iter)
         if kid_iter:
@@ -298,10 +299,12 @@ class DependsTree(Gtk.TreeStore):
     def fill_depends_tree(self, treeview, package, ebuild):
         """Fill the dependencies tree for a given ebuild"""
         #debug.dprint("DependsTree: Updating deps tree for " + package.name)
-        # first reset the DepCache
         #start = datetime.datetime.now() #.microsecond
-        self.dep_parser.cache.reset()
-        depends = self.dep_parser.get_depends(package, ebuild)
+        dep_graph.check()
+        parsed = dep_graph.get_parsed(package, ebuild)
+        # first reset the DepCache to the ebuild's atoms
+        self.dep_parser.cache.load(parsed.cache)
+        depends = parsed.depends
         self.clear()
         if depends:
             #debug.dprint("DependsTree: depends = %s" % depends)
@@ -310,7 +313,7 @@ class DependsTree(Gtk.TreeStore):
             #debug.dprint("DependsTree: calling self.dep_parser.parse();" +
                 #" ebuild=%s reduced depends = %s "
             #        % (ebuild, str(depends)))
-            atomized_depends = self.dep_parser.parse(depends)
+            atomized_depends = parsed.atoms
             #end = datetime.datetime.now() #.microsecond
             #debug.dprint(atomized_depends)
             self._add_list(atomized_depends, treeview,
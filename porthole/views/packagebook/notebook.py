@@ -32,9 +32,12 @@ from porthole.utils import utils
 from porthole import backends
 #World = backends.portage_lib.settings.get_world()
 from porthole import config
+from porthole import db
 from porthole.utils.dispatcher import Dispatcher
 from porthole.views.packagebook.summary import Summary
+from porthole.views.packagebook.tabdata import get_pool, SUMMARY, DEPS, INSTALLED
 from porthole.views.depends import DependsView
+from porthole.views.dependents import DependentsView
 from porthole.views.highlight import HighlightView
 from porthole.views.changelog import ChangeLogView
 from porthole.views.useflags import UseFlagWidget
@@ -74,7 +77,9 @@ class PackageNotebook(object):
 
         # summary view
         scroller = self.wtree.get_object("summary_text_scrolled_window");
-        self.summary = Summary(Dispatcher(self.callbacks["action_callback"]), self.callbacks["re_init_portage"])
+        self.pool = get_pool()
+        self.summary = Summary(Dispatcher(self.callbacks["action_callback"]), self.callbacks["re_init_portage"],
+                self.summary_ready)
         scroller.add(self.summary)
         self.summary.show()
         # setup the dependency treeview
@@ -85,35 +90,70 @@ class PackageNotebook(object):
 
         self.use_flag_page = self.wtree.get_object("use_scrolledwindow")
         self.use_flag_view = None
+        # the packages depending on this one
+        self.dependents_view = DependentsView()
+        self.dependents_tree = Gtk.CheckButton(label=_("Include the packages in the portage tree"))
+        self.dependents_tree.connect("toggled", self.dependents_toggled)
+        scroller = Gtk.ScrolledWindow()
+        scroller.set_policy(Gtk.PolicyType.AUTOMATIC, Gtk.PolicyType.AUTOMATIC)
+        scroller.add(self.dependents_view)
+        self.dependents_page = Gtk.VBox()
+        self.dependents_page.pack_start(self.dependents_tree, expand=False, fill=False, padding=2)
+        self.dependents_page.pack_start(scroller, expand=True, fill=True, padding=0)
+        self.dependents_page.show_all()
+        self.notebook.append_page(self.dependents_page, Gtk.Label(label=_("Dependents")))
+        self.package = None
         self.notebook.connect("switch-page", self.notebook_changed)
         self.reset_tabs()
 
-    def set_package(self, package):
-        """sets the package for all dispalys"""
+    def set_package(self, package, neighbours = None):
+        """sets the package for all dispalys.
+        The summary and dependencies of neighbours, the packages
+        next to it in the list, are read ahead"""
         self.package = package
         self.reset_tabs()
+        # the tabs of the last package are no longer wanted
+        self.pool.cancel(self)
+        # nor is what they showed, until summary_ready() fills them again
+        self.deps_view.clear()
+        self.installed_files.set_text('')
+        # the current tab is filled in by summary_ready()
         self.summary.update_package_info(package)
-        self.notebook_changed(None, None, self.notebook.get_current_page())
+        for kind in [SUMMARY, DEPS]:
+            for neighbour in neighbours or []:
+                self.pool.prefetch(self, kind, neighbour)
         if self.dep_window["window"] != None and self.dep_window["notebook"] != None:
             self.dep_window["notebook"].set_new_parent(package.full_name)
 
     def reset_tabs(self):
         """set notebook tabs to load new package info"""
         debug.dprint("PackageNotebook reset_tabs()")
-        self.loaded = {"deps": False, "changelog": False, "installed": False, "ebuild": False}
+        self.loaded = {"deps": False, "changelog": False, "installed": False, "ebuild": False,
+                "dependents": False}
         self.loaded_version= {"ebuild" : None, "installed": None, "deps": None}
 
+    def summary_ready(self):
+        """The summary is shown, the other tabs know the ebuild now"""
+        self.notebook_changed(None, None, self.notebook.get_current_page())
+
     def notebook_changed(self, widget, pointer, index):
         """Catch when the user changes the notebook"""
         package = self.package
-        debug.dprint("PackageNotebook notebook_changed(); self.summary.ebuild " +self.summary.ebuild +
+        debug.dprint("PackageNotebook notebook_changed(); self.summary.ebuild " + str(self.summary.ebuild) +
                                     " self.loaded_version['deps'] : " + str(self.loaded_version["deps"]))
+        if self.summary.ebuild is None:
+            # still being read, summary_ready() will be called
+            return
         if index == 1:
             if  self.loaded_version["deps"] != self.summary.ebuild or not self.loaded["deps"]:
                 debug.dprint("PackageNotebook notebook_changed(); fill the deps view!")
-                self.deps_view.fill_depends_tree(self.deps_view, package, self.summary.ebuild)
-                self.loaded["deps"] = True
-                self.loaded_version["deps"] = self.summary.ebuild
+                ebuild = self.summary.ebuild
+                data = self.pool.request(self, DEPS, package, ebuild,
+                        lambda data: self.tab_read("deps", self.fill_deps, package, ebuild, data))
+                if data is not None:
+                    self.fill_deps(package, ebuild, data)
+                else:
+                    self.deps_view.clear()
         elif index == 2:
             if not self.loaded["changelog"]:
                 # fill in the change log
@@ -124,9 +164,13 @@ class PackageNotebook(object):
             debug.dprint("PackageNotebook notebook_changed(); load installed files for: " + str(self.summary.ebuild))
             if not self.loaded["installed"] or self.loaded_version["installed"] != self.summary.ebuild:
                 # load list of installed files
-                load_installed_files(self.installed_window, self.installed_files, package, self.summary.ebuild )
-                self.loaded["installed"] = True
-                self.loaded_version["installed"] = self.summary.ebuild
+                ebuild = self.summary.ebuild
+                data = self.pool.request(self, INSTALLED, package, ebuild,
+                        lambda data: self.tab_read("installed", self.fill_installed, package, ebuild, data))
+                if data is not None:
+                    self.fill_installed(package, ebuild, data)
+                else:
+                    self.installed_files.set_text('')
         elif index == 4:
             debug.dprint("PackageNotebook notebook_changed(); self.summary.ebuild = " + str(self.summary.ebuild))
             if not self.loaded["ebuild"] or self.loaded_version["ebuild"] != self.summary.ebuild:
@@ -160,20 +204,71 @@ class PackageNotebook(object):
             frame.show()
             self.use_flag_page.add_with_viewport(frame)
             self.use_flag_page.show()
+        elif index == self.notebook.page_num(self.dependents_page):
+            if not self.loaded["dependents"]:
+                self.fill_dependents()
         else:
             for i in self.plugin_package_tabs:
                 #Search through the plugins dictionary and select the correct one.
                 if self.plugin_package_tabs[i][2] == index:
                     self.plugin_package_tabs[i][0]( package )
 
+    def tab_read(self, tab, fill, package, ebuild, data):
+        """Fills in a tab the pool has read, unless the package or
+        ebuild changed meanwhile.  Without data the tab reads it itself"""
+        if package is not self.package or ebuild != self.summary.ebuild:
+            return
+        if self.loaded[tab] and self.loaded_version[tab] == ebuild:
+            # asked for twice
+            return
+        fill(package, ebuild, data)
+
+    def fill_deps(self, package, ebuild, data):
+        self.deps_view.fill_depends_tree(self.deps_view, package, ebuild)
+        self.loaded["deps"] = True
+        self.loaded_version["deps"] = ebuild
+
+    def fill_installed(self, package, ebuild, data):
+        load_installed_files(self.installed_window, self.installed_files, package, ebuild,
+                data and data.files)
+        self.loaded["installed"] = True
+        self.loaded_version["installed"] = ebuild
+
+    def fill_dependents(self):
+        """Fills in the packages depending on the package, once
+        the index is read"""
+        package = self.package
+        if package is None:
+            return
+        dependents = db.db.get_dependents(package.full_name,
+                lambda: self.dependents_read(package), self.dependents_tree.get_active())
+        if dependents is None:
+            self.dependents_view.show_message(_("Reading the dependencies of the packages..."))
+            return
+        self.dependents_view.fill(dependents)
+        self.loaded["dependents"] = True
+
+    def dependents_read(self, package):
+        """The index is read, fill the tab if it still shows package"""
+        if package is self.package and \
+                self.notebook.get_current_page() == self.notebook.page_num(self.dependents_page):
+            self.fill_dependents()
+
+    def dependents_toggled(self, widget):
+        self.loaded["dependents"] = False
+        if self.notebook.get_current_page() == self.notebook.page_num(self.dependents_page):
+            self.fill_dependents()
+
     def clear_notebook(self):
         """ Clear all notebook tabs & disable them """
         debug.dprint("PackageNotebook clear_notebook()")
+        self.pool.cancel(self)
         self.summary.update_package_info(None)
         self.deps_view.clear()
         self.changelog.set_text('')
         self.installed_files.set_text('')
         self.ebuild.set_text('')
+        self.dependents_view.clear()
 
     def new_notebook(self, callback, parent_name, parent_tree): #, package):
         """creates a new popup window containing a new notebook instance
@@ -37,17 +37,20 @@ from porthole import backends
 from porthole import db
 from porthole.db.user_configs import CONFIG_MASK_ATOMS
 from porthole import config
-from porthole.backends.version_sort import ver_sort
 from porthole.backends.utilities import (reduce_flags, get_reduced_flags,
     abs_flag, abs_list, filter_flags)
 from porthole.loaders.loaders import load_web_page
+from porthole.views.packagebook.tabdata import get_pool, default_ebuild, SUMMARY
 
 class Summary(Gtk.TextView):
     """ Class to manage display and contents of package info tab """
-    def __init__(self, dispatcher, re_init_portage):
+    def __init__(self, dispatcher, re_init_portage, ready_callback = None):
         """ Initialize object """
         GObject.GObject.__init__(self)
         self.re_init_portage = re_init_portage
+        # called once a package is shown, self.ebuild is known then
+        self.ready_callback = ready_callback
+        self.pool = get_pool()
         # get the preferences we need
         #self.enable_archlist = config.Prefs.globals.enable_archlist
         #self.archlist = config.Prefs.globals.archlist
@@ -266,12 +269,13 @@ class Summary(Gtk.TextView):
             for ebuild in ebuilds:
                 # set the tag to the default
                 tag = "value"
-                version = backends.portage_lib.get_version(ebuild)
-                keys = package.get_properties(ebuild).get_keywords()
+                row = matrix.get_row(ebuild)
+                version = row.version
+                keys = row.keywords
                 if not show_all and self.myarch not in keys and ''.join(['~',self.myarch]) not in keys:
                     # we won't display the ebuild if it's not available to us
                     continue
-                slot = backends.portage_lib.get_property(ebuild, "SLOT")
+                slot = row.slot
                 if not slot == oldslot:
                     if spam:
                         #append(", ".join(spam), "value")
@@ -286,17 +290,17 @@ class Summary(Gtk.TextView):
                 if not first_ebuild:
                     append(", ", "value")
 
-                if ebuild not in nonmasked:
-                    if ebuild in hardmasked:
+                if not row.nonmasked:
+                    if row.hardmasked:
                         version = "![" + version + "]"
                         # set the tag to highlight this version
                         tag = "useunset" # fixme:  need to make this user settable and different from use flags
                     else:
-                        if ebuild in status and 'profile' in status[ebuild]:
+                        if row.status and 'profile' in row.status:
                             version = "![" + version + "]"
                             # set the tag to highlight this version
                             tag = "useunset" # fixme:  need to make this user settable and different from use flags
-                        if ebuild not in status or 'deprecated' in status[ebuild]:
+                        if row.is_deprecated():
                             version = "![" + version + "]"
                             # set the tag to highlight this version
                             tag = "useunset" # fixme:  need to make this user settable and different from use flags
@@ -312,17 +316,10 @@ class Summary(Gtk.TextView):
             #append(", ".join(spam), "value")
             return
 
-        def create_ebuild_table(versions):
+        def create_ebuild_table():
             myarch = self.myarch
-            ebuilds = versions[:] # make a copy
-            while '' in ebuilds: ebuilds.remove('')
-            modified = False
-            for entry in installed:
-                if entry not in ebuilds:
-                    debug.dprint("SUMMARY; create_ebuild_table(): adding %s to ebuild list %s" % (entry, str(ebuilds)))
-                    ebuilds.append(entry)
-                    modified = True
-            if modified: ebuilds = ver_sort(ebuilds) # otherwise already sorted
+            # installed ebuilds no longer in the tree included
+            ebuilds = matrix.ebuilds
 
             if config.Prefs.globals.enable_archlist:
                 archlist = config.Prefs.globals.archlist
@@ -356,21 +353,20 @@ class Summary(Gtk.TextView):
             y = rows
             for ebuild in ebuilds:
                 y -= 1
-                version = backends.portage_lib.get_version(ebuild)
-                ver_label = Gtk.Label(label=str(version))
+                row = matrix.get_row(ebuild)
+                ver_label = Gtk.Label(label=str(row.version))
                 ver_label.set_padding(3, 3)
                 # slot column
-                slot =  package.get_properties(ebuild).get_slot()
-                slot_label = Gtk.Label(label=str(slot))
+                slot_label = Gtk.Label(label=row.slot)
                 slot_label.set_padding(3, 3)
                 # overlay column
-                overlay = backends.portage_lib.get_overlay(ebuild)
-                if type(overlay) in (int,): # catch obsolete
+                if row.obsolete:
                     overlay = _("Ebuild version no longer supported")
                     overlay_label = Gtk.Label(label=_("Obsolete"))
                     label_color = "#ED9191"
                 else:
-                    overlay_label = Gtk.Label(label=backends.portage_lib.get_overlay_name(overlay))
+                    overlay = row.overlay
+                    overlay_label = Gtk.Label(label=row.overlay_name)
                     label_color = "#EEEEEE"
                 overlay_label.set_padding(3, 3)
                 box = boxify(overlay_label, label_color)
@@ -381,7 +377,7 @@ class Summary(Gtk.TextView):
                 table.attach(boxify(slot_label, label_color), 1, 2, y, y+1)
                 table.attach(box, 2, 3, y, y+1)
 
-                keys = package.get_properties(ebuild).get_keywords()
+                keys = row.keywords
                 x = 2
                 for arch in archlist:
                     x += 1
@@ -394,31 +390,31 @@ class Summary(Gtk.TextView):
                     else:
                         text = "-"
                         color = "#EEEEEE"
-                    if ebuild in hardmasked and text != "-":
+                    if row.hardmasked and text != "-":
                         text = "".join(["M", text])
                         color = "#ED9191"
-                    elif text != "-" and ebuild in status and 'profile' in status[ebuild]:
+                    elif text != "-" and row.status and 'profile' in row.status:
                         text = "".join(["M", text])
                         color = "#ED9191"
-                    elif (text != "-" and ebuild not in status) or \
-                            (ebuild in status and'deprecated' in status[ebuild]):
+                    elif (text != "-" and row.status is None) or \
+                            (row.status and 'deprecated' in row.status):
                         text = "".join(["D", text])
                         color = "#ED9191"
-                    if ebuild in installed and arch == myarch:
+                    if ebuild in matrix.installed and arch == myarch:
                         color = "#9090EE"
                     #debug.dprint("SUMMARY: create_ebuild_table(); self.keyword_unmasked[ebuild] = " + str(self.keyword_unmasked[ebuild]))
                     if (ebuild in self.keyword_unmasked and '~' in text and
                                 ('~' + arch in self.keyword_unmasked[ebuild] or self.keyword_unmasked[ebuild] == [] )):
                         # take account of package.keywords in text but leave colour unchanged
                         text = text.replace('~', '(+)')
-                    if 'profile' not in backends.portage_lib.get_masking_status(ebuild):
+                    if not row.profile_masked:
                         if ebuild in package_unmasked and 'M' in text:
                             text = '[' + text.replace('M', '') + ']'
                     label = Gtk.Label(label=text)
                     box = boxify(label, color=color, ebuild=ebuild, arch=arch, text=text)
                     if "M" in text or "[" in text:
                         box.set_has_tooltip(True)
-                        box.set_tooltip_text(backends.portage_lib.get_masking_reason(ebuild))
+                        box.set_tooltip_text(row.reason or '')
                     table.attach(box, x, x+1, y, y+1)
             table.set_row_spacings(1)
             table.set_col_spacings(1)
@@ -606,49 +602,40 @@ class Summary(Gtk.TextView):
 
         # build info into buffer
         self.buffer.set_text("", 0)
+        # a package still being read is no longer wanted
+        self.pool.cancel(self)
         if not package:
             # Category is selected, just exit
             return
 
         self.package = package
 
+        # the versions, properties and metadata are read by the tab pool,
+        # until then only the name is shown
+        data = self.pool.request(self, SUMMARY, package, _ebuild,
+                lambda data: self.summary_read(package, _ebuild, data))
+        if data is None:
+            self.ebuild = None
+            append(package.full_name, "name")
+            nl(2)
+            append(_("Reading the package information..."), "masked")
+            return
+        matrix = data.matrix
+
         # Get the package info
         #debug.dprint("SUMMARY: get package info")
-        installed = self.installed = package.get_installed()
-        debug.dprint("SUMMARY: installed = " + str(installed))
-        versions = package.get_versions()
-        debug.dprint("SUMMARY: versions = " + str(versions))
-        nonmasked = package.get_versions(include_masked = False)
-        debug.dprint("SUMMARY: nonmasked = " + str(nonmasked))
-
-        # added by Tommy
-        hardmasked = package.get_hard_masked()
-
-        status = {}
-        for _ver in versions:
-            status[_ver] = []
-        s_check = set(versions).difference(hardmasked, nonmasked)
-        for _ver in s_check:
-            status[_ver] = backends.portage_lib.get_masking_status(_ver)
-        debug.dprint("SUMMARY: hardmasked = " + str(hardmasked))
+        self.installed = package.get_installed()
+        debug.dprint("SUMMARY: installed = " + str(self.installed))
         #self.keyword_unmasked = backends.portage_lib.get_keyword_unmasked_ebuilds(
         #                    archlist=config.Prefs.globals.archlist, full_name=package.full_name)
         debug.dprint("SUMMARY: get package info, name = " + package.full_name)
         self.keyword_unmasked = db.userconfigs.get_user_config('KEYWORDS', name=package.full_name)
         package_unmasked = db.userconfigs.get_user_config('UNMASK', name=package.full_name)
 
-        best = backends.portage_lib.get_best_ebuild(package.full_name)
-        debug.dprint("SUMMARY: best = %s" %best)
-        if _ebuild:
-            self.ebuild = _ebuild
-        else:
-            if best == "": # all versions are masked and the package is not installed
-                debug.dprint("SUMMARY: best = '', getting latest ebuild")
-                self.ebuild = package.get_latest_ebuild(True) # get latest masked version
-            else:
-                self.ebuild = best
-        #debug.dprint("SUMMARY: getting properties for ebuild version %s" %ebuild)
-        metadata = package.get_metadata(self.ebuild)
+        # the best ebuild, unless one was selected
+        self.ebuild = data.ebuild
+        debug.dprint("SUMMARY: ebuild = %s" %self.ebuild)
+        metadata = data.metadata
         props = package.get_properties(self.ebuild)
         iuse = props.get_use_flags()
         if iuse:
@@ -663,9 +650,6 @@ class Summary(Gtk.TextView):
         # fixme unused slot
         slot = str(props.get_slot())
 
-        # Sort the versions in release order
-        versions = ver_sort(versions)
-
         # Get the tag table and remove all URL tags
         table=self.buffer.get_tag_table()
         for tag in self.url_tags:
@@ -710,22 +694,22 @@ class Summary(Gtk.TextView):
 
         # display a table of architectures and support / stability
         # like on packages.gentoo.org :)
-        if config.Prefs.summary.showtable: create_ebuild_table(versions)
+        if config.Prefs.summary.showtable: create_ebuild_table()
 
         # Installed version(s)
         if config.Prefs.summary.showinstalled:
-            if installed:
+            if matrix.installed:
                 append(_("Installed versions:\n"), "property")
-                show_vnums(installed, show_all=True)
+                show_vnums(matrix.installed, show_all=True)
                 nl(2)
             else:
                 append(_("Not installed"), "property")
                 nl(2)
 
         # Remaining versions
-        if versions and config.Prefs.summary.showavailable:
+        if matrix.versions and config.Prefs.summary.showavailable:
             append(_("Available versions for %s:\n") % self.myarch, "property")
-            show_vnums(versions)
+            show_vnums(matrix.versions)
             nl(2)
 
         append(_("Properties for version: "), "property")
@@ -734,6 +718,27 @@ class Summary(Gtk.TextView):
         show_props(self.ebuild)
         nl()
         show_configs(self.ebuild)
+        if self.ready_callback:
+            self.ready_callback()
+
+    def summary_read(self, package, _ebuild, data):
+        """Shows package once the tab pool has read it"""
+        if package is not self.package or self.ebuild is not None:
+            return
+        if data is None:
+            self.buffer.insert(self.buffer.get_end_iter(),
+                    "\n" + _("Failed to read the package information"))
+            # the other tabs still show the ebuild it would have shown
+            try:
+                self.ebuild = _ebuild or default_ebuild(package)
+            except Exception as e:
+                debug.dprint("SUMMARY: summary_read(); no ebuild for %s: %s"
+                        %(package.full_name, str(e)))
+                return
+            if self.ready_callback:
+                self.ready_callback()
+            return
+        self.update_package_info(package, _ebuild)
 
     def on_button_press(self, summaryview, event):
         """Button press callback for Summary.
@@ -931,6 +936,7 @@ class Summary(Gtk.TextView):
         # reset package info
         self.package.best_ebuild = None
         self.package.latest_ebuild = None
+        self.package.ebuild_matrix = None
         # reload view
         self.update_package_info(self.package)
         self.re_init_portage()
@@ -0,0 +1,289 @@
+#!/usr/bin/env python
+
+'''
+    Porthole Package Notebook tab data
+    Reads the data of the notebook tabs in worker threads, so the gtk
+    thread only has to show it.  The data is kept per (tab, package,
+    ebuild) and the rows next to the selected one are read ahead
+
+    Copyright (C) 2003 - 2009 Fredrik Arnerup, Daniel G. Taylor,
+    Brian Dolbec, Wm. F. Wheeler, Tommy Iorns
+
+    This program is free software; you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation; either version 2 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program; if not, write to the Free Software
+    Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+'''
+
+import threading
+from collections import OrderedDict
+
+from porthole.utils import debug
+from porthole import backends
+from porthole.utils.dispatcher import Dispatcher
+from porthole.readers.commonreader import CommonReader
+from porthole.views.packagebook.depends import dep_graph
+
+# the tabs read by the pool
+SUMMARY = 'summary'
+DEPS = 'deps'
+INSTALLED = 'installed'
+
+# portage is mostly busy in python, more threads would only wait
+# for each other
+WORKERS = 2
+# (tab, package, ebuild) entries kept
+CACHE_SIZE = 200
+# seconds a worker waits for a job before checking if it should quit
+IDLE_WAIT = 1.0
+
+
+def default_ebuild(package):
+    """Returns the ebuild the Summary tab shows when none is selected"""
+    best = package.get_best_ebuild()
+    if best == "": # all versions are masked and the package is not installed
+        return package.get_latest_ebuild(True) # get latest masked version
+    return best
+
+
+class TabData(object):
+    """The data of a tab for a package's ebuild.  It remembers the
+    Package attributes it was read from, Package.invalidate() replacing
+    any of them makes it out of date"""
+
+    def __init__(self, package, ebuild, sources):
+        self.ebuild = ebuild
+        self.sources = [(attr, self.get_source(package, attr)) for attr in sources]
+
+    def get_source(self, package, attr):
+        if attr == 'properties':
+            return package.properties.get(self.ebuild)
+        return getattr(package, attr)
+
+    def is_valid(self, package):
+        for attr, value in self.sources:
+            if self.get_source(package, attr) is not value:
+                return False
+        return True
+
+
+def read_summary(package, ebuild):
+    """Reads what the Summary tab needs besides the user configs"""
+    ebuild = ebuild or default_ebuild(package)
+    package.get_installed()
+    matrix = package.get_ebuild_matrix()
+    package.get_properties(ebuild)
+    data = TabData(package, ebuild, ['properties', 'ebuild_matrix', 'installed_ebuilds'])
+    data.matrix = matrix
+    data.metadata = package.get_metadata(ebuild)
+    return data
+
+
+def read_deps(package, ebuild):
+    """Parses the dependencies of ebuild and looks up the ebuilds
+    each top level one would pull in and if it is installed, into
+    the dep_graph the Dependencies tab is filled from"""
+    ebuild = ebuild or default_ebuild(package)
+    dep_graph.check()
+    parsed = dep_graph.get_parsed(package, ebuild)
+    for atom in parsed.atoms:
+        if atom.mytype in ['DEP', 'BLOCKER', 'REVISIONABLE'] and atom.atom:
+            dep_graph.get_dep_ebuild(atom.atom)
+            atom.is_satisfied('')
+    return TabData(package, ebuild, ['properties'])
+
+
+def read_installed(package, ebuild):
+    """Reads the list of files ebuild installed"""
+    ebuild = ebuild or default_ebuild(package)
+    package.get_installed()
+    data = TabData(package, ebuild, ['installed_ebuilds'])
+    data.files = backends.portage_lib.get_installed_files(ebuild)
+    return data
+
+
+READERS = {
+    SUMMARY: read_summary,
+    DEPS: read_deps,
+    INSTALLED: read_installed,
+}
+
+
+class TabJob(object):
+    """A tab to read for a package's ebuild, and who is waiting for it"""
+
+    def __init__(self, key, package, ebuild):
+        self.key = key
+        self.package = package
+        self.ebuild = ebuild
+        # [(owner, callback),...]
+        self.callbacks = []
+        # the notebooks that still want it
+        self.owners = set()
+        self.data = None
+
+
+class TabWorker(CommonReader):
+    """Runs the jobs of a TabDataPool"""
+
+    def __init__(self, pool):
+        CommonReader.__init__(self)
+        self.pool = pool
+
+    def run(self):
+        while not self.cancelled:
+            job = self.pool.next_job()
+            if job is None:
+                continue
+            kind = job.key[0]
+            try:
+                job.data = READERS[kind](job.package, job.ebuild)
+            except Exception as e:
+                debug.dprint("TABDATA: TabWorker.run(); %s of %s: %s"
+                        %(kind, job.package.full_name, str(e)))
+            self.count += 1
+            self.pool.dispatcher(job)
+        self.done = True
+
+
+class TabDataPool(object):
+    """Worker threads reading the notebook tabs, and the tabs read.
+    Each notebook is an owner, a job nobody wants any more is dropped
+    before it runs.  A job in progress can not be stopped, but it only
+    adds to the cache once it is done"""
+
+    def __init__(self, workers = WORKERS):
+        self.condition = threading.Condition()
+        # foreground jobs first, then the read ahead ones
+        self.queue = []
+        # key: job, queued or running
+        self.jobs = {}
+        self.cache = OrderedDict()
+        self.dispatcher = Dispatcher(self.job_done)
+        self.workers = []
+        for x in range(workers):
+            worker = TabWorker(self)
+            worker.start()
+            self.workers.append(worker)
+
+    def get(self, kind, package, ebuild = None):
+        """Returns the data read for the tab, or None"""
+        key = (kind, package.full_name, ebuild)
+        data = self.cache.get(key)
+        if data is None:
+            return None
+        if not data.is_valid(package):
+            debug.dprint("TABDATA: get(); dropping old %s of %s" %(kind, package.full_name))
+            del self.cache[key]
+            return None
+        self.cache.move_to_end(key)
+        return data
+
+    def request(self, owner, kind, package, ebuild = None, callback = None):
+        """Returns the data of the tab if it was read already, else
+        reads it first thing and passes it (or None on error)
+        to callback"""
+        data = self.get(kind, package, ebuild)
+        if data is not None:
+            return data
+        self._add_job(owner, kind, package, ebuild, callback, True)
+        return None
+
+    def prefetch(self, owner, kind, package, ebuild = None):
+        """Reads the tab once the requested ones are done"""
+        if self.get(kind, package, ebuild) is None:
+            self._add_job(owner, kind, package, ebuild, None, False)
+
+    def _add_job(self, owner, kind, package, ebuild, callback, urgent):
+        key = (kind, package.full_name, ebuild)
+        self.condition.acquire()
+        try:
+            job = self.jobs.get(key)
+            if job is None:
+                job = self.jobs[key] = TabJob(key, package, ebuild)
+                self.queue.append(job)
+            if callback:
+                job.callbacks.append((owner, callback))
+            job.owners.add(owner)
+            if urgent and job in self.queue:
+                self.queue.remove(job)
+                self.queue.insert(0, job)
+            self.condition.notify()
+        finally:
+            self.condition.release()
+
+    def cancel(self, owner):
+        """Forgets what owner asked for, its selection changed"""
+        self.condition.acquire()
+        try:
+            for job in list(self.jobs.values()):
+                job.owners.discard(owner)
+                job.callbacks = [x for x in job.callbacks if x[0] is not owner]
+                if not job.owners and job in self.queue:
+                    self.queue.remove(job)
+                    del self.jobs[job.key]
+        finally:
+            self.condition.release()
+
+    def next_job(self):
+        """Returns the next job to run, or None after IDLE_WAIT seconds.
+        Called by the workers"""
+        self.condition.acquire()
+        try:
+            if not self.queue:
+                self.condition.wait(IDLE_WAIT)
+            if self.queue:
+                return self.queue.pop(0)
+            return None
+        finally:
+            self.condition.release()
+
+    def job_done(self, job):
+        """Keeps the data of job and passes it on, in the gtk thread"""
+        self.condition.acquire()
+        try:
+            del self.jobs[job.key]
+            callbacks = job.callbacks
+        finally:
+            self.condition.release()
+        data = job.data
+        if data is not None:
+            kind, name, ebuild = job.key
+            self.cache[job.key] = data
+            if ebuild != data.ebuild:
+                # the default ebuild, asked for by name as well
+                self.cache[(kind, name, data.ebuild)] = data
+            while len(self.cache) > CACHE_SIZE:
+                self.cache.popitem(False)
+        for owner, callback in callbacks:
+            callback(data)
+
+    def forget(self, package):
+        """Drops the data read for package"""
+        for key in [key for key in self.cache if key[1] == package.full_name]:
+            del self.cache[key]
+
+    def close(self):
+        for worker in self.workers:
+            worker.please_die()
+        self.workers = []
+
+
+# shared by the main and the dependency popup notebooks
+_pool = None
+
+def get_pool():
+    """Returns the TabDataPool, started on first use"""
+    global _pool
+    if _pool is None:
+        _pool = TabDataPool()
+    return _pool
@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+
+'''
+    Porthole Tests: EmergeLogIndex
+
+    This program is free software; you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation; either version 2 of the License, or
+    (at your option) any later version.
+'''
+
+import os
+import shutil
+import tempfile
+import unittest
+
+try:
+    import gi
+except ImportError:
+    gi = None
+
+LOG = b"""1300000000:  >>> emerge (1 of 2) sys-devel/gcc-13.2.1_p20240113-r1::gentoo to /
+1300003600:  ::: completed emerge (1 of 2) sys-devel/gcc-13.2.1_p20240113-r1::gentoo to /
+1300003700:  >>> emerge (2 of 2) app-misc/foo-1.2 to /
+1300003760:  ::: completed emerge (2 of 2) app-misc/foo-1.2 to /
+"""
+
+
+@unittest.skipIf(gi is None, "porthole.utils needs gi")
+class EmergeLogIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        from porthole import benchmarks
+        benchmarks.init(object())
+        self.dir = tempfile.mkdtemp()
+        self.log_file = os.path.join(self.dir, "emerge.log")
+        _file = open(self.log_file, "wb")
+        try:
+            _file.write(LOG)
+        finally:
+            _file.close()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_repo_suffix(self):
+        from porthole.utils.emergelog import EmergeLogIndex
+        index = EmergeLogIndex(self.log_file, os.path.join(self.dir, "emerge_log.idx"))
+        index.update()
+        self.assertEqual(index.durations["sys-devel/gcc"],
+                [[1300003600, "13.2.1_p20240113-r1", 3600]])
+        self.assertEqual(index.estimate("sys-devel/gcc").total_seconds(), 3600)
+        self.assertEqual(index.estimate("foo").total_seconds(), 60)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+
+'''
+    Porthole Tests: reader worker processes
+
+    This program is free software; you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation; either version 2 of the License, or
+    (at your option) any later version.
+'''
+
+import os
+import subprocess
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# run in a new interpreter, as a forkserver worker imports the module
+CHECK = """
+import sys, threading
+import porthole.readers.workers
+print(%r in sys.modules)
+print(','.join(sorted(type(thread).__name__ for thread in threading.enumerate())))
+"""
+
+
+class WorkerImportTest(unittest.TestCase):
+
+    def import_worker(self, module):
+        env = dict(os.environ)
+        env["PYTHONPATH"] = os.pathsep.join([ROOT, env.get("PYTHONPATH", "")])
+        output = subprocess.check_output([sys.executable, "-c", CHECK % module],
+                env = env, universal_newlines = True)
+        return output.splitlines()[-2:]
+
+    def test_no_database(self):
+        imported, threads = self.import_worker("porthole.db")
+        self.assertEqual(imported, "False")
+        self.assertNotIn("DatabaseReader", threads)
+        self.assertEqual(threads, "_MainThread")
+
+
+class FakeBackend(object):
+    """The backend functions the workers call, for a small tree"""
+    installed = {"app-misc/old": ["app-misc/old-1.0", "app-misc/old-1.2"],
+                 "app-misc/new": ["app-misc/new-2.0"],
+                 "app-misc/gone": ["app-misc/gone-1.0"]}
+    best_ebuilds = {"app-misc/old": "app-misc/old-2.0",
+                    "app-misc/new": "app-misc/new-1.0",
+                    "app-misc/none": "app-misc/none-1.0"}
+
+    def get_installed(self, full_name):
+        return self.installed.get(full_name, [])
+
+    def get_best_ebuild(self, full_name):
+        return self.best_ebuilds.get(full_name, '')
+
+    def get_version(self, ebuild):
+        return ebuild.rsplit('-', 1)[1]
+
+    def best(self, versions):
+        return max(versions, key = self.get_version)
+
+
+class CheckUpgradablesTest(unittest.TestCase):
+
+    def setUp(self):
+        from porthole import backends
+        self.backend = backends.portage_lib
+        backends.portage_lib = FakeBackend()
+
+    def tearDown(self):
+        from porthole import backends
+        backends.portage_lib = self.backend
+
+    def test_check_upgradables(self):
+        from porthole.readers.workers import check_upgradables
+        self.assertEqual(check_upgradables(["app-misc/old", "app-misc/new",
+                "app-misc/gone", "app-misc/none"]),
+                [("app-misc/old", 1, "app-misc/old-2.0", "app-misc/old-1.2"),
+                 ("app-misc/new", -1, "app-misc/new-1.0", "app-misc/new-2.0"),
+                 ("app-misc/gone", 0, "", "app-misc/gone-1.0"),
+                 ("app-misc/none", 0, "app-misc/none-1.0", "")])
+
+
+if __name__ == "__main__":
+    unittest.main()